@@ -6,7 +6,9 @@ from typing import Dict
 
 # Librerías de terceros
 import customtkinter as ctk
-import google.generativeai as genai
+
+# Pool de clientes compartido con el resto de la aplicación
+from src.client_pool import obtener_pool
 
 
 class GeminiPromptGenerator:
@@ -24,11 +26,8 @@ class GeminiPromptGenerator:
         Args:
             api_key (str): API key de Google Gemini
         """
-        # Configurar la API de Gemini con la clave proporcionada
-        genai.configure(api_key=api_key)
-        
-        # Inicializar el modelo Gemini 2.5 Flash (versión más reciente)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        # Obtener el modelo Gemini 2.5 Flash del pool del proceso (configura la API una sola vez)
+        self.model = obtener_pool().modelo(api_key, 'gemini-2.5-flash')
         
         # Categorías de generación disponibles
         self.categorias = {
@@ -336,6 +335,11 @@ class BrainCourseGUI:
             self.root.destroy()
             return
         
+        # Abrir la conexión en segundo plano para que la primera petición no pague el handshake
+        threading.Thread(
+            target=obtener_pool().calentar, args=(api_key, 'gemini-2.5-flash'), daemon=True
+        ).start()
+        
         self.crear_interfaz()
     
     def mostrar_error(self, mensaje):
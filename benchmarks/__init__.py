@@ -0,0 +1,2 @@
+# PROMPTS IA - Benchmarks
+# Suite de rendimiento ejecutable sin conexión con el backend falso
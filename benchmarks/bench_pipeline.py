@@ -0,0 +1,308 @@
+"""
+Benchmarks del pipeline de PROMPTS IA
+Mide cada etapa de la generación sin conexión usando el backend falso
+
+Uso:
+    python -m benchmarks.bench_pipeline                 # imprime el JSON
+    python -m benchmarks.bench_pipeline -o bench.json   # lo guarda en un archivo
+    python -m benchmarks.bench_pipeline --rapido        # tamaños reducidos
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from src.backends import BackendFalso, latencia_lognormal
+from src.generator import GeminiPromptGenerator
+from src.hedging import PoliticaCobertura, percentil
+from src.parser import ParserIncremental
+from src.rate_limit import estimar_tokens
+from src.utils import cargar_historial, exportar_prompts, guardar_historial
+
+
+DESCRIPCION = "Gato atigrado caminando por una playa al atardecer con olas suaves"
+
+DETALLES_POR_CATEGORIA = {
+    "face_transform": {"transformacion": "Disfraz/Vestuario", "mantener_identidad": "Sí"},
+    "generate": {},
+    "modify": {"tipo_modificacion": "Cambio de Fondo"},
+    "effects": {"tipo_efecto": "Iluminación"},
+    "video_generate": {"duracion": "5s", "aspecto": "16:9", "movimiento_camara": "Paneo (Izq/Der)",
+                       "intensidad_movimiento": "Media"},
+    "image_to_video": {"duracion": "3s", "aspecto": "9:16", "movimiento_camara": "Zoom (Acercar/Alejar)",
+                       "intensidad_movimiento": "Baja"},
+    "video_effects": {"duracion": "5s", "aspecto": "16:9", "movimiento_camara": "Estático",
+                      "intensidad_movimiento": "Media", "tipo_efecto": "Transición"},
+    "camera_movement": {"duracion": "10s", "aspecto": "16:9", "movimiento_camara": "Dolly",
+                        "intensidad_movimiento": "Alta"},
+}
+
+
+def medir(funcion: Callable[[], object], repeticiones: int) -> Dict[str, float]:
+    """
+    Ejecuta una función varias veces y resume los tiempos
+
+    Args:
+        funcion (Callable): Función sin argumentos a medir
+        repeticiones (int): Número de ejecuciones
+
+    Returns:
+        Dict[str, float]: Tiempos en milisegundos (min, media, p50, p95) y repeticiones
+    """
+    tiempos: List[float] = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    tiempos.sort()
+    return {
+        "repeticiones": repeticiones,
+        "min_ms": round(tiempos[0], 4),
+        "media_ms": round(statistics.fmean(tiempos), 4),
+        "p50_ms": round(tiempos[len(tiempos) // 2], 4),
+        "p95_ms": round(tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))], 4),
+    }
+
+
+def respuesta_sintetica(tamano_bytes: int) -> str:
+    """Construye una respuesta POSITIVE/NEGATIVE de aproximadamente 'tamano_bytes' caracteres"""
+    linea = "iluminación volumétrica dorada, composición equilibrada, textura detallada, alta resolución\n"
+    mitad = max(1, tamano_bytes // 2 // len(linea))
+    return "POSITIVE:\n" + linea * mitad + "\nNEGATIVE:\n" + linea * mitad
+
+
+def entrada_historial(indice: int) -> Dict:
+    """Entrada de historial representativa"""
+    return {
+        "tipo_medio": "video",
+        "categoria": "🎬 Generación desde Cero",
+        "descripcion": f"{DESCRIPCION} #{indice}",
+        "estilo": "🎬 Cinematográfico",
+        "prompt_positivo": "Video de un gato caminando por una playa al atardecer, " * 4,
+        "prompt_negativo": "movimiento brusco, saltos de frames, parpadeo, glitches",
+        "detalles": DETALLES_POR_CATEGORIA["video_generate"],
+        "timestamp": "2026-01-09T19:30:00",
+    }
+
+
+# ==================== BENCHMARKS ====================
+
+
+def bench_plantillas(generador: GeminiPromptGenerator, repeticiones: int) -> Dict[str, Dict]:
+    """Renderizado del prompt del sistema para cada una de las ocho categorías"""
+    resultados = {}
+    tipos = [("imagen", c) for c in generador.categorias_imagen.values()]
+    tipos += [("video", c) for c in generador.categorias_video.values()]
+
+    for tipo_medio, categoria in tipos:
+        detalles = DETALLES_POR_CATEGORIA.get(categoria, {})
+        resultado = medir(
+            lambda: generador._construir_prompt(tipo_medio, categoria, DESCRIPCION, "cinematográfico", detalles),
+            repeticiones
+        )
+        texto = generador._construir_prompt(tipo_medio, categoria, DESCRIPCION, "cinematográfico", detalles)
+        resultado["caracteres"] = len(texto)
+        resultado["tokens_estimados"] = estimar_tokens(texto)
+        dividido = generador.plantillas.renderizar_dividido(tipo_medio, categoria, DESCRIPCION,
+                                                           "cinematográfico", detalles)
+        if dividido is not None:
+            # Tokens enviados por petición en modo instrucción del sistema
+            resultado["tokens_estimados_instruccion_sistema"] = estimar_tokens(dividido[1])
+        resultados[categoria] = resultado
+    return resultados
+
+
+def parsear_en_fragmentos(texto: str, tamano_fragmento: int = 64) -> Dict[str, str]:
+    """Parsea un texto con ParserIncremental entregándolo en fragmentos, como en streaming"""
+    parser = ParserIncremental()
+    for inicio in range(0, len(texto), tamano_fragmento):
+        parser.alimentar(texto[inicio:inicio + tamano_fragmento])
+    return parser.cerrar()
+
+
+def bench_parseo(generador: GeminiPromptGenerator, tamanos: List[int]) -> Dict[str, Dict]:
+    """
+    Parseo de respuestas de distintos tamaños, completo y en streaming
+
+    'ns_por_byte' debe mantenerse estable al crecer el tamaño (coste lineal);
+    'escalado' es su cociente entre el tamaño mayor y el menor de al menos 50 KB.
+    """
+    resultados: Dict[str, Dict] = {"completo": {}, "stream": {}}
+    for tamano in tamanos:
+        texto = respuesta_sintetica(tamano)
+        bytes_texto = len(texto.encode("utf-8"))
+        repeticiones = max(3, min(2000, 2_000_000 // max(1, tamano)))
+
+        for modo, funcion in (("completo", lambda: generador._parsear_respuesta(texto)),
+                              ("stream", lambda: parsear_en_fragmentos(texto))):
+            resultado = medir(funcion, repeticiones)
+            resultado["bytes"] = bytes_texto
+            resultado["mb_por_segundo"] = round(bytes_texto / 1e6 / (resultado["p50_ms"] / 1000), 2)
+            resultado["ns_por_byte"] = round(resultado["p50_ms"] * 1e6 / bytes_texto, 3)
+            resultados[modo][str(tamano)] = resultado
+
+    grandes = [str(t) for t in tamanos if t >= 50_000]
+    if len(grandes) >= 2:
+        for modo in ("completo", "stream"):
+            base = resultados[modo][grandes[0]]["ns_por_byte"]
+            resultados[modo]["escalado"] = round(resultados[modo][grandes[-1]]["ns_por_byte"] / base, 3)
+    return resultados
+
+
+def bench_historial(directorio: str, tamanos: List[int]) -> Dict[str, Dict]:
+    """cargar_historial y guardar_historial con historiales de distintos tamaños"""
+    resultados = {}
+    for tamano in tamanos:
+        ruta = os.path.join(directorio, f"history_{tamano}.json")
+        base = [entrada_historial(i) for i in range(tamano)]
+        with open(ruta, 'w', encoding='utf-8') as f:
+            json.dump(base, f, ensure_ascii=False, indent=2)
+
+        repeticiones = 20 if tamano <= 1000 else 3
+        carga = medir(lambda: cargar_historial(ruta), repeticiones)
+        guardado = medir(lambda: guardar_historial(entrada_historial(-1), ruta), repeticiones)
+        resultados[str(tamano)] = {
+            "bytes_archivo": os.path.getsize(ruta),
+            "cargar": carga,
+            "guardar": guardado,
+        }
+    return resultados
+
+
+def bench_exportar(directorio: str, repeticiones: int) -> Dict[str, float]:
+    """exportar_prompts a un directorio temporal"""
+    entrada = entrada_historial(0)
+    metadata = {k: entrada[k] for k in ("tipo_medio", "categoria", "estilo", "descripcion")}
+    return medir(
+        lambda: exportar_prompts(entrada["prompt_positivo"], entrada["prompt_negativo"], metadata, directorio),
+        repeticiones
+    )
+
+
+def bench_lote(niveles: List[int], elementos: int, latencia_mediana: float) -> Dict[str, Dict]:
+    """Throughput de generar_lote de extremo a extremo a distintos niveles de concurrencia"""
+    resultados = {}
+    especificaciones = [
+        {"tipo_medio": "imagen", "categoria": "generate", "descripcion": f"{DESCRIPCION} {i}",
+         "estilo": "realista/fotográfico"}
+        for i in range(elementos)
+    ]
+
+    for concurrencia in niveles:
+        backend = BackendFalso(latencia=latencia_lognormal(latencia_mediana, 0.5), semilla=concurrencia)
+        generador = GeminiPromptGenerator(backend=backend, usar_cache=False, usar_metricas=False)
+
+        inicio = time.perf_counter()
+        lote = generador.generar_lote(especificaciones, max_workers=concurrencia)
+        duracion = time.perf_counter() - inicio
+
+        resultados[str(concurrencia)] = {
+            "elementos": elementos,
+            "errores": sum(1 for item in lote if item["error"]),
+            "segundos": round(duracion, 4),
+            "elementos_por_segundo": round(elementos / duracion, 2),
+        }
+    return resultados
+
+
+def bench_cobertura(elementos: int, concurrencia: int, latencia_mediana: float,
+                    sigma: float = 1.0, fraccion_primer_fragmento: float = 1.0) -> Dict[str, Dict]:
+    """
+    Latencia de extremo a extremo sin y con peticiones de cobertura (hedging)
+
+    El backend falso usa una distribución log-normal de cola larga con la misma
+    semilla en ambos casos; 'llamadas_extra' es el coste en cuota de los duplicados.
+    Por defecto toda la latencia se espera antes del primer fragmento (el caso en
+    que un intento lento no se puede interrumpir hasta que responde).
+    """
+    resultados = {}
+    especificaciones = [
+        {"tipo_medio": "imagen", "categoria": "generate", "descripcion": f"{DESCRIPCION} {i}",
+         "estilo": "realista/fotográfico"}
+        for i in range(elementos)
+    ]
+
+    for nombre, cobertura in (("sin_cobertura", None), ("con_cobertura", PoliticaCobertura())):
+        backend = BackendFalso(latencia=latencia_lognormal(latencia_mediana, sigma), semilla=7,
+                               fraccion_primer_fragmento=fraccion_primer_fragmento)
+        generador = GeminiPromptGenerator(backend=backend, usar_cache=False, usar_metricas=False, cobertura=cobertura)
+
+        def generar(spec: Dict) -> float:
+            inicio = time.perf_counter()
+            generador._generar_desde_spec(spec)
+            return (time.perf_counter() - inicio) * 1000
+
+        with ThreadPoolExecutor(max_workers=concurrencia) as executor:
+            latencias = list(executor.map(generar, especificaciones))
+
+        resultados[nombre] = {
+            "elementos": elementos,
+            "p50_ms": round(percentil(latencias, 50), 2),
+            "p95_ms": round(percentil(latencias, 95), 2),
+            "p99_ms": round(percentil(latencias, 99), 2),
+            "llamadas_extra": backend.llamadas - elementos,
+        }
+        if cobertura is not None:
+            resultados[nombre]["proporcion_coberturas"] = cobertura.estadisticas()["proporcion_coberturas"]
+            cobertura.cerrar()
+    return resultados
+
+
+def ejecutar(rapido: bool = False) -> Dict:
+    """
+    Ejecuta toda la suite
+
+    Args:
+        rapido (bool): Usa tamaños reducidos para una ejecución corta
+
+    Returns:
+        Dict: Resultados con metadatos del entorno
+    """
+    generador = GeminiPromptGenerator(backend=BackendFalso(), usar_cache=False, usar_metricas=False)
+
+    with tempfile.TemporaryDirectory(prefix="prompts_ia_bench_") as directorio:
+        resultados = {
+            "plantillas": bench_plantillas(generador, 200 if rapido else 2000),
+            "parseo": bench_parseo(generador, [500, 50_000, 200_000] if rapido
+                                   else [500, 50_000, 200_000, 500_000, 800_000]),
+            "historial": bench_historial(directorio, [10, 1000] if rapido else [10, 10_000, 100_000]),
+            "exportar": bench_exportar(os.path.join(directorio, "exports"), 20 if rapido else 200),
+            "lote": bench_lote([1, 4, 16] if rapido else [1, 4, 16, 64], 32 if rapido else 256, 0.02),
+            "cobertura": bench_cobertura(200 if rapido else 1000, 8, 0.02),
+        }
+
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "rapido": rapido,
+        "resultados": resultados,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline de PROMPTS IA")
+    parser.add_argument("-o", "--salida", help="Archivo JSON de salida (por defecto stdout)")
+    parser.add_argument("--rapido", action="store_true", help="Usa tamaños reducidos")
+    args = parser.parse_args()
+
+    informe = ejecutar(rapido=args.rapido)
+    texto = json.dumps(informe, ensure_ascii=False, indent=2)
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(texto + "\n")
+    else:
+        sys.stdout.write(texto + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,11 +5,57 @@ Aplicación principal - Punto de entrada
 Genera prompts optimizados para herramientas de generación de imágenes y videos con IA
 Powered by Google Gemini 2.5 Flash
 """
-import customtkinter as ctk
-from src.gui import BrainCourseGUI, set_gui_principal
+import argparse
+import os
+import sys
+
+# Primero el informe de arranque, para medir desde aquí el resto de imports
+from src.startup import obtener_informe
+
+informe = obtener_informe()
+
+with informe.etapa("importar customtkinter"):
+    import customtkinter as ctk
+
+with informe.etapa("importar src.gui"):
+    from src.gui import BrainCourseGUI, set_gui_principal
+from src.generator import MODOS, MODO_LOCAL, MODO_REMOTO
 from src.utils import cargar_api_key
 
 
+def parsear_argumentos():
+    """Opciones de línea de comandos (también disponibles como variables de entorno)"""
+    parser = argparse.ArgumentParser(description="PROMPTS IA - Generador Inteligente de Prompts")
+    parser.add_argument(
+        "--arranque", nargs="?", const="-", metavar="ARCHIVO",
+        default=os.environ.get("PROMPTS_IA_ARRANQUE") or None,
+        help="Muestra el tiempo de cada etapa del arranque en stderr, o lo guarda en ARCHIVO (JSON) "
+             "[PROMPTS_IA_ARRANQUE]"
+    )
+    parser.add_argument(
+        "--presupuesto-ms", type=float,
+        default=float(os.environ["PROMPTS_IA_PRESUPUESTO_MS"]) if os.environ.get("PROMPTS_IA_PRESUPUESTO_MS") else None,
+        help="Tiempo máximo hasta que la ventana es visible; con --salir-al-iniciar, "
+             "termina con código 1 si se excede [PROMPTS_IA_PRESUPUESTO_MS]"
+    )
+    parser.add_argument(
+        "--salir-al-iniciar", action="store_true",
+        help="Cierra la aplicación en cuanto el generador está listo (para medir el arranque)"
+    )
+    parser.add_argument(
+        "--modo", choices=MODOS,
+        default=os.environ.get("PROMPTS_IA_MODO") or MODO_REMOTO,
+        help="remoto: solo Gemini; local: generador local sin conexión; auto: Gemini con el "
+             "generador local como respaldo si no responde a tiempo [PROMPTS_IA_MODO]"
+    )
+    args = parser.parse_args()
+    
+    # PROMPTS_IA_ARRANQUE=1 equivale a --arranque sin archivo
+    if args.arranque == "1":
+        args.arranque = "-"
+    return args
+
+
 def main():
     """
     Función principal de la aplicación
@@ -17,11 +63,14 @@ def main():
     Carga la API key, valida su existencia y lanza la interfaz gráfica.
     Si no se encuentra la API key, muestra un diálogo de error.
     """
+    args = parsear_argumentos()
+    estado = {"codigo": 0}
+    
     # Intentar cargar la API key desde el archivo
     api_key = cargar_api_key()
     
-    # Si no se encuentra la API key, mostrar error y salir
-    if not api_key:
+    # Si no se encuentra la API key, mostrar error y salir (el modo local no la necesita)
+    if not api_key and args.modo != MODO_LOCAL:
         root = ctk.CTk()
         root.withdraw()
         
@@ -43,15 +92,26 @@ def main():
         root.mainloop()
         return
     
+    def al_iniciar(error):
+        """Emite el informe de arranque y, si se pidió, cierra la aplicación"""
+        dentro_presupuesto = True
+        if args.arranque:
+            dentro_presupuesto = informe.emitir(args.arranque, args.presupuesto_ms)
+        if args.salir_al_iniciar:
+            estado["codigo"] = 1 if error or not dentro_presupuesto else 0
+            root.after(0, root.destroy)
+    
     # Crear la ventana principal y la aplicación
-    root = ctk.CTk()
-    app = BrainCourseGUI(root, api_key)
+    with informe.etapa("crear ventana"):
+        root = ctk.CTk()
+        app = BrainCourseGUI(root, api_key, al_iniciar=al_iniciar, modo=args.modo)
     
     # Establecer referencia global para la ventana de historial
     set_gui_principal(app)
     
     # Iniciar el loop principal de la interfaz
     root.mainloop()
+    sys.exit(estado["codigo"])
 
 
 if __name__ == "__main__":
@@ -0,0 +1,150 @@
+"""
+Generador de Prompts asíncrono (asyncio)
+Variante de GeminiPromptGenerator para servicios basados en event loop
+"""
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from .backends import BackendLLM
+from .cancellation import TokenCancelacion
+from .generator import MODO_AUTO, MODO_LOCAL, GeminiPromptGenerator
+from .rate_limit import estimar_tokens
+from .usage import extraer_uso
+
+
+class AsyncGeminiPromptGenerator(GeminiPromptGenerator):
+    """
+    Generador de prompts asíncrono usando Google Gemini 2.5 Flash API
+    
+    Comparte las plantillas, el caché y el parseo de GeminiPromptGenerator, pero
+    envía las peticiones con generate_content_async, de modo que cientos de
+    generaciones pueden estar en curso en un solo hilo.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        
+        # Tareas en curso por clave (single-flight dentro del event loop)
+        self._en_vuelo_async: Dict[str, "asyncio.Future"] = {}
+    
+    async def generar_prompt_con_ia_async(self, tipo_medio: str, categoria: str, descripcion: str,
+                                          estilo: str, detalles_extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """
+        Versión asíncrona de generar_prompt_con_ia
+        
+        Args:
+            tipo_medio (str): "imagen" o "video"
+            categoria (str): Categoría de generación seleccionada
+            descripcion (str): Descripción del usuario sobre el contenido deseado
+            estilo (str): Estilo artístico seleccionado
+            detalles_extra (Dict[str, str]): Detalles adicionales específicos de la categoría
+            
+        Returns:
+            Dict[str, str]: Diccionario con 'positivo' y 'negativo' prompts
+        """
+        if self.modo == MODO_LOCAL:
+            return self._generar_local(tipo_medio, categoria, descripcion, estilo, detalles_extra)
+        
+        remoto = self._generar_remoto_async(tipo_medio, categoria, descripcion, estilo, detalles_extra)
+        if self.modo != MODO_AUTO:
+            return await remoto
+        
+        # Respaldo local si Gemini no responde a tiempo o falla (la llamada compartida sigue en curso)
+        try:
+            return await asyncio.wait_for(remoto, self.plazo_respaldo)
+        except asyncio.TimeoutError:
+            pass
+        except Exception as e:
+            print(f"Error al generar con Gemini, se usa el generador local: {e}")
+        return self._generar_local(tipo_medio, categoria, descripcion, estilo, detalles_extra)
+    
+    async def _generar_remoto_async(self, tipo_medio: str, categoria: str, descripcion: str,
+                                    estilo: str, detalles_extra: Optional[Dict[str, str]]) -> Dict[str, str]:
+        """Genera con el modelo (caché y single-flight); ver generar_prompt_con_ia_async"""
+        clave = self._clave_cache(tipo_medio, categoria, descripcion, estilo, detalles_extra)
+        
+        # Consultar el caché antes de llamar a la API (en un hilo: puede leer de disco)
+        if self.cache is not None:
+            resultado = await asyncio.to_thread(self.cache.obtener, clave)
+            if resultado is not None:
+                return resultado
+        
+        # Compartir la misma tarea entre peticiones idénticas en curso
+        tarea = self._en_vuelo_async.get(clave)
+        es_lider = tarea is None
+        if es_lider:
+            backend, contenido = self._construir_peticion(tipo_medio, categoria, descripcion, estilo, detalles_extra)
+            tarea = asyncio.ensure_future(self._llamar_modelo_async(clave, backend, contenido))
+            self._en_vuelo_async[clave] = tarea
+            tarea.add_done_callback(lambda _: self._en_vuelo_async.pop(clave, None))
+        else:
+            self.solicitudes_coalescidas += 1
+        
+        # shield evita que cancelar a un solicitante cancele la llamada compartida
+        resultado, uso = await asyncio.shield(tarea)
+        # El consumo de tokens solo se atribuye a quien lanzó la llamada
+        if es_lider and uso is not None:
+            return dict(resultado, uso=uso)
+        return dict(resultado)
+    
+    async def _llamar_modelo_async(self, clave: str, backend: BackendLLM,
+                                   contenido: str) -> Tuple[Dict[str, str], Optional[Dict[str, Any]]]:
+        """Envía el prompt al modelo sin bloquear el event loop, guarda el resultado en caché y devuelve también el consumo"""
+        async def llamar():
+            if self.limitador is not None:
+                await self.limitador.adquirir_async(estimar_tokens(contenido))
+            return await backend.generate_content_async(contenido, **self._opciones_generacion())
+        
+        if self.reintentos is None:
+            response = await llamar()
+        else:
+            response = await self.reintentos.ejecutar_async(llamar)
+        
+        # Parsear la respuesta para extraer los prompts positivo y negativo
+        resultado = self._interpretar_respuesta(response.text)
+        
+        # Escribir y podar el disco fuera del event loop
+        if self.cache is not None:
+            await asyncio.to_thread(self.cache.guardar, clave, resultado)
+        
+        return resultado, extraer_uso(response, backend.nombre_modelo)
+    
+    async def generar_lote_async(self, especificaciones: List[Dict[str, Any]],
+                                 max_concurrencia: int = 16,
+                                 cancelacion: Optional[TokenCancelacion] = None) -> List[Dict[str, Any]]:
+        """
+        Genera varios prompts concurrentemente y devuelve los resultados en el orden de entrada
+        
+        Args:
+            especificaciones (List[Dict]): Igual que en generar_lote()
+            max_concurrencia (int): Número máximo de peticiones en curso a la vez
+            cancelacion (TokenCancelacion): Los elementos que no empezaron cuando se cancela
+                (o vence el plazo) se reportan con error; cancelar la tarea también funciona
+            
+        Returns:
+            List[Dict]: Un diccionario por especificación con 'indice', 'spec',
+                'resultado' (o None) y 'error' (o None)
+        """
+        if max_concurrencia < 1:
+            raise ValueError("max_concurrencia debe ser al menos 1")
+        
+        semaforo = asyncio.Semaphore(max_concurrencia)
+        
+        async def generar(indice: int, spec: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaforo:
+                try:
+                    self._validar_spec(spec)
+                    if cancelacion is not None:
+                        cancelacion.verificar()
+                    resultado = await self.generar_prompt_con_ia_async(
+                        spec.get("tipo_medio", "imagen"),
+                        spec["categoria"],
+                        spec["descripcion"],
+                        spec.get("estilo", "auto-detectar el mejor estilo"),
+                        spec.get("detalles_extra", spec.get("detalles"))
+                    )
+                    return {"indice": indice, "spec": spec, "resultado": resultado, "error": None}
+                except Exception as e:
+                    return {"indice": indice, "spec": spec, "resultado": None, "error": str(e)}
+        
+        return await asyncio.gather(*(generar(i, spec) for i, spec in enumerate(especificaciones)))
@@ -0,0 +1,323 @@
+"""
+Backends de modelos de lenguaje para PROMPTS IA
+Interfaz común para Gemini y un backend falso determinista para pruebas de carga
+"""
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional, Protocol, Sequence, Union
+
+from .client_pool import obtener_pool
+from .rate_limit import estimar_tokens
+
+
+class BackendLLM(Protocol):
+    """
+    Interfaz que debe cumplir un backend de generación
+
+    Sigue la forma de google.generativeai.GenerativeModel: la respuesta expone
+    'text' y, en modo stream=True, es iterable en fragmentos con 'text'.
+    """
+
+    nombre_modelo: str
+
+    def generate_content(self, contenido: str, **opciones: Any) -> Any:
+        """Genera una respuesta para el prompt (o un iterable de fragmentos si stream=True)"""
+        ...
+
+    async def generate_content_async(self, contenido: str, **opciones: Any) -> Any:
+        """Versión asíncrona de generate_content"""
+        ...
+
+    def con_instruccion_sistema(self, instruccion: str) -> "BackendLLM":
+        """Devuelve un backend del mismo modelo con una instrucción del sistema fija"""
+        ...
+
+
+class BackendGemini:
+    """Backend que usa la API de Google Gemini a través del pool de clientes del proceso"""
+
+    def __init__(self, api_key: str, nombre_modelo: str = 'gemini-2.5-flash',
+                 instruccion_sistema: Optional[str] = None):
+        """
+        Inicializa el backend
+
+        Args:
+            api_key (str): API key de Google Gemini
+            nombre_modelo (str): Modelo de Gemini a utilizar
+            instruccion_sistema (str): Instrucción del sistema fija del modelo (opcional)
+        """
+        self.api_key = api_key
+        self.nombre_modelo = nombre_modelo
+        # El SDK se configura una sola vez y el modelo (con su conexión) se comparte
+        self.model = obtener_pool().modelo(api_key, nombre_modelo, instruccion_sistema)
+
+    def generate_content(self, contenido: str, **opciones: Any) -> Any:
+        """Envía el prompt a Gemini"""
+        return self.model.generate_content(contenido, **opciones)
+
+    async def generate_content_async(self, contenido: str, **opciones: Any) -> Any:
+        """Envía el prompt a Gemini sin bloquear el event loop"""
+        return await self.model.generate_content_async(contenido, **opciones)
+
+    def con_instruccion_sistema(self, instruccion: str) -> "BackendGemini":
+        """
+        Crea un backend del mismo modelo con una instrucción del sistema fija
+
+        Args:
+            instruccion (str): Instrucciones fijas que se envían como system_instruction
+
+        Returns:
+            BackendGemini: Backend que solo necesita recibir la parte variable del prompt
+        """
+        return BackendGemini(self.api_key, self.nombre_modelo, instruccion)
+
+    def calentar(self) -> bool:
+        """Establece la conexión con la API antes de la primera petición"""
+        return obtener_pool().calentar(self.api_key, self.nombre_modelo)
+
+
+# ==================== BACKEND FALSO ====================
+
+
+class ErrorBackendFalso(Exception):
+    """Error simulado por BackendFalso; 'code' imita el estado HTTP de la API"""
+
+    def __init__(self, mensaje: str, code: int = 503):
+        super().__init__(mensaje)
+        self.code = code
+
+
+def latencia_constante(segundos: float) -> Callable[[random.Random], float]:
+    """Distribución de latencia fija"""
+    return lambda rng: segundos
+
+
+def latencia_lognormal(mediana: float, sigma: float = 0.5) -> Callable[[random.Random], float]:
+    """
+    Distribución de latencia log-normal (cola larga, como una API real)
+
+    Args:
+        mediana (float): Latencia mediana en segundos
+        sigma (float): Dispersión; valores mayores alargan la cola
+
+    Returns:
+        Callable: Función que recibe un random.Random y devuelve segundos
+    """
+    mu = math.log(mediana)
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+
+# Variaciones de iluminación usadas para distinguir candidatos en respuesta_por_defecto
+_ILUMINACIONES = ("iluminación natural", "luz dorada lateral", "iluminación de estudio suave", "contraluz difuso")
+
+
+def respuesta_por_defecto(prompt: str, variante: int = 0, formato_json: bool = False) -> str:
+    """Construye una respuesta con formato POSITIVE/NEGATIVE (o JSON) a partir de la descripción del prompt"""
+    coincidencia = re.search(r'DESCRIPCI[ÓO]N[^:]*:\s*"([^"]*)"', prompt)
+    descripcion = coincidencia.group(1) if coincidencia else "escena"
+    iluminacion = _ILUMINACIONES[variante % len(_ILUMINACIONES)]
+    positivo = f"{descripcion}, composición equilibrada, {iluminacion}, alta resolución, detalle nítido"
+    negativo = "baja calidad, desenfoque, distorsión, artefactos, anatomía incorrecta"
+
+    if formato_json:
+        return json.dumps({"positivo": positivo, "negativo": negativo}, ensure_ascii=False)
+    return f"POSITIVE:\n{positivo}\n\nNEGATIVE:\n{negativo}\n"
+
+
+class BackendFalso:
+    """
+    Backend local y determinista para pruebas de carga y benchmarks sin gastar cuota
+
+    La latencia, la tasa de errores y el contenido de las respuestas son
+    configurables; con la misma semilla produce la misma secuencia.
+    """
+
+    def __init__(self, respuestas: Union[None, Sequence[str], Callable[[str], str]] = None,
+                 latencia: Union[float, Callable[[random.Random], float]] = 0.0,
+                 tasa_error: float = 0.0, codigo_error: int = 503,
+                 semilla: int = 0, nombre_modelo: str = "falso",
+                 tamano_fragmento: int = 16, fraccion_primer_fragmento: Optional[float] = None):
+        """
+        Inicializa el backend falso
+
+        Args:
+            respuestas: Lista de textos (se usan en ciclo) o función prompt -> texto.
+                Por defecto se genera una respuesta a partir de la descripción.
+            latencia: Segundos fijos o función (random.Random) -> segundos,
+                p. ej. latencia_lognormal(0.8, 0.6)
+            tasa_error (float): Probabilidad de que una llamada falle
+            codigo_error (int): Código HTTP simulado de los errores (429, 503...)
+            semilla (int): Semilla del generador aleatorio
+            nombre_modelo (str): Nombre reportado por el backend
+            tamano_fragmento (int): Caracteres por fragmento en modo stream
+            fraccion_primer_fragmento (float): Parte de la latencia que se espera antes del
+                primer fragmento en modo stream (1.0 = todo; None = repartida por igual)
+        """
+        self.nombre_modelo = nombre_modelo
+        self.tasa_error = tasa_error
+        self.codigo_error = codigo_error
+        self.tamano_fragmento = tamano_fragmento
+        self.fraccion_primer_fragmento = fraccion_primer_fragmento
+
+        if isinstance(latencia, (int, float)):
+            latencia = latencia_constante(float(latencia))
+        self._latencia = latencia
+
+        if respuestas is None:
+            self._respuesta = respuesta_por_defecto
+        elif callable(respuestas):
+            self._respuesta = respuestas
+        else:
+            lista: List[str] = list(respuestas)
+            self._respuesta = lambda prompt: lista[self._siguiente_indice() % len(lista)]
+
+        self._rng = random.Random(semilla)
+        self._lock = threading.Lock()
+        self._indice = 0
+        self.llamadas = 0
+
+    def _siguiente_indice(self) -> int:
+        with self._lock:
+            indice = self._indice
+            self._indice += 1
+            return indice
+
+    def _sortear(self) -> tuple:
+        """Sortea latencia y fallo de una llamada de forma thread-safe"""
+        with self._lock:
+            self.llamadas += 1
+            latencia = max(0.0, self._latencia(self._rng))
+            falla = self._rng.random() < self.tasa_error
+        return latencia, falla
+
+    def _construir(self, contenido: str, generation_config: Any = None) -> SimpleNamespace:
+        """Arma una respuesta con la forma de la del SDK (text, candidates y usage_metadata)"""
+        cantidad = 1
+        formato_json = False
+        if isinstance(generation_config, dict):
+            cantidad = max(1, int(generation_config.get("candidate_count", 1)))
+            formato_json = generation_config.get("response_mime_type") == "application/json"
+
+        if self._respuesta is respuesta_por_defecto:
+            textos = [respuesta_por_defecto(contenido, i, formato_json) for i in range(cantidad)]
+        else:
+            textos = [self._respuesta(contenido) for _ in range(cantidad)]
+
+        candidatos = [
+            SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(text=texto)]))
+            for texto in textos
+        ]
+        return SimpleNamespace(text=textos[0], candidates=candidatos,
+                               usage_metadata=self._uso(contenido, textos))
+    
+    @staticmethod
+    def _uso(contenido: str, textos: List[str]) -> SimpleNamespace:
+        """Consumo de tokens estimado, con los mismos campos que usage_metadata del SDK"""
+        entrada = estimar_tokens(contenido)
+        salida = sum(estimar_tokens(texto) for texto in textos)
+        return SimpleNamespace(prompt_token_count=entrada, candidates_token_count=salida,
+                               total_token_count=entrada + salida)
+
+    def _fragmentos(self, texto: str) -> List[SimpleNamespace]:
+        paso = max(1, self.tamano_fragmento)
+        return [SimpleNamespace(text=texto[i:i + paso]) for i in range(0, len(texto), paso)]
+
+    @staticmethod
+    def _timeout(opciones: Dict[str, Any]) -> Optional[float]:
+        """Timeout pedido en request_options, como en el SDK de Gemini"""
+        request_options = opciones.get("request_options")
+        if isinstance(request_options, dict):
+            return request_options.get("timeout")
+        return None
+
+    def generate_content(self, contenido: str, stream: bool = False, **opciones: Any) -> Any:
+        """Simula una llamada bloqueante (o en streaming) al modelo"""
+        latencia, falla = self._sortear()
+        timeout = self._timeout(opciones)
+        if timeout is not None and latencia > timeout:
+            # Igual que DeadlineExceeded de la API (504)
+            time.sleep(timeout)
+            raise ErrorBackendFalso("Plazo de la petición excedido", 504)
+        if falla:
+            time.sleep(latencia)
+            raise ErrorBackendFalso("Error simulado del backend falso", self.codigo_error)
+
+        respuesta = self._construir(contenido, opciones.get("generation_config"))
+        if not stream:
+            time.sleep(latencia)
+            return respuesta
+
+        fragmentos = self._fragmentos(respuesta.text)
+        # Como en el SDK, el último fragmento trae el consumo total
+        if fragmentos:
+            fragmentos[-1].usage_metadata = respuesta.usage_metadata
+        if self.fraccion_primer_fragmento is None:
+            # La latencia se reparte entre los fragmentos
+            pausas = [latencia / max(1, len(fragmentos))] * len(fragmentos)
+        else:
+            # Tiempo hasta el primer fragmento y el resto repartido entre los siguientes
+            inicial = latencia * self.fraccion_primer_fragmento
+            pausas = [inicial] + [(latencia - inicial) / max(1, len(fragmentos) - 1)] * (len(fragmentos) - 1)
+        return _StreamFalso(respuesta, fragmentos, pausas)
+
+    async def generate_content_async(self, contenido: str, **opciones: Any) -> Any:
+        """Simula una llamada asíncrona al modelo"""
+        latencia, falla = self._sortear()
+        timeout = self._timeout(opciones)
+        if timeout is not None and latencia > timeout:
+            await asyncio.sleep(timeout)
+            raise ErrorBackendFalso("Plazo de la petición excedido", 504)
+        await asyncio.sleep(latencia)
+        if falla:
+            raise ErrorBackendFalso("Error simulado del backend falso", self.codigo_error)
+        return self._construir(contenido, opciones.get("generation_config"))
+
+    def con_instruccion_sistema(self, instruccion: str) -> "BackendFalsoConSistema":
+        """Devuelve una vista de este backend con una instrucción del sistema fija"""
+        return BackendFalsoConSistema(self, instruccion)
+
+
+class _StreamFalso:
+    """
+    Respuesta en streaming del backend falso
+
+    Como la del SDK, se itera por fragmentos y también expone 'text', 'candidates'
+    y 'usage_metadata' de la respuesta completa.
+    """
+
+    def __init__(self, respuesta: SimpleNamespace, fragmentos: List[SimpleNamespace], pausas: List[float]):
+        self._respuesta = respuesta
+        self._fragmentos = fragmentos
+        self._pausas = pausas
+
+    def __iter__(self) -> Iterator[SimpleNamespace]:
+        for fragmento, pausa in zip(self._fragmentos, self._pausas):
+            time.sleep(pausa)
+            yield fragmento
+
+    def __getattr__(self, nombre: str) -> Any:
+        return getattr(self._respuesta, nombre)
+
+
+class BackendFalsoConSistema:
+    """Vista de un BackendFalso con instrucción del sistema; comparte latencia, errores y contadores"""
+
+    def __init__(self, base: BackendFalso, instruccion: str):
+        self.base = base
+        self.instruccion_sistema = instruccion
+        self.nombre_modelo = base.nombre_modelo
+
+    def generate_content(self, contenido: str, **opciones: Any) -> Any:
+        return self.base.generate_content(contenido, **opciones)
+
+    async def generate_content_async(self, contenido: str, **opciones: Any) -> Any:
+        return await self.base.generate_content_async(contenido, **opciones)
+
+    def con_instruccion_sistema(self, instruccion: str) -> "BackendFalsoConSistema":
+        return BackendFalsoConSistema(self.base, instruccion)
@@ -0,0 +1,296 @@
+"""
+Caché de respuestas para PROMPTS IA
+Caché en dos niveles (memoria LRU + disco con TTL) para los prompts generados
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+def clave_cache(modelo: str, tipo_medio: str, categoria: str, descripcion: str,
+                estilo: str, detalles_extra: Optional[Dict[str, str]] = None,
+                version_plantilla: Optional[int] = None, modo_salida: str = "texto") -> str:
+    """
+    Calcula la clave canónica de una generación
+
+    Args:
+        modelo (str): Nombre del modelo usado
+        tipo_medio (str): "imagen" o "video"
+        categoria (str): Categoría de generación
+        descripcion (str): Descripción del usuario
+        estilo (str): Estilo artístico
+        detalles_extra (Dict[str, str]): Detalles adicionales de la categoría
+        version_plantilla (int): Versión de la plantilla usada; al cambiarla, las
+            respuestas generadas con la anterior dejan de reutilizarse
+        modo_salida (str): Forma de pedir y leer la respuesta (p. ej. "json/sistema")
+
+    Returns:
+        str: Hash SHA-256 hexadecimal de los parámetros
+    """
+    datos = {
+        "modelo": modelo,
+        "tipo_medio": tipo_medio,
+        "categoria": categoria,
+        "descripcion": descripcion,
+        "estilo": estilo,
+        "detalles": detalles_extra or {},
+        "version_plantilla": version_plantilla,
+        "modo_salida": modo_salida,
+    }
+    canonico = json.dumps(datos, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonico.encode("utf-8")).hexdigest()
+
+
+class CachePrompts:
+    """
+    Caché de dos niveles para los resultados de generación
+
+    El primer nivel es un LRU en memoria; el segundo guarda un archivo JSON
+    por entrada en disco, con expiración (TTL) y un límite de tamaño total.
+    El tamaño del disco se lleva como un total acumulado: el directorio solo se
+    recorre al superar el límite o cada 'intervalo_poda' segundos (para las
+    entradas expiradas), no en cada escritura. Es seguro usarlo desde varios hilos.
+    """
+
+    def __init__(self, directorio: Optional[str] = None, max_memoria: int = 256,
+                 ttl_segundos: float = 7 * 24 * 3600, max_bytes_disco: int = 50 * 1024 * 1024,
+                 intervalo_poda: float = 3600):
+        """
+        Inicializa la caché
+
+        Args:
+            directorio (str): Carpeta del caché en disco (por defecto "cache/" en la raíz del proyecto)
+            max_memoria (int): Número máximo de entradas en memoria
+            ttl_segundos (float): Tiempo de vida de cada entrada
+            max_bytes_disco (int): Tamaño máximo total del caché en disco
+            intervalo_poda (float): Segundos entre recorridos del disco para borrar entradas expiradas
+        """
+        if directorio is None:
+            script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            directorio = os.path.join(script_dir, "cache")
+
+        self.directorio = directorio
+        self.max_memoria = max_memoria
+        self.ttl_segundos = ttl_segundos
+        self.max_bytes_disco = max_bytes_disco
+        self.intervalo_poda = intervalo_poda
+
+        # Nivel 1: clave -> (momento de creación, resultado)
+        self._memoria: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Nivel 2: bytes en disco (None hasta el primer recorrido) y momento del último recorrido
+        self._bytes_disco: Optional[int] = None
+        self._ultima_poda = 0.0
+
+        # Contadores expuestos por estadisticas()
+        self.hits_memoria = 0
+        self.hits_disco = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def obtener(self, clave: str) -> Optional[Dict[str, str]]:
+        """
+        Busca un resultado en memoria y, si no está, en disco
+
+        Args:
+            clave (str): Clave calculada con clave_cache()
+
+        Returns:
+            Dict[str, str] or None: Copia del resultado guardado, o None si no existe o expiró
+        """
+        ahora = time.time()
+
+        with self._lock:
+            entrada = self._memoria.get(clave)
+            if entrada is not None:
+                creado, resultado = entrada
+                if ahora - creado <= self.ttl_segundos:
+                    self._memoria.move_to_end(clave)
+                    self.hits_memoria += 1
+                    return dict(resultado)
+                # Expirada: se descarta de memoria y se sigue buscando en disco
+                del self._memoria[clave]
+
+        entrada = self._leer_disco(clave, ahora)
+
+        with self._lock:
+            if entrada is None:
+                self.misses += 1
+                return None
+            creado, resultado = entrada
+            self._guardar_memoria(clave, creado, resultado)
+            self.hits_disco += 1
+            return dict(resultado)
+
+    def guardar(self, clave: str, resultado: Dict[str, str]) -> None:
+        """
+        Guarda un resultado en ambos niveles
+
+        Args:
+            clave (str): Clave calculada con clave_cache()
+            resultado (Dict[str, str]): Diccionario con 'positivo' y 'negativo'
+        """
+        creado = time.time()
+        resultado = dict(resultado)
+
+        with self._lock:
+            self._guardar_memoria(clave, creado, resultado)
+
+        try:
+            os.makedirs(self.directorio, exist_ok=True)
+            ruta = self._ruta(clave)
+            temporal = ruta + ".tmp"
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump({"creado": creado, "resultado": resultado}, f, ensure_ascii=False)
+                tamano = f.tell()
+            anterior = self._tamano(ruta)
+            os.replace(temporal, ruta)
+        except OSError as e:
+            print(f"Error al guardar caché: {e}")
+            return
+
+        with self._lock:
+            if self._bytes_disco is not None:
+                self._bytes_disco += tamano - anterior
+            podar = (self._bytes_disco is None or self._bytes_disco > self.max_bytes_disco
+                     or creado - self._ultima_poda > self.intervalo_poda)
+        if podar:
+            self._podar_disco()
+
+    def limpiar(self) -> None:
+        """Elimina todas las entradas de memoria y disco"""
+        with self._lock:
+            self._memoria.clear()
+
+        if not os.path.isdir(self.directorio):
+            return
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith(".json"):
+                try:
+                    os.remove(os.path.join(self.directorio, nombre))
+                except OSError:
+                    pass
+        with self._lock:
+            self._bytes_disco = 0
+
+    def estadisticas(self) -> Dict[str, int]:
+        """
+        Devuelve los contadores del caché
+
+        Returns:
+            Dict[str, int]: hits (memoria y disco), misses, evictions y entradas en memoria
+        """
+        with self._lock:
+            return {
+                "hits_memoria": self.hits_memoria,
+                "hits_disco": self.hits_disco,
+                "hits": self.hits_memoria + self.hits_disco,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entradas_memoria": len(self._memoria)
+            }
+
+    # ==================== UTILIDADES INTERNAS ====================
+
+    def _ruta(self, clave: str) -> str:
+        """Ruta del archivo en disco para una clave"""
+        return os.path.join(self.directorio, f"{clave}.json")
+
+    @staticmethod
+    def _tamano(ruta: str) -> int:
+        """Tamaño de un archivo (0 si no existe)"""
+        try:
+            return os.path.getsize(ruta)
+        except OSError:
+            return 0
+
+    def _guardar_memoria(self, clave: str, creado: float, resultado: Dict[str, str]) -> None:
+        """Inserta en el LRU de memoria (requiere tener el lock)"""
+        self._memoria[clave] = (creado, resultado)
+        self._memoria.move_to_end(clave)
+        while len(self._memoria) > self.max_memoria:
+            self._memoria.popitem(last=False)
+            self.evictions += 1
+
+    def _leer_disco(self, clave: str, ahora: float) -> Optional[tuple]:
+        """Lee una entrada del disco, eliminándola si expiró o está dañada"""
+        ruta = self._ruta(clave)
+        try:
+            with open(ruta, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+        except ValueError:
+            # Entrada dañada (JSON o UTF-8 inválido): se borra para no releerla en cada consulta
+            self._eliminar_disco(ruta)
+            return None
+        except OSError:
+            return None
+
+        creado = datos.get("creado", 0) if isinstance(datos, dict) else 0
+        if not isinstance(datos, dict) or ahora - creado > self.ttl_segundos:
+            self._eliminar_disco(ruta)
+            return None
+
+        return creado, datos.get("resultado", {})
+
+    def _eliminar_disco(self, ruta: str) -> None:
+        """Borra una entrada del disco y descuenta su tamaño del total acumulado"""
+        tamano = self._tamano(ruta)
+        try:
+            os.remove(ruta)
+        except OSError:
+            return
+        with self._lock:
+            self.evictions += 1
+            if self._bytes_disco is not None:
+                self._bytes_disco -= tamano
+
+    def _podar_disco(self) -> None:
+        """
+        Recorre el disco: elimina las entradas expiradas y, si se supera el tamaño
+        máximo, las más antiguas hasta bajar al 90 % (para no repetir el recorrido
+        en las escrituras siguientes); después recalcula el total acumulado
+        """
+        ahora = time.time()
+        archivos = []
+        total = 0
+
+        try:
+            nombres = os.listdir(self.directorio)
+        except OSError:
+            return
+
+        for nombre in nombres:
+            if not nombre.endswith(".json"):
+                continue
+            ruta = os.path.join(self.directorio, nombre)
+            try:
+                info = os.stat(ruta)
+            except OSError:
+                continue
+            archivos.append((info.st_mtime, info.st_size, ruta))
+            total += info.st_size
+
+        eliminados = 0
+        objetivo = self.max_bytes_disco * 0.9 if total > self.max_bytes_disco else self.max_bytes_disco
+        # Más antiguos primero
+        archivos.sort()
+        for mtime, tamano, ruta in archivos:
+            expirado = ahora - mtime > self.ttl_segundos
+            if not expirado and total <= objetivo:
+                break
+            try:
+                os.remove(ruta)
+                total -= tamano
+                eliminados += 1
+            except OSError:
+                pass
+
+        with self._lock:
+            self.evictions += eliminados
+            self._bytes_disco = total
+            self._ultima_poda = ahora
@@ -0,0 +1,124 @@
+"""
+Cancelación y plazos para PROMPTS IA
+Token de cancelación compartido entre la interfaz, el generador y los hilos de lote
+"""
+import threading
+import time
+from typing import List, Optional
+
+
+class GeneracionCancelada(Exception):
+    """La generación se canceló antes de terminar"""
+
+
+class PlazoExcedido(GeneracionCancelada):
+    """La generación superó su plazo (no se reintenta, a diferencia de un timeout de red)"""
+
+
+class TokenCancelacion:
+    """
+    Señal de cancelación con plazo opcional
+
+    Se crea uno por generación (o por lote) y se pasa a las llamadas del generador,
+    que lo comprueban antes de cada intento, durante las esperas entre reintentos
+    y entre fragmentos en streaming. El tiempo restante se envía al backend como
+    timeout de la petición, de modo que ninguna llamada sobrevive a su plazo.
+    """
+
+    def __init__(self, plazo: Optional[float] = None):
+        """
+        Inicializa el token
+
+        Args:
+            plazo (float): Segundos disponibles desde ahora (None = sin plazo)
+        """
+        self._evento = threading.Event()
+        self.limite = time.monotonic() + plazo if plazo is not None else None
+        self._derivados: List["TokenCancelacion"] = []
+        self._lock = threading.Lock()
+
+    def cancelar(self) -> None:
+        """Cancela la generación (y sus tokens derivados); las esperas en curso se despiertan de inmediato"""
+        self._evento.set()
+        with self._lock:
+            derivados = list(self._derivados)
+        for derivado in derivados:
+            derivado.cancelar()
+
+    def derivado(self) -> "TokenCancelacion":
+        """
+        Crea un token con el mismo plazo que se cancela junto con este
+
+        Sirve para cancelar un intento concreto (p. ej. el perdedor de una petición
+        duplicada) sin cancelar la generación completa.
+
+        Returns:
+            TokenCancelacion: Token hijo
+        """
+        hijo = TokenCancelacion()
+        hijo.limite = self.limite
+        with self._lock:
+            self._derivados.append(hijo)
+        if self._evento.is_set():
+            hijo.cancelar()
+        return hijo
+
+    def liberar(self, derivado: "TokenCancelacion") -> None:
+        """Olvida un token derivado que ya terminó"""
+        with self._lock:
+            if derivado in self._derivados:
+                self._derivados.remove(derivado)
+
+    @property
+    def cancelado(self) -> bool:
+        """True si se canceló o venció el plazo"""
+        return self._evento.is_set() or self.vencido
+
+    @property
+    def cancelacion_solicitada(self) -> bool:
+        """True solo si se llamó a cancelar() (no por vencimiento del plazo)"""
+        return self._evento.is_set()
+
+    @property
+    def vencido(self) -> bool:
+        """True si el plazo ya pasó"""
+        return self.limite is not None and time.monotonic() >= self.limite
+
+    def restante(self) -> Optional[float]:
+        """Segundos que quedan hasta el plazo (None si no hay plazo)"""
+        if self.limite is None:
+            return None
+        return max(0.0, self.limite - time.monotonic())
+
+    def verificar(self) -> None:
+        """
+        Lanza una excepción si la generación ya no debe continuar
+
+        Raises:
+            GeneracionCancelada: Si se llamó a cancelar()
+            PlazoExcedido: Si venció el plazo
+        """
+        if self._evento.is_set():
+            raise GeneracionCancelada("Generación cancelada")
+        if self.vencido:
+            raise PlazoExcedido("La generación superó su plazo")
+
+    def esperar(self, segundos: float) -> None:
+        """
+        Duerme hasta 'segundos', despertando antes si se cancela o vence el plazo
+
+        Args:
+            segundos (float): Tiempo a esperar
+
+        Raises:
+            GeneracionCancelada: Si se cancela o vence el plazo durante la espera
+        """
+        restante = self.restante()
+        if restante is not None and restante < segundos:
+            # La espera terminaría después del plazo: no tiene sentido hacerla entera
+            self._evento.wait(restante)
+            self.verificar()
+            raise PlazoExcedido("La generación superó su plazo")
+
+        self._evento.wait(segundos)
+        self.verificar()
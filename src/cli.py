@@ -0,0 +1,267 @@
+"""
+Línea de comandos de PROMPTS IA
+Genera prompts en lote a partir de un archivo CSV o JSONL, sin interfaz gráfica
+
+Uso:
+    python -m src.cli peticiones.csv -o resultados.jsonl
+    python -m src.cli peticiones.jsonl -o resultados.jsonl --concurrencia 8
+    python -m src.cli peticiones.csv -o resultados.jsonl --backend falso   # sin API key ni red
+
+Cada línea de la salida es {"id", "spec", "resultado", "error"} y se escribe en cuanto
+termina su generación. Si la salida ya existe, las filas completadas sin error se omiten,
+de modo que un trabajo interrumpido se reanuda con el mismo comando.
+
+Este módulo no importa customtkinter: funciona en servidores sin pantalla.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, TextIO
+
+from .backends import BackendFalso, latencia_lognormal
+from .cancellation import TokenCancelacion
+from .generator import MODO_LOCAL, MODO_REMOTO, MODOS, GeminiPromptGenerator
+from .templates import obtener_registro
+from .utils import cargar_api_key
+
+
+def _leer_csv(ruta: str) -> Iterator[Dict[str, Any]]:
+    with open(ruta, 'r', encoding='utf-8-sig', newline='') as f:
+        for numero, fila in enumerate(csv.DictReader(f), start=1):
+            spec = {k.strip(): v.strip() for k, v in fila.items() if k and v and v.strip()}
+            if "detalles" in spec:
+                try:
+                    spec["detalles"] = json.loads(spec["detalles"])
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Fila {numero}: 'detalles' no es un JSON válido ({e})")
+            spec.setdefault("id", str(numero))
+            yield spec
+
+
+def _leer_jsonl(ruta: str) -> Iterator[Dict[str, Any]]:
+    with open(ruta, 'r', encoding='utf-8') as f:
+        for numero, linea in enumerate(f, start=1):
+            if not linea.strip():
+                continue
+            try:
+                spec = json.loads(linea)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Línea {numero}: JSON inválido ({e})")
+            if not isinstance(spec, dict):
+                raise ValueError(f"Línea {numero}: se esperaba un objeto JSON")
+            spec.setdefault("id", str(numero))
+            yield spec
+
+
+def leer_especificaciones(ruta: str) -> List[Dict[str, Any]]:
+    """
+    Lee las especificaciones de generación de un archivo CSV o JSONL
+
+    Las filas sin 'id' reciben su número de fila (o de línea) como identificador,
+    que es lo que permite reanudar el trabajo.
+
+    Args:
+        ruta (str): Archivo .csv o .jsonl
+
+    Returns:
+        List[Dict]: Especificaciones normalizadas
+    """
+    if os.path.splitext(ruta)[1].lower() == ".csv":
+        specs = list(_leer_csv(ruta))
+    else:
+        specs = list(_leer_jsonl(ruta))
+
+    vistos: Set[str] = set()
+    for spec in specs:
+        normalizar_spec(spec)
+        if spec["id"] in vistos:
+            raise ValueError(f"Identificador repetido: {spec['id']!r}")
+        vistos.add(spec["id"])
+    return specs
+
+
+def normalizar_spec(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Completa una especificación y acepta los nombres que muestra la interfaz
+
+    La categoría puede ser el identificador ("video_generate") o la etiqueta
+    ("🎬 Generación desde Cero"), y el estilo el valor o la etiqueta de la interfaz.
+
+    Args:
+        spec (Dict): Especificación (se modifica en el sitio)
+
+    Returns:
+        Dict: La misma especificación
+    """
+    spec["id"] = str(spec.get("id", ""))
+    tipo_medio = spec.setdefault("tipo_medio", "imagen")
+    if tipo_medio not in ("imagen", "video"):
+        raise ValueError(f"tipo_medio inválido en {spec['id']!r}: {tipo_medio!r} (usa imagen o video)")
+
+    etiquetas = obtener_registro().etiquetas(tipo_medio)
+    if spec.get("categoria") in etiquetas:
+        spec["categoria"] = etiquetas[spec["categoria"]]
+
+    estilo = spec.get("estilo") or "auto-detectar el mejor estilo"
+    spec["estilo"] = GeminiPromptGenerator.estilos.get(estilo, estilo)
+    return spec
+
+
+def ids_completados(ruta: str) -> Set[str]:
+    """
+    Identificadores ya generados sin error en una salida anterior
+
+    Las líneas incompletas (p. ej. por un corte a mitad de escritura) se ignoran.
+
+    Args:
+        ruta (str): Archivo JSONL de salida
+
+    Returns:
+        Set[str]: Identificadores a omitir
+    """
+    completados: Set[str] = set()
+    if not os.path.exists(ruta):
+        return completados
+    with open(ruta, 'r', encoding='utf-8') as f:
+        for linea in f:
+            try:
+                registro = json.loads(linea)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(registro, dict) and registro.get("resultado") and not registro.get("error"):
+                completados.add(str(registro.get("id")))
+    return completados
+
+
+def _abrir_salida(ruta: str) -> TextIO:
+    """Abre la salida para añadir líneas, cerrando antes una última línea incompleta"""
+    if ruta == "-":
+        return sys.stdout
+    directorio = os.path.dirname(os.path.abspath(ruta))
+    os.makedirs(directorio, exist_ok=True)
+    salida = open(ruta, 'a+', encoding='utf-8')
+    if salida.tell() > 0:
+        salida.seek(salida.tell() - 1)
+        if salida.read(1) != "\n":
+            salida.write("\n")
+    return salida
+
+
+def crear_generador(backend: str = "gemini", modo: str = MODO_REMOTO, usar_cache: bool = True,
+                    api_key: Optional[str] = None) -> GeminiPromptGenerator:
+    """
+    Crea el generador para trabajos sin interfaz
+
+    Args:
+        backend (str): "gemini" o "falso" (sin red, para pruebas)
+        modo (str): "remoto", "local" o "auto"
+        usar_cache (bool): Si se reutilizan resultados ya generados
+        api_key (str): API key de Gemini (por defecto GEMINI_API_KEY o api_key.txt)
+
+    Returns:
+        GeminiPromptGenerator: Generador listo
+    """
+    if backend == "falso":
+        return GeminiPromptGenerator(backend=BackendFalso(latencia=latencia_lognormal(0.05)),
+                                     usar_cache=usar_cache, modo=modo)
+
+    api_key = api_key or os.environ.get("GEMINI_API_KEY") or cargar_api_key()
+    if not api_key and modo != MODO_LOCAL:
+        raise ValueError("No se encontró la API key: define GEMINI_API_KEY o crea api_key.txt")
+    return GeminiPromptGenerator(api_key, usar_cache=usar_cache, modo=modo)
+
+
+def ejecutar(entrada: str, salida: str, concurrencia: int = 4, backend: str = "gemini",
+             modo: str = MODO_REMOTO, usar_cache: bool = True, silencioso: bool = False) -> int:
+    """
+    Genera todas las especificaciones pendientes de 'entrada' y escribe los resultados en 'salida'
+
+    Args:
+        entrada (str): Archivo CSV o JSONL con las especificaciones
+        salida (str): Archivo JSONL de resultados ("-" para stdout, sin reanudación)
+        concurrencia (int): Generaciones simultáneas
+        backend (str): "gemini" o "falso"
+        modo (str): "remoto", "local" o "auto"
+        usar_cache (bool): Si se reutilizan resultados ya generados
+        silencioso (bool): Si no se muestra el progreso en stderr
+
+    Returns:
+        int: Código de salida (0 = todo bien, 1 = hubo errores, 130 = interrumpido)
+    """
+    specs = leer_especificaciones(entrada)
+    completados = ids_completados(salida) if salida != "-" else set()
+    pendientes = [spec for spec in specs if spec["id"] not in completados]
+
+    def informar(texto: str) -> None:
+        if not silencioso:
+            print(texto, file=sys.stderr, flush=True)
+
+    informar(f"{len(specs)} peticiones, {len(specs) - len(pendientes)} ya completadas, {len(pendientes)} pendientes")
+    if not pendientes:
+        return 0
+
+    generador = crear_generador(backend, modo, usar_cache)
+    cancelacion = TokenCancelacion()
+    inicio = time.perf_counter()
+    correctas = errores = 0
+
+    archivo = _abrir_salida(salida)
+    try:
+        for item in generador.generar_lote_iter(pendientes, max_workers=concurrencia, cancelacion=cancelacion):
+            spec = item["spec"]
+            registro = {"id": spec["id"], "spec": spec, "resultado": item["resultado"], "error": item["error"]}
+            archivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            archivo.flush()
+
+            if item["error"] is None:
+                correctas += 1
+            else:
+                errores += 1
+            informar(f"[{correctas + errores}/{len(pendientes)}] {spec['id']}: {item['error'] or 'ok'}")
+    except KeyboardInterrupt:
+        # Abandonar las llamadas en curso; lo ya escrito se conserva para reanudar
+        cancelacion.cancelar()
+        informar(f"Interrumpido: {correctas} completadas; vuelve a ejecutar el mismo comando para continuar")
+        return 130
+    finally:
+        if archivo is not sys.stdout:
+            archivo.close()
+
+    informar(f"{correctas} correctas, {errores} con error en {time.perf_counter() - inicio:.1f} s")
+    return 1 if errores else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Punto de entrada de python -m src.cli"""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli",
+        description="PROMPTS IA - Generación de prompts en lote sin interfaz gráfica"
+    )
+    parser.add_argument("entrada", help="Archivo .csv o .jsonl con tipo_medio, categoria, descripcion, estilo, detalles")
+    parser.add_argument("-o", "--salida", required=True,
+                        help="Archivo .jsonl de resultados (si existe, se reanuda); '-' para stdout")
+    parser.add_argument("-c", "--concurrencia", type=int, default=4, help="Generaciones simultáneas (por defecto 4)")
+    parser.add_argument("--backend", choices=("gemini", "falso"), default="gemini",
+                        help="'falso' genera respuestas locales de prueba sin red ni API key")
+    parser.add_argument("--modo", choices=MODOS, default=MODO_REMOTO,
+                        help="remoto: solo Gemini; local: generador local; auto: Gemini con respaldo local")
+    parser.add_argument("--sin-cache", action="store_true", help="No reutilizar resultados del caché")
+    parser.add_argument("-q", "--silencioso", action="store_true", help="No mostrar el progreso en stderr")
+    args = parser.parse_args(argv)
+
+    if args.concurrencia < 1:
+        parser.error("--concurrencia debe ser al menos 1")
+
+    try:
+        return ejecutar(args.entrada, args.salida, args.concurrencia, args.backend, args.modo,
+                        not args.sin_cache, args.silencioso)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
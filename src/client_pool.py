@@ -0,0 +1,122 @@
+"""
+Pool de clientes de Gemini para PROMPTS IA
+Configura el SDK una sola vez por proceso y comparte los modelos (y sus conexiones) entre generadores
+"""
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+class PoolClientes:
+    """
+    Clientes de Gemini compartidos por todo el proceso
+
+    genai.configure() es estado global: cada llamada descarta los clientes del SDK
+    y con ellos el canal ya abierto, así que la siguiente petición vuelve a pagar la
+    conexión y el handshake TLS. El pool solo reconfigura si cambia la API key y
+    reutiliza un GenerativeModel por (modelo, instrucción del sistema), de modo que
+    generadores, hilos de lote y ventanas comparten el mismo canal persistente.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._api_key: Optional[str] = None
+        self._modelos: Dict[Tuple[str, Optional[str]], Any] = {}
+        self.configuraciones = 0
+        self.modelos_creados = 0
+        self.modelos_reutilizados = 0
+        self.latencia_calentamiento: Optional[float] = None
+
+    def _configurar(self, api_key: str) -> Any:
+        """Configura el SDK si la API key es nueva; debe llamarse con el lock tomado"""
+        # Importación diferida: el SDK es pesado y no se necesita con otros backends
+        import google.generativeai as genai
+
+        if api_key != self._api_key:
+            genai.configure(api_key=api_key)
+            self._api_key = api_key
+            # Los modelos anteriores quedan ligados a la configuración descartada
+            self._modelos.clear()
+            self.configuraciones += 1
+        return genai
+
+    def modelo(self, api_key: str, nombre_modelo: str, instruccion_sistema: Optional[str] = None) -> Any:
+        """
+        Devuelve el GenerativeModel compartido para un modelo e instrucción del sistema
+
+        Args:
+            api_key (str): API key de Google Gemini
+            nombre_modelo (str): Modelo de Gemini (p. ej. 'gemini-2.5-flash')
+            instruccion_sistema (str): Instrucción del sistema fija del modelo (opcional)
+
+        Returns:
+            google.generativeai.GenerativeModel: Modelo listo para generate_content
+        """
+        clave = (nombre_modelo, instruccion_sistema)
+        with self._lock:
+            genai = self._configurar(api_key)
+            modelo = self._modelos.get(clave)
+            if modelo is not None:
+                self.modelos_reutilizados += 1
+                return modelo
+
+            if instruccion_sistema is None:
+                modelo = genai.GenerativeModel(nombre_modelo)
+            else:
+                modelo = genai.GenerativeModel(nombre_modelo, system_instruction=instruccion_sistema)
+            self._modelos[clave] = modelo
+            self.modelos_creados += 1
+            return modelo
+
+    def calentar(self, api_key: str, nombre_modelo: str) -> bool:
+        """
+        Abre la conexión con la API antes de la primera petición del usuario
+
+        Usa count_tokens, que recorre el mismo cliente que generate_content pero no
+        consume cuota de generación.
+
+        Args:
+            api_key (str): API key de Google Gemini
+            nombre_modelo (str): Modelo de Gemini a calentar
+
+        Returns:
+            bool: True si la conexión quedó establecida
+        """
+        try:
+            inicio = time.perf_counter()
+            self.modelo(api_key, nombre_modelo).count_tokens("hola")
+            self.latencia_calentamiento = time.perf_counter() - inicio
+            return True
+        except Exception as e:
+            print(f"Error al calentar la conexión con Gemini: {e}")
+            return False
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """
+        Devuelve los contadores del pool
+
+        Returns:
+            Dict: configuraciones, modelos creados/reutilizados y latencia del calentamiento
+        """
+        with self._lock:
+            return {
+                "configuraciones": self.configuraciones,
+                "modelos_en_pool": len(self._modelos),
+                "modelos_creados": self.modelos_creados,
+                "modelos_reutilizados": self.modelos_reutilizados,
+                "latencia_calentamiento": self.latencia_calentamiento,
+            }
+
+
+# Pool único del proceso
+_pool_global: Optional[PoolClientes] = None
+_lock_pool = threading.Lock()
+
+
+def obtener_pool() -> PoolClientes:
+    """Devuelve el pool de clientes del proceso (lo crea la primera vez)"""
+    global _pool_global
+    with _lock_pool:
+        if _pool_global is None:
+            _pool_global = PoolClientes()
+        return _pool_global
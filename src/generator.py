@@ -2,8 +2,31 @@
 Generador de Prompts con IA (Gemini 2.5 Flash)
 Soporte para generación de prompts de imágenes y videos
 """
-from typing import Dict, Optional
-import google.generativeai as genai
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as TiempoAgotadoFuturo
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from .backends import BackendFalso, BackendGemini, BackendLLM
+from .cache import CachePrompts, clave_cache
+from .cancellation import GeneracionCancelada, PlazoExcedido, TokenCancelacion
+from .hedging import PoliticaCobertura
+from .metrics import RegistroMetricas, Traza, obtener_metricas
+from .offline import GeneradorLocal
+from .parser import ESQUEMA_RESPUESTA, ParserIncremental, parsear_json, parsear_texto
+from .rate_limit import LimitadorTasa, PoliticaReintentos, estimar_tokens
+from .routing import EnrutadorModelos
+from .templates import RegistroPlantillas, obtener_registro
+from .usage import extraer_uso, sumar_uso
+
+T = TypeVar("T")
+
+# Modos de generación: solo la API, solo el generador local, o la API con respaldo local
+MODO_REMOTO = "remoto"
+MODO_LOCAL = "local"
+MODO_AUTO = "auto"
+MODOS = (MODO_REMOTO, MODO_LOCAL, MODO_AUTO)
 
 
 class GeminiPromptGenerator:
@@ -14,48 +37,133 @@ class GeminiPromptGenerator:
     prompts optimizados para herramientas de generación de imágenes y videos con IA.
     """
     
-    def __init__(self, api_key: str):
+    # Estilos artísticos disponibles (a nivel de clase: la interfaz los muestra antes de
+    # que el generador termine de inicializarse)
+    estilos = {
+        "📸 Realista/Fotográfico": "realista/fotográfico",
+        "🎨 Artístico/Digital Art": "artístico/digital art",
+        "🌸 Anime/Manga": "anime/manga",
+        "🎮 3D/Render": "3D/render",
+        "🖼️ Pintura Clásica": "pintura clásica",
+        "🎬 Cinematográfico": "cinematográfico",
+        "✨ Auto-detectar": "auto-detectar el mejor estilo"
+    }
+    
+    def __init__(self, api_key: Optional[str] = None, usar_cache: bool = True, cache: Optional[CachePrompts] = None,
+                 limitador: Optional[LimitadorTasa] = None,
+                 reintentos: Optional[PoliticaReintentos] = None,
+                 backend: Optional[BackendLLM] = None,
+                 plantillas: Optional[RegistroPlantillas] = None,
+                 instruccion_sistema: bool = False,
+                 salida_json: bool = False,
+                 cobertura: Optional[PoliticaCobertura] = None,
+                 nombre_modelo: str = 'gemini-2.5-flash',
+                 enrutador: Optional[EnrutadorModelos] = None,
+                 modo: str = MODO_REMOTO,
+                 plazo_respaldo: float = 10.0,
+                 usar_metricas: bool = True,
+                 metricas: Optional[RegistroMetricas] = None):
         """
         Inicializa el generador con la API key de Gemini
         
         Args:
-            api_key (str): API key de Google Gemini
-        """
-        # Configurar la API de Gemini con la clave proporcionada
-        genai.configure(api_key=api_key)
-        
-        # Inicializar el modelo Gemini 2.5 Flash
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
-        
-        # Categorías de generación para IMÁGENES
-        self.categorias_imagen = {
-            "🎭 Transformación de Rostro": "face_transform",
-            "🖼️ Generación desde Cero": "generate",
-            "🎨 Modificación de Imagen": "modify",
-            "✨ Efectos Especiales": "effects"
-        }
-        
-        # Categorías de generación para VIDEOS
-        self.categorias_video = {
-            "🎬 Generación desde Cero": "video_generate",
-            "🖼️➡️🎬 Imagen a Video": "image_to_video",
-            "✨ Efectos y Transiciones": "video_effects",
-            "🎥 Movimientos de Cámara": "camera_movement"
-        }
-        
-        # Estilos artísticos disponibles
-        self.estilos = {
-            "📸 Realista/Fotográfico": "realista/fotográfico",
-            "🎨 Artístico/Digital Art": "artístico/digital art",
-            "🌸 Anime/Manga": "anime/manga",
-            "🎮 3D/Render": "3D/render",
-            "🖼️ Pintura Clásica": "pintura clásica",
-            "🎬 Cinematográfico": "cinematográfico",
-            "✨ Auto-detectar": "auto-detectar el mejor estilo"
-        }
+            api_key (str): API key de Google Gemini (no se usa si se pasa 'backend')
+            usar_cache (bool): Si se reutilizan respuestas ya generadas con los mismos parámetros
+            cache (CachePrompts): Caché a usar (por defecto uno en memoria + disco en "cache/")
+            limitador (LimitadorTasa): Límite de peticiones/tokens por minuto (por defecto sin límite)
+            reintentos (PoliticaReintentos): Política ante errores 429/503 (por defecto PoliticaReintentos())
+            backend (BackendLLM): Backend alternativo (p. ej. BackendFalso); por defecto Gemini 2.5 Flash
+            plantillas (RegistroPlantillas): Registro de plantillas (por defecto el compartido del proceso)
+            instruccion_sistema (bool): Si las instrucciones fijas de cada categoría se configuran una vez
+                como instrucción del sistema del modelo y solo se envían los datos variables
+            salida_json (bool): Si se pide al modelo una salida estructurada {"positivo", "negativo"}
+                (response_schema) en lugar del formato POSITIVE:/NEGATIVE: por líneas
+            cobertura (PoliticaCobertura): Si se indica, las llamadas que superan el p95 de latencia
+                se duplican y se usa la primera respuesta; el intento perdedor se detiene en su
+                siguiente fragmento (no aplica a las generaciones en modo streaming)
+            nombre_modelo (str): Modelo de Gemini a usar si no se pasa 'backend' ni 'enrutador'
+            enrutador (EnrutadorModelos): Si se indica, cada petición va al modelo que elija el
+                enrutador según la entrada, la categoría y la latencia/errores observados
+            modo (str): "remoto" (solo Gemini), "local" (solo el generador local, sin red) o
+                "auto" (Gemini, con el generador local como respaldo si no responde a tiempo o falla)
+            plazo_respaldo (float): En modo "auto", segundos que se espera a Gemini antes de
+                responder con el generador local
+            usar_metricas (bool): Si se mide la duración de cada etapa de las generaciones
+            metricas (RegistroMetricas): Registro a usar (por defecto el del proceso, en "metrics/")
+        """
+        if modo not in MODOS:
+            raise ValueError(f"Modo desconocido: {modo!r} (usa {', '.join(MODOS)})")
+        
+        self.modo = modo
+        self.plazo_respaldo = plazo_respaldo
+        self.respuestas_locales = 0
+        
+        if modo == MODO_LOCAL and backend is None and enrutador is None:
+            # Sin conexión no se usa el backend (ni hace falta API key ni cargar el SDK)
+            backend = BackendFalso(nombre_modelo="local")
+        
+        if backend is None:
+            if enrutador is not None:
+                # La última opción del enrutador es la general (calentamiento, usos sin enrutar)
+                backend = enrutador.opciones[-1].backend
+            elif not api_key:
+                raise ValueError("Se requiere una API key o un backend")
+            else:
+                backend = BackendGemini(api_key, nombre_modelo)
+        
+        self.backend = backend
+        self.enrutador = enrutador
+        # Con enrutador, la clave del caché usa el conjunto de modelos (intercambiables entre sí)
+        self.nombre_modelo = enrutador.nombre_modelo if enrutador is not None else backend.nombre_modelo
+        
+        # Caché de respuestas (memoria LRU + disco con TTL)
+        if usar_cache:
+            self.cache = cache if cache is not None else CachePrompts()
+        else:
+            self.cache = None
+        
+        # Control de tasa y reintentos ante errores transitorios de la API
+        self.limitador = limitador
+        self.reintentos = reintentos if reintentos is not None else PoliticaReintentos()
+        
+        # Duplicado de las llamadas lentas para recortar la cola de latencia (opcional)
+        self.cobertura = cobertura
+        
+        # Generaciones en curso por clave, para compartir una sola llamada entre peticiones idénticas
+        self._en_vuelo: Dict[str, Future] = {}
+        self._lock_en_vuelo = threading.Lock()
+        self.solicitudes_coalescidas = 0
+        
+        # Plantillas de prompts por categoría (compiladas una sola vez por proceso)
+        self.plantillas = plantillas if plantillas is not None else obtener_registro()
+        
+        # Un backend por modelo e instrucción del sistema (una por categoría), creado la primera vez que se usa
+        self.instruccion_sistema = instruccion_sistema
+        self._backends_sistema: Dict[Tuple[str, str], BackendLLM] = {}
+        self._lock_backends = threading.Lock()
+        
+        # Salida estructurada en JSON; el parser por líneas queda como respaldo
+        self.salida_json = salida_json
+        self.respuestas_no_json = 0
+        
+        # Tiempos por etapa de cada generación (archivo JSONL rotativo + percentiles en memoria)
+        if usar_metricas:
+            self.metricas = metricas if metricas is not None else obtener_metricas()
+        else:
+            self.metricas = None
+        
+        # Prompts compuestos localmente con bancos de frases (modo local y respaldo)
+        self.local = GeneradorLocal(self.plantillas)
+        
+        # Categorías de generación para IMÁGENES y VIDEOS (etiqueta -> categoría)
+        self.categorias_imagen = self.plantillas.etiquetas("imagen")
+        self.categorias_video = self.plantillas.etiquetas("video")
     
     def generar_prompt_con_ia(self, tipo_medio: str, categoria: str, descripcion: str, 
-                             estilo: str, detalles_extra: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+                             estilo: str, detalles_extra: Optional[Dict[str, str]] = None,
+                             stream: bool = False,
+                             al_recibir: Optional[Callable[[str, str], None]] = None,
+                             cancelacion: Optional[TokenCancelacion] = None) -> Dict[str, str]:
         """
         Usa Gemini 2.5 Flash para generar un prompt optimizado según el tipo de medio y categoría
         
@@ -65,415 +173,574 @@ class GeminiPromptGenerator:
             descripcion (str): Descripción del usuario sobre el contenido deseado
             estilo (str): Estilo artístico seleccionado
             detalles_extra (Dict[str, str]): Detalles adicionales específicos de la categoría
+            stream (bool): Si se reciben los fragmentos de la respuesta a medida que se generan
+                (en modo salida_json el resultado se entrega completo al terminar)
+            al_recibir (Callable[[str, str], None]): Se llama con (seccion, texto) por cada
+                fragmento parseado, donde seccion es 'positivo' o 'negativo'
+            cancelacion (TokenCancelacion): Permite cancelar la generación y fija su plazo;
+                el tiempo restante se envía al backend como timeout de la petición
             
         Returns:
-            Dict[str, str]: Diccionario con 'positivo' y 'negativo' prompts
+            Dict[str, str]: Diccionario con 'positivo' y 'negativo' prompts, más 'uso' (tokens
+                consumidos, solo si se llamó al modelo) u 'origen': 'local' si lo compuso el generador local
+            
+        Raises:
+            GeneracionCancelada: Si se cancela (PlazoExcedido si vence el plazo, salvo en modo "auto")
         """
+        traza = Traza(self.metricas, "generar_prompt", tipo_medio=tipo_medio, categoria=categoria,
+                      modelo=self.nombre_modelo, modo=self.modo, stream=stream,
+                      bytes_descripcion=len(descripcion.encode("utf-8")))
         
-        # Seleccionar el prompt del sistema según el tipo de medio y categoría
-        if tipo_medio == "imagen":
-            sistema_prompt = self._generar_prompt_imagen(categoria, descripcion, estilo, detalles_extra)
-        else:  # video
-            sistema_prompt = self._generar_prompt_video(categoria, descripcion, estilo, detalles_extra)
+        def remoto(token: Optional[TokenCancelacion]) -> Dict[str, str]:
+            return self._generar_remoto(tipo_medio, categoria, descripcion, estilo, detalles_extra,
+                                        stream, al_recibir, token, traza)
         
-        # Enviar el prompt al modelo Gemini 2.5 Flash
-        response = self.model.generate_content(sistema_prompt)
-        texto = response.text
+        def local() -> Dict[str, str]:
+            with traza.etapa("local"):
+                resultado = self._generar_local(tipo_medio, categoria, descripcion, estilo, detalles_extra)
+            traza.resultado = "local" if self.modo == MODO_LOCAL else "respaldo_local"
+            traza.anotar(modelo="local")
+            self._notificar_resultado(resultado, al_recibir)
+            return resultado
         
-        # Parsear la respuesta para extraer los prompts positivo y negativo
-        return self._parsear_respuesta(texto)
+        with traza:
+            resultado = self._segun_modo(remoto, local, cancelacion)
+            traza.anotar(bytes_salida=len((resultado["positivo"] + resultado["negativo"]).encode("utf-8")))
+            return resultado
     
-    def _generar_prompt_imagen(self, categoria: str, descripcion: str, estilo: str, 
-                               detalles: Optional[Dict[str, str]]) -> str:
-        """Genera el prompt del sistema para imágenes según la categoría"""
-        if categoria == "face_transform":
-            return self._prompt_transformacion_rostro(descripcion, estilo, detalles)
-        elif categoria == "modify":
-            return self._prompt_modificacion_imagen(descripcion, estilo, detalles)
-        elif categoria == "effects":
-            return self._prompt_efectos_especiales(descripcion, estilo, detalles)
-        else:  # generate
-            return self._prompt_generacion_desde_cero(descripcion, estilo)
-    
-    def _generar_prompt_video(self, categoria: str, descripcion: str, estilo: str,
-                             detalles: Optional[Dict[str, str]]) -> str:
-        """Genera el prompt del sistema para videos según la categoría"""
-        if categoria == "video_generate":
-            return self._prompt_video_desde_cero(descripcion, estilo, detalles)
-        elif categoria == "image_to_video":
-            return self._prompt_video_desde_imagen(descripcion, estilo, detalles)
-        elif categoria == "video_effects":
-            return self._prompt_video_efectos(descripcion, estilo, detalles)
-        else:  # camera_movement
-            return self._prompt_video_camara(descripcion, estilo, detalles)
+    def _generar_remoto(self, tipo_medio: str, categoria: str, descripcion: str,
+                        estilo: str, detalles_extra: Optional[Dict[str, str]],
+                        stream: bool, al_recibir: Optional[Callable[[str, str], None]],
+                        cancelacion: Optional[TokenCancelacion],
+                        traza: Optional[Traza] = None) -> Dict[str, str]:
+        """Genera con el modelo (caché, single-flight, streaming); ver generar_prompt_con_ia"""
+        if traza is None:
+            traza = Traza(None, "generar_prompt")
+        clave = self._clave_cache(tipo_medio, categoria, descripcion, estilo, detalles_extra)
+        
+        # Consultar el caché antes de llamar a la API
+        if self.cache is not None:
+            with traza.etapa("cache"):
+                resultado = self.cache.obtener(clave)
+            if resultado is not None:
+                traza.resultado = "cache"
+                self._notificar_resultado(resultado, al_recibir)
+                return resultado
+        
+        # Si ya hay una generación idéntica en curso, esperar su resultado en lugar de repetirla
+        with self._lock_en_vuelo:
+            futuro = self._en_vuelo.get(clave)
+            es_lider = futuro is None
+            if es_lider:
+                futuro = Future()
+                self._en_vuelo[clave] = futuro
+            else:
+                self.solicitudes_coalescidas += 1
+        
+        if not es_lider:
+            try:
+                with traza.etapa("espera_compartida"):
+                    resultado = dict(self._esperar_futuro(futuro, cancelacion))
+            except GeneracionCancelada:
+                # Si la cancelación (o el plazo) era del líder y no de esta petición,
+                # se vuelve a intentar: como líder o esperando al siguiente
+                if cancelacion is not None:
+                    cancelacion.verificar()
+                return self._generar_remoto(tipo_medio, categoria, descripcion, estilo, detalles_extra,
+                                            stream, al_recibir, cancelacion, traza)
+            traza.resultado = "compartida"
+            self._notificar_resultado(resultado, al_recibir)
+            return resultado
+        
+        try:
+            # Seleccionar el prompt según el tipo de medio y categoría
+            with traza.etapa("plantilla"):
+                backend, contenido = self._construir_peticion(tipo_medio, categoria, descripcion, estilo, detalles_extra)
+            traza.anotar(modelo=backend.nombre_modelo, bytes_entrada=len(contenido.encode("utf-8")))
+            
+            if stream and not self.salida_json:
+                # Parsear los fragmentos a medida que llegan (la etapa incluye el parseo)
+                with traza.etapa("modelo"):
+                    resultado, uso = self._generar_en_stream(backend, contenido, al_recibir, cancelacion)
+            else:
+                # Enviar el prompt al modelo Gemini 2.5 Flash
+                with traza.etapa("modelo"):
+                    response = self._llamar_modelo(backend, contenido, cancelacion, **self._opciones_generacion())
+                    texto = response.text
+                uso = extraer_uso(response, backend.nombre_modelo)
+                
+                # Parsear la respuesta para extraer los prompts positivo y negativo
+                with traza.etapa("parseo"):
+                    resultado = self._interpretar_respuesta(texto)
+                self._notificar_resultado(resultado, al_recibir)
+            
+            if self.cache is not None:
+                with traza.etapa("guardar_cache"):
+                    self.cache.guardar(clave, resultado)
+            
+            # El consumo solo acompaña a la petición que lo generó (no al caché ni a las compartidas)
+            self._soltar_en_vuelo(clave)
+            futuro.set_result(resultado)
+            if uso is None:
+                return resultado
+            traza.anotar(tokens_entrada=uso["tokens_entrada"], tokens_salida=uso["tokens_salida"])
+            return dict(resultado, uso=uso)
+        except BaseException as e:
+            # Se retira antes de avisar, para que quien reintente no encuentre este mismo futuro
+            self._soltar_en_vuelo(clave)
+            if not futuro.done():
+                futuro.set_exception(e)
+            raise
     
-    # ==================== PROMPTS PARA IMÁGENES ====================
+    def _soltar_en_vuelo(self, clave: str) -> None:
+        """Retira la generación en curso de una clave (las siguientes llamarán de nuevo al modelo)"""
+        with self._lock_en_vuelo:
+            self._en_vuelo.pop(clave, None)
     
-    def _prompt_transformacion_rostro(self, descripcion: str, estilo: str, detalles: Optional[Dict[str, str]]) -> str:
-        """Genera el prompt del sistema para transformación de rostros"""
-        transformacion = detalles.get("transformacion", "") if detalles else ""
-        mantener_identidad = detalles.get("mantener_identidad", "Sí") if detalles else "Sí"
-        
-        return f"""Eres un experto en crear prompts para TRANSFORMACIÓN DE ROSTROS con IA (face swap, edición facial, disfraces).
-
-TAREA: Transformar un rostro según la descripción del usuario.
-
-DESCRIPCIÓN: "{descripcion}"
-TIPO DE TRANSFORMACIÓN: {transformacion}
-ESTILO: {estilo}
-MANTENER IDENTIDAD FACIAL: {mantener_identidad}
-
-INSTRUCCIONES CRÍTICAS:
-
-1. PROMPT POSITIVO:
-   - Describe la transformación de forma TÉCNICA y ESPECÍFICA
-   - Si debe mantener identidad: enfatiza "preservar rasgos faciales originales", "mantener estructura facial", "conservar identidad"
-   - Si es disfraz/vestuario: describe el atuendo, accesorios, maquillaje con detalle técnico
-   - Si es cambio de edad: especifica edad objetivo, características de piel, arrugas/suavidad
-   - Si es cambio de estilo: describe peinado, maquillaje, expresión facial
-   - Menciona: iluminación facial, ángulo de cámara, calidad de textura de piel
-   - Incluye detalles como: "fotografía de retrato", "enfoque en rostro", "alta definición facial"
-   - Tono TÉCNICO y DIRECTO, no poético
+    def generar_variantes(self, tipo_medio: str, categoria: str, descripcion: str,
+                          estilo: str, detalles_extra: Optional[Dict[str, str]] = None,
+                          n: int = 3, cancelacion: Optional[TokenCancelacion] = None) -> List[Dict[str, str]]:
+        """
+        Genera varias alternativas de prompt en una sola petición (candidate_count)
 
-   EJEMPLO: "Retrato fotográfico de persona con disfraz de superhéroe, máscara roja y azul cubriendo parte superior del rostro, preservando rasgos faciales originales, traje detallado con textura de tela, iluminación frontal suave, enfoque nítido en rostro, alta resolución, estilo fotorrealista"
+        El prompt del sistema se envía una vez y el modelo devuelve 'n' candidatos.
+        Si el modelo devuelve menos de los pedidos, se piden los que faltan.
+        Las variantes no se guardan en el caché.
 
-2. PROMPT NEGATIVO:
-   - CRÍTICO para rostros: "rostro distorsionado, anatomía facial incorrecta, ojos asimétricos, proporciones faciales incorrectas, rostro borroso, rasgos deformados"
-   - Agregar: "baja calidad, desenfoque, artefactos digitales, múltiples rostros, rostro duplicado"
+        Args:
+            tipo_medio (str): "imagen" o "video"
+            categoria (str): Categoría de generación seleccionada
+            descripcion (str): Descripción del usuario sobre el contenido deseado
+            estilo (str): Estilo artístico seleccionado
+            detalles_extra (Dict[str, str]): Detalles adicionales específicos de la categoría
+            n (int): Número de variantes a generar
+            cancelacion (TokenCancelacion): Permite cancelar la generación y fija su plazo
 
-IMPORTANTE:
-- Todo en ESPAÑOL
-- Enfoque en CALIDAD FACIAL y PRESERVACIÓN DE IDENTIDAD (si aplica)
-- Tono técnico y profesional
+        Returns:
+            List[Dict[str, str]]: Una lista de diccionarios con 'positivo' y 'negativo'; la primera
+                variante lleva además el 'uso' de tokens de toda la petición
+        """
+        if n < 1:
+            raise ValueError("n debe ser al menos 1")
+
+        def remoto(token: Optional[TokenCancelacion]) -> List[Dict[str, str]]:
+            return self._generar_variantes_remoto(tipo_medio, categoria, descripcion, estilo,
+                                                  detalles_extra, n, token)
+
+        def local() -> List[Dict[str, str]]:
+            return [self._generar_local(tipo_medio, categoria, descripcion, estilo, detalles_extra, i)
+                    for i in range(n)]
+
+        return self._segun_modo(remoto, local, cancelacion)
+
+    def _generar_variantes_remoto(self, tipo_medio: str, categoria: str, descripcion: str,
+                                  estilo: str, detalles_extra: Optional[Dict[str, str]],
+                                  n: int, cancelacion: Optional[TokenCancelacion]) -> List[Dict[str, str]]:
+        """Pide las variantes al modelo; ver generar_variantes"""
+        backend, contenido = self._construir_peticion(tipo_medio, categoria, descripcion, estilo, detalles_extra)
+
+        variantes: List[Dict[str, str]] = []
+        uso = None
+        # Un intento por variante como máximo, por si el modelo devuelve candidatos vacíos
+        for _ in range(n):
+            faltan = n - len(variantes)
+            response = self._llamar_modelo(backend, contenido, cancelacion,
+                                           **self._opciones_generacion(candidate_count=faltan))
+            uso = sumar_uso(uso, extraer_uso(response, backend.nombre_modelo))
+            for texto in self._textos_candidatos(response)[:faltan]:
+                variantes.append(self._interpretar_respuesta(texto))
+            if len(variantes) >= n:
+                break
+
+        if not variantes:
+            raise ValueError("El modelo no devolvió ninguna variante")
+        if uso is not None:
+            variantes[0]["uso"] = uso
+        return variantes
+
+    def _generar_local(self, tipo_medio: str, categoria: str, descripcion: str, estilo: str,
+                       detalles_extra: Optional[Dict[str, str]], variante: int = 0) -> Dict[str, str]:
+        """Compone el resultado con el generador local, marcando su origen"""
+        with self._lock_en_vuelo:
+            self.respuestas_locales += 1
+        resultado = self.local.generar(tipo_medio, categoria, descripcion, estilo, detalles_extra, variante)
+        resultado["origen"] = "local"
+        return resultado
+
+    def _segun_modo(self, remoto: Callable[[Optional[TokenCancelacion]], T], local: Callable[[], T],
+                    cancelacion: Optional[TokenCancelacion]) -> T:
+        """
+        Ejecuta la generación remota o local según el modo del generador
 
-FORMATO DE RESPUESTA:
-POSITIVE:
-[descripción técnica de la transformación facial]
+        En modo "auto" la llamada remota recibe un token derivado con un plazo de
+        'plazo_respaldo' segundos (o el del llamador, si es menor); si vence o la API
+        falla, se responde con el generador local. La cancelación del usuario se respeta.
 
-NEGATIVE:
-[elementos a evitar, especialmente defectos faciales]"""
+        Args:
+            remoto (Callable): Recibe el token de cancelación y llama al modelo
+            local (Callable): Compone el resultado sin red
+            cancelacion (TokenCancelacion): Cancelación y plazo del llamador
 
-    def _prompt_modificacion_imagen(self, descripcion: str, estilo: str, detalles: Optional[Dict[str, str]]) -> str:
-        """Genera el prompt del sistema para modificación de imágenes"""
-        tipo_mod = detalles.get("tipo_modificacion", "") if detalles else ""
+        Returns:
+            El resultado de 'remoto' o, si no llegó a tiempo, el de 'local'
+        """
+        if self.modo == MODO_LOCAL:
+            return local()
+        if self.modo == MODO_REMOTO:
+            return remoto(cancelacion)
+
+        token = cancelacion.derivado() if cancelacion is not None else TokenCancelacion()
+        limite = time.monotonic() + self.plazo_respaldo
+        token.limite = limite if token.limite is None else min(token.limite, limite)
+        try:
+            return remoto(token)
+        except PlazoExcedido:
+            pass
+        except GeneracionCancelada:
+            raise
+        except Exception as e:
+            print(f"Error al generar con Gemini, se usa el generador local: {e}")
+        finally:
+            if cancelacion is not None:
+                cancelacion.liberar(token)
+        return local()
+
+    @staticmethod
+    def _textos_candidatos(response: Any) -> List[str]:
+        """Extrae el texto de cada candidato de la respuesta (o solo 'text' si no los expone)"""
+        textos = []
+        for candidato in getattr(response, "candidates", None) or []:
+            contenido = getattr(candidato, "content", None)
+            partes = getattr(contenido, "parts", None) or []
+            texto = "".join(getattr(parte, "text", "") for parte in partes)
+            if texto.strip():
+                textos.append(texto)
+
+        # 'text' solo está disponible con un único candidato; el SDK lanza ValueError si hay varios
+        if not textos:
+            try:
+                if response.text:
+                    textos.append(response.text)
+            except ValueError:
+                pass
+        return textos
+
+    def _llamar_modelo(self, backend: BackendLLM, contenido: str,
+                       cancelacion: Optional[TokenCancelacion] = None, **opciones):
+        """
+        Envía el prompt al modelo respetando el limitador de tasa y la política de reintentos
         
-        return f"""Eres un experto en crear prompts para MODIFICACIÓN DE IMÁGENES con IA (cambio de fondos, agregar elementos, edición).
-
-TAREA: Modificar una imagen existente según la descripción del usuario.
-
-DESCRIPCIÓN: "{descripcion}"
-TIPO DE MODIFICACIÓN: {tipo_mod}
-ESTILO: {estilo}
-
-INSTRUCCIONES IMPORTANTES:
-
-1. PROMPT POSITIVO:
-   - Describe la modificación de forma TÉCNICA y CLARA
-   - Si es cambio de fondo: describe el nuevo fondo con detalle (ubicación, iluminación, elementos)
-   - Si es agregar elementos: especifica qué agregar, dónde, cómo debe integrarse
-   - Si es eliminar elementos: menciona "sin [elemento]", "fondo limpio", "área vacía"
-   - Enfatiza: "integración natural", "iluminación coherente", "perspectiva correcta"
-   - Menciona composición, balance de colores, coherencia visual
-   - Tono TÉCNICO y DIRECTO
-
-   EJEMPLO: "Fotografía de persona en playa tropical, fondo con palmeras y océano turquesa, arena blanca, integración natural de iluminación, sombras coherentes con luz solar, perspectiva correcta, alta resolución, estilo fotorrealista"
-
-2. PROMPT NEGATIVO:
-   - "elementos mal integrados, iluminación inconsistente, sombras incorrectas, perspectiva distorsionada, bordes artificiales, recorte visible"
-   - Agregar: "baja calidad, artefactos, fusión defectuosa"
-
-IMPORTANTE:
-- Todo en ESPAÑOL
-- Enfoque en INTEGRACIÓN NATURAL y COHERENCIA
-- Tono técnico y profesional
-
-FORMATO DE RESPUESTA:
-POSITIVE:
-[descripción técnica de la modificación]
-
-NEGATIVE:
-[elementos a evitar en la modificación]"""
-
-    def _prompt_efectos_especiales(self, descripcion: str, estilo: str, detalles: Optional[Dict[str, str]]) -> str:
-        """Genera el prompt del sistema para efectos especiales en imágenes"""
-        tipo_efecto = detalles.get("tipo_efecto", "") if detalles else ""
+        Args:
+            backend (BackendLLM): Backend que recibe la petición
+            contenido (str): Prompt a enviar al modelo
+            cancelacion (TokenCancelacion): Se comprueba antes de cada intento; si tiene plazo,
+                el tiempo restante se pasa como request_options={'timeout': ...}
+            **opciones: Argumentos adicionales para generate_content (p. ej. stream=True)
+            
+        Returns:
+            La respuesta de generate_content
+        """
+        def intento(token: Optional[TokenCancelacion], **extra):
+            if self.limitador is not None:
+                self.limitador.adquirir(estimar_tokens(contenido), token)
+            argumentos = dict(opciones, **extra)
+            if token is not None:
+                token.verificar()
+                restante = token.restante()
+                if restante is not None:
+                    argumentos["request_options"] = {"timeout": restante}
+            return backend.generate_content(contenido, **argumentos)
         
-        return f"""Eres un experto en crear prompts para EFECTOS ESPECIALES en imágenes con IA (iluminación, clima, atmósfera, filtros).
-
-TAREA: Aplicar efectos especiales a una imagen según la descripción del usuario.
-
-DESCRIPCIÓN: "{descripcion}"
-TIPO DE EFECTO: {tipo_efecto}
-ESTILO: {estilo}
-
-INSTRUCCIONES IMPORTANTES:
-
-1. PROMPT POSITIVO:
-   - Describe el efecto de forma TÉCNICA y ESPECÍFICA
-   - Si es iluminación: especifica tipo (dorada, azul, dramática), dirección, intensidad
-   - Si es clima: describe condiciones (lluvia, niebla, nieve) con detalle técnico
-   - Si es atmósfera: menciona mood, tonalidad de color, partículas (polvo, humo)
-   - Si es hora del día: describe luz característica (amanecer, atardecer, noche)
-   - Enfatiza: "iluminación volumétrica", "rayos de luz", "partículas en el aire", "color grading"
-   - Tono TÉCNICO y DIRECTO
-
-   EJEMPLO: "Escena con iluminación de atardecer dorado, rayos de luz volumétricos atravesando nubes, partículas de polvo visibles en el aire, color grading cálido con tonos naranjas y amarillos, sombras alargadas, atmósfera cinematográfica, alta calidad, estilo fotorrealista"
-
-2. PROMPT NEGATIVO:
-   - "iluminación plana, sin atmósfera, colores apagados, efectos artificiales, sobreexposición, subexposición"
-   - Agregar: "baja calidad, efectos mal aplicados, artefactos"
-
-IMPORTANTE:
-- Todo en ESPAÑOL
-- Enfoque en CALIDAD DE EFECTOS y ATMÓSFERA
-- Tono técnico y profesional
-
-FORMATO DE RESPUESTA:
-POSITIVE:
-[descripción técnica del efecto especial]
-
-NEGATIVE:
-[elementos a evitar en los efectos]"""
-
-    def _prompt_generacion_desde_cero(self, descripcion: str, estilo: str) -> str:
-        """Genera el prompt del sistema para generación de imágenes desde cero"""
+        def intento_cubierto(token: TokenCancelacion):
+            # Se recibe en streaming para que el intento perdedor, con su token cancelado,
+            # se detenga en el siguiente fragmento en lugar de seguir ocupando hilo y cuota;
+            # al terminar, la respuesta expone el texto completo como una llamada normal
+            respuesta = intento(token, stream=True)
+            for _ in respuesta:
+                token.verificar()
+            return respuesta
         
-        return f"""Eres un experto en crear prompts para generación de imágenes con IA (como Midjourney, DALL-E, Stable Diffusion).
-
-Tu tarea es convertir una descripción simple del usuario en un prompt técnico, detallado y directo en español.
-
-DESCRIPCIÓN DEL USUARIO: "{descripcion}"
-ESTILO SOLICITADO: {estilo}
-
-INSTRUCCIONES IMPORTANTES:
-
-1. PROMPT POSITIVO:
-   - Escribe una descripción TÉCNICA y DIRECTA de la imagen (NO poética ni exaltada)
-   - Usa un tono profesional y objetivo
-   - Describe los elementos visuales de forma clara y específica
-   - Integra los detalles técnicos de forma natural en la descripción
-   - Menciona: composición, iluminación, colores, perspectiva, detalles importantes
-   - Incluye el estilo artístico de forma integrada
-   - NO uses lenguaje florido, metáforas excesivas o adjetivos dramáticos
-   - Debe ser descriptivo pero directo, como una ficha técnica narrativa
-
-   EJEMPLO BUENO: "Fotografía de un gato atigrado descansando en una playa durante el atardecer, olas del océano en segundo plano reflejando tonos naranjas del cielo, arena detallada, iluminación natural lateral que define el pelaje del animal, composición horizontal con profundidad de campo, alta resolución, estilo fotorrealista"
-   
-   EJEMPLO MALO (muy poético): "Un majestuoso felino atigrado reposando serenamente sobre las doradas arenas de una playa paradisíaca, mientras las olas danzan suavemente bajo el resplandor mágico de un atardecer celestial..."
-
-2. PROMPT NEGATIVO:
-   - Lista concisa de elementos a evitar
-   - Términos técnicos directos
-   - Incluye: baja calidad, desenfoque, distorsión, anatomía incorrecta, elementos no deseados
-
-IMPORTANTE: 
-- Todo en ESPAÑOL
-- Tono TÉCNICO y DIRECTO, no poético
-- Descriptivo pero profesional y objetivo
-- Integra los aspectos técnicos de forma fluida
-
-FORMATO DE RESPUESTA (SIGUE ESTE FORMATO EXACTO):
-POSITIVE:
-[descripción técnica, detallada y directa en español]
-
-NEGATIVE:
-[lista de elementos a evitar en español]"""
+        def llamar():
+            # Un stream ya entrega su primer fragmento enseguida: solo se duplican llamadas completas
+            if self.cobertura is not None and not opciones.get("stream"):
+                return self.cobertura.ejecutar(intento_cubierto, cancelacion)
+            return intento(cancelacion)
+        
+        if self.reintentos is None:
+            return llamar()
+        return self.reintentos.ejecutar(llamar, cancelacion)
     
-    # ==================== PROMPTS PARA VIDEOS ====================
+    @staticmethod
+    def _esperar_futuro(futuro: Future, cancelacion: Optional[TokenCancelacion]) -> Dict[str, str]:
+        """Espera el resultado de una generación compartida sin dejar de atender la cancelación"""
+        if cancelacion is None:
+            return futuro.result()
+        while True:
+            cancelacion.verificar()
+            try:
+                return futuro.result(timeout=0.1)
+            except TiempoAgotadoFuturo:
+                continue
     
-    def _prompt_video_desde_cero(self, descripcion: str, estilo: str, detalles: Optional[Dict[str, str]]) -> str:
-        """Genera el prompt del sistema para generación de videos desde cero"""
-        duracion = detalles.get("duracion", "5s") if detalles else "5s"
-        aspecto = detalles.get("aspecto", "16:9") if detalles else "16:9"
-        movimiento_camara = detalles.get("movimiento_camara", "Estático") if detalles else "Estático"
-        intensidad = detalles.get("intensidad_movimiento", "Media") if detalles else "Media"
-        
-        return f"""Eres un experto en crear prompts para GENERACIÓN DE VIDEOS con IA (como Runway, Pika, Sora).
-
-Tu tarea es convertir una descripción del usuario en un prompt técnico para generación de video.
-
-DESCRIPCIÓN: "{descripcion}"
-ESTILO: {estilo}
-DURACIÓN: {duracion}
-RELACIÓN DE ASPECTO: {aspecto}
-MOVIMIENTO DE CÁMARA: {movimiento_camara}
-INTENSIDAD DE MOVIMIENTO: {intensidad}
-
-INSTRUCCIONES IMPORTANTES:
-
-1. PROMPT POSITIVO:
-   - Describe la ESCENA y la ACCIÓN de forma TÉCNICA y CINEMATOGRÁFICA
-   - Especifica el movimiento de cámara: {movimiento_camara}
-   - Menciona la duración aproximada: {duracion}
-   - Describe el movimiento de elementos en la escena (intensidad: {intensidad})
-   - Incluye: composición, iluminación, transiciones suaves
-   - Enfatiza: "movimiento fluido", "transición natural", "continuidad temporal"
-   - Menciona el aspecto ratio: {aspecto}
-   - Tono TÉCNICO y CINEMATOGRÁFICO
-
-   EJEMPLO: "Video de un gato caminando por una playa al atardecer, cámara con paneo lateral suave siguiendo al animal, olas en movimiento constante en segundo plano, arena con textura detallada, iluminación dorada del atardecer, movimiento fluido y natural, duración 5 segundos, aspecto 16:9, estilo cinematográfico realista"
-
-2. PROMPT NEGATIVO:
-   - "movimiento brusco, saltos de frames, parpadeo, glitches, movimiento antinatural, cámara inestable, cortes abruptos"
-   - Agregar: "baja calidad, artefactos de compresión, distorsión temporal, objetos que aparecen/desaparecen"
-
-IMPORTANTE:
-- Todo en ESPAÑOL
-- Enfoque en MOVIMIENTO FLUIDO y CONTINUIDAD
-- Especifica claramente el tipo de movimiento de cámara
-- Tono técnico y cinematográfico
-
-FORMATO DE RESPUESTA:
-POSITIVE:
-[descripción técnica del video con movimientos y duración]
-
-NEGATIVE:
-[elementos a evitar en el video]"""
-
-    def _prompt_video_desde_imagen(self, descripcion: str, estilo: str, detalles: Optional[Dict[str, str]]) -> str:
-        """Genera el prompt del sistema para animar imágenes (imagen a video)"""
-        duracion = detalles.get("duracion", "3s") if detalles else "3s"
-        aspecto = detalles.get("aspecto", "16:9") if detalles else "16:9"
-        movimiento_camara = detalles.get("movimiento_camara", "Zoom") if detalles else "Zoom"
-        intensidad = detalles.get("intensidad_movimiento", "Baja") if detalles else "Baja"
-        
-        return f"""Eres un experto en crear prompts para ANIMAR IMÁGENES ESTÁTICAS (imagen a video) con IA.
-
-Tu tarea es describir cómo animar una imagen estática en un video dinámico.
-
-DESCRIPCIÓN: "{descripcion}"
-ESTILO: {estilo}
-DURACIÓN: {duracion}
-RELACIÓN DE ASPECTO: {aspecto}
-MOVIMIENTO DE CÁMARA: {movimiento_camara}
-INTENSIDAD DE MOVIMIENTO: {intensidad}
-
-INSTRUCCIONES IMPORTANTES:
-
-1. PROMPT POSITIVO:
-   - Describe cómo ANIMAR la imagen estática
-   - Especifica el movimiento de cámara: {movimiento_camara}
-   - Menciona qué elementos deben moverse y cómo (intensidad: {intensidad})
-   - Describe movimientos sutiles: cabello, ropa, elementos ambientales
-   - Enfatiza: "animación sutil", "movimiento natural", "transición suave desde imagen estática"
-   - Menciona duración: {duracion}
-   - Tono TÉCNICO enfocado en ANIMACIÓN
-
-   EJEMPLO: "Animar imagen de retrato, zoom in suave hacia el rostro, movimiento sutil del cabello como si hubiera brisa ligera, parpadeo natural de ojos, ligero movimiento de ropa, fondo con desenfoque bokeh que se mueve sutilmente, transición fluida, duración 3 segundos, intensidad baja, aspecto 9:16"
-
-2. PROMPT NEGATIVO:
-   - "movimiento excesivo, distorsión de rostro, animación artificial, elementos que se deforman, movimiento no natural"
-   - Agregar: "glitches, parpadeo, saltos bruscos, pérdida de calidad de imagen original"
-
-IMPORTANTE:
-- Todo en ESPAÑOL
-- Enfoque en ANIMACIÓN SUTIL y NATURAL
-- Preservar la calidad de la imagen original
-- Movimientos coherentes con la escena
-
-FORMATO DE RESPUESTA:
-POSITIVE:
-[descripción técnica de cómo animar la imagen]
-
-NEGATIVE:
-[elementos a evitar en la animación]"""
-
-    def _prompt_video_efectos(self, descripcion: str, estilo: str, detalles: Optional[Dict[str, str]]) -> str:
-        """Genera el prompt del sistema para efectos y transiciones en video"""
-        duracion = detalles.get("duracion", "5s") if detalles else "5s"
-        tipo_efecto = detalles.get("tipo_efecto", "Iluminación") if detalles else "Iluminación"
+    @staticmethod
+    def _notificar_resultado(resultado: Dict[str, str],
+                             al_recibir: Optional[Callable[[str, str], None]]) -> None:
+        """Entrega un resultado completo al callback de fragmentos, si lo hay"""
+        if al_recibir is not None:
+            al_recibir("positivo", resultado["positivo"])
+            al_recibir("negativo", resultado["negativo"])
+    
+    def _generar_en_stream(self, backend: BackendLLM, contenido: str,
+                           al_recibir: Optional[Callable[[str, str], None]],
+                           cancelacion: Optional[TokenCancelacion] = None) -> Tuple[Dict[str, str], Optional[Dict[str, Any]]]:
+        """
+        Envía el prompt en modo streaming y parsea la respuesta de forma incremental
         
-        return f"""Eres un experto en crear prompts para EFECTOS Y TRANSICIONES EN VIDEO con IA.
-
-Tu tarea es describir efectos visuales para aplicar a un video.
-
-DESCRIPCIÓN: "{descripcion}"
-TIPO DE EFECTO: {tipo_efecto}
-ESTILO: {estilo}
-DURACIÓN: {duracion}
-
-INSTRUCCIONES IMPORTANTES:
-
-1. PROMPT POSITIVO:
-   - Describe el EFECTO VISUAL de forma TÉCNICA
-   - Si es iluminación: especifica cambios de luz, color grading, rayos volumétricos
-   - Si es clima: describe lluvia, nieve, niebla con movimiento natural
-   - Si es transición: describe el tipo (fade, dissolve, wipe) y duración
-   - Enfatiza: "transición suave", "efecto progresivo", "integración natural"
-   - Menciona cómo evoluciona el efecto durante la duración
-   - Tono TÉCNICO y CINEMATOGRÁFICO
-
-   EJEMPLO: "Video con transición de día a noche, cambio gradual de iluminación de tonos cálidos a azules fríos, aparición progresiva de estrellas en el cielo, sombras que se alargan y oscurecen, color grading que evoluciona suavemente, duración 5 segundos, transición cinematográfica fluida"
-
-2. PROMPT NEGATIVO:
-   - "transición brusca, cambios abruptos, efectos artificiales, inconsistencia temporal, parpadeo"
-   - Agregar: "artefactos visuales, glitches, efectos mal aplicados"
-
-IMPORTANTE:
-- Todo en ESPAÑOL
-- Enfoque en TRANSICIONES SUAVES y EFECTOS NATURALES
-- Describir la evolución temporal del efecto
-
-FORMATO DE RESPUESTA:
-POSITIVE:
-[descripción técnica del efecto o transición]
-
-NEGATIVE:
-[elementos a evitar]"""
-
-    def _prompt_video_camara(self, descripcion: str, estilo: str, detalles: Optional[Dict[str, str]]) -> str:
-        """Genera el prompt del sistema para movimientos de cámara cinematográficos"""
-        duracion = detalles.get("duracion", "5s") if detalles else "5s"
-        aspecto = detalles.get("aspecto", "16:9") if detalles else "16:9"
-        movimiento_camara = detalles.get("movimiento_camara", "Dolly") if detalles else "Dolly"
-        intensidad = detalles.get("intensidad_movimiento", "Media") if detalles else "Media"
-        
-        return f"""Eres un experto en crear prompts para MOVIMIENTOS DE CÁMARA CINEMATOGRÁFICOS en video con IA.
-
-Tu tarea es describir movimientos de cámara profesionales para un video.
-
-DESCRIPCIÓN: "{descripcion}"
-MOVIMIENTO DE CÁMARA: {movimiento_camara}
-ESTILO: {estilo}
-DURACIÓN: {duracion}
-RELACIÓN DE ASPECTO: {aspecto}
-INTENSIDAD: {intensidad}
-
-INSTRUCCIONES IMPORTANTES:
-
-1. PROMPT POSITIVO:
-   - Describe el MOVIMIENTO DE CÁMARA de forma TÉCNICA y PRECISA
-   - Especifica el tipo: {movimiento_camara}
-   - Describe la trayectoria y velocidad (intensidad: {intensidad})
-   - Menciona: punto de inicio, punto final, velocidad de movimiento
-   - Si es paneo: dirección (izquierda/derecha, arriba/abajo)
-   - Si es zoom: in/out, velocidad
-   - Si es dolly: avance/retroceso, altura de cámara
-   - Si es tracking: seguimiento del sujeto, estabilidad
-   - Enfatiza: "movimiento suave", "estabilizado", "cinematográfico"
-   - Tono TÉCNICO de CINEMATOGRAFÍA
-
-   EJEMPLO: "Video con dolly in cinematográfico, cámara avanza suavemente hacia el sujeto desde 3 metros hasta primer plano, movimiento estabilizado y fluido, velocidad media constante, altura de cámara a nivel de ojos, enfoque rack progresivo, duración 5 segundos, aspecto 16:9, estilo cinematográfico profesional"
-
-2. PROMPT NEGATIVO:
-   - "cámara inestable, movimiento brusco, sacudidas, desenfoque de movimiento, trayectoria errática"
-   - Agregar: "movimiento robótico, aceleración/desaceleración abrupta, pérdida de estabilización"
-
-IMPORTANTE:
-- Todo en ESPAÑOL
-- Enfoque en MOVIMIENTOS PROFESIONALES y SUAVES
-- Especificar claramente la trayectoria de cámara
-- Tono de cinematografía profesional
-
-FORMATO DE RESPUESTA:
-POSITIVE:
-[descripción técnica del movimiento de cámara]
-
-NEGATIVE:
-[elementos a evitar en el movimiento]"""
+        Args:
+            backend (BackendLLM): Backend que recibe la petición
+            contenido (str): Prompt a enviar al modelo
+            al_recibir (Callable[[str, str], None]): Callback para cada fragmento parseado
+            cancelacion (TokenCancelacion): Se comprueba entre fragmentos
+            
+        Returns:
+            Tuple: Diccionario con 'positivo' y 'negativo' prompts, y el consumo de tokens
+                (del último fragmento que lo informe) o None
+        """
+        parser = ParserIncremental()
+        response = self._llamar_modelo(backend, contenido, cancelacion, stream=True)
+        uso = None
+        
+        for chunk in response:
+            if cancelacion is not None:
+                cancelacion.verificar()
+            eventos = parser.alimentar(chunk.text)
+            if al_recibir is not None:
+                for seccion, texto in eventos:
+                    al_recibir(seccion, texto)
+            uso = extraer_uso(chunk, backend.nombre_modelo) or uso
+        
+        return parser.cerrar(), uso
+    
+    def generar_lote(self, especificaciones: List[Dict[str, Any]], max_workers: int = 4,
+                     cancelacion: Optional[TokenCancelacion] = None) -> List[Dict[str, Any]]:
+        """
+        Genera varios prompts en paralelo y devuelve los resultados en el orden de entrada
+        
+        Args:
+            especificaciones (List[Dict]): Lista de diccionarios con 'tipo_medio', 'categoria',
+                'descripcion', 'estilo' y opcionalmente 'detalles_extra'
+            max_workers (int): Número máximo de generaciones simultáneas (límite de cuota)
+            cancelacion (TokenCancelacion): Cancela todo el lote (o le fija un plazo común)
+            
+        Returns:
+            List[Dict]: Un diccionario por especificación con 'indice', 'spec',
+                'resultado' (o None) y 'error' (o None)
+        """
+        resultados: List[Optional[Dict[str, Any]]] = [None] * len(especificaciones)
+        for item in self.generar_lote_iter(especificaciones, max_workers, cancelacion):
+            resultados[item["indice"]] = item
+        return resultados
+    
+    def generar_lote_iter(self, especificaciones: List[Dict[str, Any]],
+                          max_workers: int = 4,
+                          cancelacion: Optional[TokenCancelacion] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Genera varios prompts en paralelo entregando cada resultado en cuanto termina
+        
+        Un error en un elemento no detiene el lote: se reporta en su campo 'error'.
+        Al cancelar, los elementos que aún no empezaron se descartan y los que están
+        en curso se interrumpen en su siguiente punto de control; todos se reportan
+        con error. Dejar de iterar también descarta los pendientes.
+        
+        Args:
+            especificaciones (List[Dict]): Igual que en generar_lote()
+            max_workers (int): Número máximo de generaciones simultáneas
+            cancelacion (TokenCancelacion): Cancela todo el lote (o le fija un plazo común)
+            
+        Yields:
+            Dict: Diccionario con 'indice', 'spec', 'resultado' y 'error'
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers debe ser al menos 1")
+        
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="lote")
+        try:
+            futuros = {
+                executor.submit(self._generar_desde_spec, spec, cancelacion): (indice, spec)
+                for indice, spec in enumerate(especificaciones)
+            }
+            for futuro in as_completed(futuros):
+                indice, spec = futuros[futuro]
+                if cancelacion is not None and cancelacion.cancelado:
+                    # Descartar lo que todavía no empezó
+                    executor.shutdown(wait=False, cancel_futures=True)
+                try:
+                    yield {"indice": indice, "spec": spec, "resultado": futuro.result(), "error": None}
+                except CancelledError:
+                    yield {"indice": indice, "spec": spec, "resultado": None, "error": "Generación cancelada"}
+                except Exception as e:
+                    yield {"indice": indice, "spec": spec, "resultado": None, "error": str(e)}
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _generar_desde_spec(self, spec: Dict[str, Any],
+                            cancelacion: Optional[TokenCancelacion] = None) -> Dict[str, str]:
+        """Llama a generar_prompt_con_ia con los campos de una especificación de lote"""
+        self._validar_spec(spec)
+        if cancelacion is not None:
+            cancelacion.verificar()
+        return self.generar_prompt_con_ia(
+            spec.get("tipo_medio", "imagen"),
+            spec["categoria"],
+            spec["descripcion"],
+            spec.get("estilo", "auto-detectar el mejor estilo"),
+            spec.get("detalles_extra", spec.get("detalles")),
+            cancelacion=cancelacion
+        )
+    
+    @staticmethod
+    def _validar_spec(spec: Dict[str, Any]) -> None:
+        """Verifica que una especificación de lote tenga los campos obligatorios"""
+        for campo in ("categoria", "descripcion"):
+            if not spec.get(campo):
+                raise ValueError(f"Falta el campo '{campo}' en la especificación")
+    
+    def calentar_conexion(self) -> bool:
+        """
+        Establece la conexión con la API antes de la primera petición del usuario
+        
+        Returns:
+            bool: True si la conexión quedó lista (o el backend no necesita calentarse)
+        """
+        if self.enrutador is not None:
+            return self.enrutador.calentar()
+        calentar = getattr(self.backend, "calentar", None)
+        return calentar() if calentar is not None else True
+    
+    def estadisticas_cobertura(self) -> Dict[str, Any]:
+        """
+        Devuelve los contadores y percentiles de la política de cobertura
+        
+        Returns:
+            Dict: Estadísticas de PoliticaCobertura (vacío si está desactivada)
+        """
+        return self.cobertura.estadisticas() if self.cobertura is not None else {}
+    
+    def estadisticas_enrutado(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Devuelve las elecciones, latencias y errores de cada modelo del enrutador
+        
+        Returns:
+            Dict: Estadísticas de EnrutadorModelos (vacío si no hay enrutador)
+        """
+        return self.enrutador.estadisticas() if self.enrutador is not None else {}
+    
+    def estadisticas_cache(self) -> Dict[str, int]:
+        """
+        Devuelve los contadores de hits/misses/evictions del caché
+        
+        Returns:
+            Dict[str, int]: Contadores del caché (vacío si el caché está desactivado)
+        """
+        return self.cache.estadisticas() if self.cache is not None else {}
+    
+    def _clave_cache(self, tipo_medio: str, categoria: str, descripcion: str,
+                     estilo: str, detalles: Optional[Dict[str, str]]) -> str:
+        """Clave del caché de una petición, incluida la versión de su plantilla y el modo de salida"""
+        plantilla = self.plantillas.obtener(tipo_medio, categoria)
+        modo_salida = ("json" if self.salida_json else "texto") + ("/sistema" if self.instruccion_sistema else "")
+        return clave_cache(self.nombre_modelo, tipo_medio, categoria, descripcion, estilo, detalles,
+                           plantilla.version, modo_salida)
+    
+    def _construir_prompt(self, tipo_medio: str, categoria: str, descripcion: str,
+                          estilo: str, detalles: Optional[Dict[str, str]]) -> str:
+        """Selecciona el prompt del sistema según el tipo de medio y categoría"""
+        if tipo_medio == "imagen":
+            return self._generar_prompt_imagen(categoria, descripcion, estilo, detalles)
+        else:  # video
+            return self._generar_prompt_video(categoria, descripcion, estilo, detalles)
+    
+    def _construir_peticion(self, tipo_medio: str, categoria: str, descripcion: str,
+                            estilo: str, detalles: Optional[Dict[str, str]]) -> Tuple[BackendLLM, str]:
+        """
+        Decide qué backend recibe la petición y con qué contenido
+        
+        Con enrutador, el modelo se elige por petición. En modo instrucción del sistema
+        se usa el backend de la categoría (con las instrucciones fijas ya configuradas)
+        y solo se envían los datos variables.
+        
+        Returns:
+            Tuple[BackendLLM, str]: Backend a usar y contenido a enviar
+        """
+        backend = self.backend
+        if self.enrutador is not None:
+            backend = self.enrutador.elegir(tipo_medio, categoria, descripcion)
+        
+        if self.instruccion_sistema:
+            dividido = self.plantillas.renderizar_dividido(tipo_medio, categoria, descripcion, estilo, detalles)
+            if dividido is not None:
+                instruccion, contenido = dividido
+                return self._backend_con_sistema(backend, instruccion), contenido
+        
+        return backend, self._construir_prompt(tipo_medio, categoria, descripcion, estilo, detalles)
+    
+    def _backend_con_sistema(self, backend: BackendLLM, instruccion: str) -> BackendLLM:
+        """Devuelve (creándolo una sola vez) el backend de un modelo con una instrucción del sistema"""
+        clave = (backend.nombre_modelo, instruccion)
+        with self._lock_backends:
+            con_sistema = self._backends_sistema.get(clave)
+            if con_sistema is None:
+                con_sistema = backend.con_instruccion_sistema(instruccion)
+                self._backends_sistema[clave] = con_sistema
+            return con_sistema
+    
+    def _generar_prompt_imagen(self, categoria: str, descripcion: str, estilo: str, 
+                               detalles: Optional[Dict[str, str]]) -> str:
+        """Genera el prompt del sistema para imágenes según la categoría"""
+        return self.plantillas.renderizar("imagen", categoria, descripcion, estilo, detalles)
+    
+    def _generar_prompt_video(self, categoria: str, descripcion: str, estilo: str,
+                             detalles: Optional[Dict[str, str]]) -> str:
+        """Genera el prompt del sistema para videos según la categoría"""
+        return self.plantillas.renderizar("video", categoria, descripcion, estilo, detalles)
     
     # ==================== UTILIDADES ====================
     
+    def _opciones_generacion(self, **configuracion: Any) -> Dict[str, Any]:
+        """
+        Arma los argumentos de generate_content (generation_config) para una petición
+        
+        Args:
+            **configuracion: Campos de generation_config (p. ej. candidate_count=3)
+            
+        Returns:
+            Dict[str, Any]: {'generation_config': {...}} o vacío si no hay nada que configurar
+        """
+        if self.salida_json:
+            configuracion["response_mime_type"] = "application/json"
+            configuracion["response_schema"] = ESQUEMA_RESPUESTA
+        return {"generation_config": configuracion} if configuracion else {}
+    
+    def _interpretar_respuesta(self, texto: str) -> Dict[str, str]:
+        """
+        Extrae los prompts de una respuesta completa
+        
+        En modo salida_json se lee el JSON de una sola vez; si el modelo no respetó
+        el esquema se recurre al parser por líneas.
+        
+        Args:
+            texto (str): Texto de respuesta generado por Gemini
+            
+        Returns:
+            Dict[str, str]: Diccionario con 'positivo' y 'negativo' prompts
+        """
+        if self.salida_json:
+            resultado = parsear_json(texto)
+            if resultado is not None:
+                return resultado
+            self.respuestas_no_json += 1
+        return self._parsear_respuesta(texto)
+    
     def _parsear_respuesta(self, texto: str) -> Dict[str, str]:
         """
         Parsea la respuesta de Gemini para extraer los prompts positivo y negativo
@@ -484,40 +751,4 @@ NEGATIVE:
         Returns:
             Dict[str, str]: Diccionario con 'positivo' y 'negativo' prompts parseados
         """
-        # Dividir el texto en líneas para procesamiento
-        lineas = texto.strip().split('\n')
-        prompt_positivo = ""
-        prompt_negativo = ""
-        seccion_actual = None
-        
-        # Iterar sobre cada línea para identificar y extraer los prompts
-        for linea in lineas:
-            linea_limpia = linea.strip()
-            
-            # Detectar inicio de la sección POSITIVE
-            if linea_limpia.startswith("POSITIVE:"):
-                seccion_actual = "positive"
-                resto = linea_limpia.replace("POSITIVE:", "").strip()
-                if resto:
-                    prompt_positivo = resto
-            
-            # Detectar inicio de la sección NEGATIVE
-            elif linea_limpia.startswith("NEGATIVE:"):
-                seccion_actual = "negative"
-                resto = linea_limpia.replace("NEGATIVE:", "").strip()
-                if resto:
-                    prompt_negativo = resto
-            
-            # Agregar líneas adicionales al prompt positivo
-            elif seccion_actual == "positive" and linea_limpia:
-                prompt_positivo += " " + linea_limpia if prompt_positivo else linea_limpia
-            
-            # Agregar líneas adicionales al prompt negativo
-            elif seccion_actual == "negative" and linea_limpia:
-                prompt_negativo += " " + linea_limpia if prompt_negativo else linea_limpia
-        
-        # Retornar los prompts parseados
-        return {
-            "positivo": prompt_positivo.strip(),
-            "negativo": prompt_negativo.strip() if prompt_negativo else "baja calidad, borroso, distorsionado, anatomía incorrecta"
-        }
+        return parsear_texto(texto)
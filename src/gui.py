@@ -8,7 +8,13 @@ from datetime import datetime
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
 
-from .generator import GeminiPromptGenerator
+from .generator import MODO_AUTO, MODO_LOCAL, MODO_REMOTO, GeminiPromptGenerator
+from .jobs import CANCELADO, COMPLETADO, EN_COLA, ERROR, GENERANDO, PLAZO, ColaTrabajos
+from .metrics import Traza, obtener_metricas
+from .similarity import IndiceSimilitud
+from .startup import obtener_informe
+from .templates import obtener_registro
+from .usage import formatear_informe, informe_uso
 from .utils import guardar_historial, cargar_historial, exportar_prompts
 
 
@@ -34,7 +40,42 @@ class BrainCourseGUI:
         "border": "#3a3f4b"
     }
     
-    def __init__(self, root, api_key):
+    # Segundos máximos por generación antes de abandonarla
+    PLAZO_GENERACION = 90
+    
+    # Similitud mínima (0-1) con una descripción del historial para ofrecer reutilizar su resultado
+    UMBRAL_SIMILITUD = 0.8
+    
+    # Generaciones que se ejecutan a la vez; las demás esperan en la cola de trabajos
+    MAX_TRABAJOS_SIMULTANEOS = 3
+    
+    # Trabajos que se muestran en el panel (los terminados más antiguos se retiran)
+    MAX_TRABAJOS_VISIBLES = 8
+    
+    # Cada cuántos milisegundos se actualiza el tiempo de los trabajos en curso
+    INTERVALO_TRABAJOS = 500
+    
+    # Texto y color de cada estado de un trabajo
+    ESTADOS_TRABAJO = {
+        EN_COLA: ("⏳ En cola", "text_secondary"),
+        GENERANDO: ("🤖 Generando", "accent_secondary"),
+        COMPLETADO: ("✅ Listo", "accent_primary"),
+        ERROR: ("❌ Error", "accent_danger"),
+        CANCELADO: ("⏹️ Cancelado", "text_secondary"),
+        PLAZO: ("⏱️ Sin respuesta", "accent_danger"),
+    }
+    
+    def __init__(self, root, api_key, al_iniciar=None, modo=MODO_REMOTO):
+        """
+        Construye la ventana; el generador se inicializa en segundo plano
+        
+        Args:
+            root: Ventana raíz de CustomTkinter
+            api_key (str): API key de Google Gemini
+            al_iniciar (Callable[[Optional[str]], None]): Se llama en el hilo de la interfaz cuando
+                el generador termina de inicializarse, con None o el mensaje de error
+            modo (str): "remoto", "local" (sin conexión) o "auto" (respaldo local si Gemini no responde)
+        """
         self.root = root
         self.root.title("PROMPTS IA - Generador de Prompts para Imágenes y Videos")
         self.root.geometry("950x900")
@@ -42,18 +83,83 @@ class BrainCourseGUI:
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("blue")
         
-        try:
-            self.generator = GeminiPromptGenerator(api_key)
-        except Exception as e:
-            self.mostrar_error(f"Error al inicializar Gemini: {str(e)}")
-            self.root.destroy()
-            return
+        # El SDK de Gemini y el modelo se cargan en segundo plano tras mostrar la ventana;
+        # mientras tanto el botón de generar queda deshabilitado
+        self.api_key = api_key
+        self.al_iniciar = al_iniciar
+        self.modo = modo
+        self.generator = None
+        
+        # Categorías y estilos (no dependen del modelo)
+        registro = obtener_registro()
+        self.categorias_imagen = registro.etiquetas("imagen")
+        self.categorias_video = registro.etiquetas("video")
+        self.estilos = GeminiPromptGenerator.estilos
         
         # Variables de estado
         self.tipo_medio_actual = "imagen"  # "imagen" o "video"
         self.ultimo_prompt_generado = None  # Para exportar
+        self.variantes_actuales = []  # Alternativas de la última generación
+        self.trabajo_visible = None  # Trabajo cuyos resultados ocupan los campos de texto
+        self.filas_trabajos = {}  # Número de trabajo -> widgets de su fila en el panel
+        self.reloj_trabajos_activo = False
+        self.indice_similitud = None  # Descripciones del historial (se indexan en segundo plano)
+        
+        # Generaciones encargadas: se ejecutan en paralelo hasta MAX_TRABAJOS_SIMULTANEOS
+        self.cola_trabajos = ColaTrabajos(
+            self._ejecutar_trabajo,
+            self.MAX_TRABAJOS_SIMULTANEOS,
+            plazo=self.PLAZO_GENERACION,
+            al_cambiar=lambda trabajo: self.root.after(0, self._trabajo_cambiado, trabajo)
+        )
         
         self.crear_interfaz()
+        
+        # Iniciar el generador cuando la ventana ya esté dibujada
+        self.root.after_idle(self._iniciar_generador)
+    
+    def _iniciar_generador(self):
+        """Crea el generador en un hilo aparte para no retrasar la aparición de la ventana"""
+        informe = obtener_informe()
+        informe.marcar("ventana visible")
+        
+        def iniciar():
+            try:
+                if self.modo != MODO_LOCAL:
+                    with informe.etapa("importar google.generativeai"):
+                        import google.generativeai  # noqa: F401
+                with informe.etapa("crear GeminiPromptGenerator"):
+                    generador = GeminiPromptGenerator(self.api_key, modo=self.modo)
+            except Exception as e:
+                error_msg = f"Error al inicializar Gemini: {str(e)}"
+                self.root.after(0, lambda: self._generador_fallido(error_msg))
+                return
+            self.root.after(0, lambda: self._generador_listo(generador))
+            
+            # Abrir la conexión ya, para que la primera petición no pague el handshake
+            with informe.etapa("calentar conexión"):
+                generador.calentar_conexion()
+            
+            with informe.etapa("indexar historial"):
+                indice = IndiceSimilitud(self.UMBRAL_SIMILITUD).cargar(cargar_historial())
+            self.root.after(0, lambda: setattr(self, "indice_similitud", indice))
+        
+        threading.Thread(target=iniciar, daemon=True, name="inicio-generador").start()
+    
+    def _generador_listo(self, generador):
+        """Habilita la generación cuando el modelo está listo"""
+        self.generator = generador
+        self.generate_btn.configure(state="normal", text="✨ Generar Prompts")
+        obtener_informe().marcar("generador listo")
+        if self.al_iniciar is not None:
+            self.al_iniciar(None)
+    
+    def _generador_fallido(self, mensaje):
+        """Informa del error de inicialización y deja la generación deshabilitada"""
+        self.generate_btn.configure(state="disabled", text="❌ Gemini no disponible")
+        self.mostrar_error(mensaje)
+        if self.al_iniciar is not None:
+            self.al_iniciar(mensaje)
     
     def mostrar_error(self, mensaje):
         """Muestra un mensaje de error"""
@@ -120,6 +226,19 @@ class BrainCourseGUI:
         )
         exportar_btn.pack(side="left", padx=5)
         
+        metricas_btn = ctk.CTkButton(
+            action_buttons_frame,
+            text="📊 Métricas",
+            font=("Helvetica", 11),
+            fg_color=self.COLORS["accent_secondary"],
+            hover_color="#5a6b8a",
+            width=120,
+            height=32,
+            corner_radius=6,
+            command=self.abrir_metricas
+        )
+        metricas_btn.pack(side="left", padx=5)
+        
         # Scrollable main container
         scrollable_frame = ctk.CTkScrollableFrame(
             self.root,
@@ -172,7 +291,7 @@ class BrainCourseGUI:
         self.category_combo = ctk.CTkComboBox(
             category_frame,
             variable=self.category_var,
-            values=list(self.generator.categorias_imagen.keys()),
+            values=list(self.categorias_imagen.keys()),
             font=("Helvetica", 11),
             width=280,
             height=32,
@@ -230,7 +349,7 @@ class BrainCourseGUI:
         style_combo = ctk.CTkComboBox(
             style_frame,
             variable=self.style_var,
-            values=list(self.generator.estilos.keys()),
+            values=list(self.estilos.keys()),
             font=("Helvetica", 11),
             width=280,
             height=32,
@@ -242,21 +361,87 @@ class BrainCourseGUI:
         )
         style_combo.pack(side="left")
         
+        # Variants selector (alternativas generadas en una sola petición)
+        variantes_label = ctk.CTkLabel(
+            style_frame,
+            text="🔀 Variantes:",
+            font=("Helvetica", 12, "bold"),
+            text_color=self.COLORS["text_primary"]
+        )
+        variantes_label.pack(side="left", padx=(20, 10))
+        
+        self.variantes_var = ctk.StringVar(value="1")
+        variantes_combo = ctk.CTkComboBox(
+            style_frame,
+            variable=self.variantes_var,
+            values=["1", "2", "3", "4"],
+            font=("Helvetica", 11),
+            width=70,
+            height=32,
+            state="readonly",
+            fg_color=self.COLORS["bg_secondary"],
+            border_color=self.COLORS["border"],
+            button_color=self.COLORS["bg_tertiary"],
+            button_hover_color=self.COLORS["accent_primary"],
+            dropdown_fg_color=self.COLORS["bg_secondary"]
+        )
+        variantes_combo.pack(side="left")
+        
         # Initialize dynamic fields
         self.actualizar_campos_dinamicos()
         
         # Generate button
+        botones_frame = ctk.CTkFrame(scrollable_frame, fg_color="transparent")
+        botones_frame.pack(pady=(0, 20))
+        
         self.generate_btn = ctk.CTkButton(
-            scrollable_frame,
-            text="✨ Generar Prompts",
+            botones_frame,
+            text="⏳ Iniciando...",
             font=("Helvetica", 14, "bold"),
             fg_color=self.COLORS["accent_primary"],
             hover_color="#4a7449",
             height=45,
             corner_radius=8,
+            state="disabled",
             command=self.generar_prompts
         )
-        self.generate_btn.pack(pady=(0, 20))
+        self.generate_btn.pack(side="left")
+        
+        # Cancel button (abandona todos los trabajos en cola o en curso)
+        self.cancel_btn = ctk.CTkButton(
+            botones_frame,
+            text="⏹️ Cancelar todos",
+            font=("Helvetica", 12),
+            fg_color=self.COLORS["accent_danger"],
+            hover_color="#a84340",
+            width=140,
+            height=45,
+            corner_radius=8,
+            state="disabled",
+            command=self.cancelar_generacion
+        )
+        self.cancel_btn.pack(side="left", padx=(10, 0))
+        
+        # Panel de trabajos: cada generación encargada con su estado, tiempo y resultado
+        self.trabajos_frame = ctk.CTkFrame(scrollable_frame, fg_color=self.COLORS["bg_secondary"], corner_radius=10)
+        self.trabajos_frame.pack(fill="x", pady=(0, 20))
+        
+        ctk.CTkLabel(
+            self.trabajos_frame,
+            text=f"🗂️ Trabajos (hasta {self.MAX_TRABAJOS_SIMULTANEOS} a la vez)",
+            font=("Helvetica", 11, "bold"),
+            text_color=self.COLORS["text_primary"],
+            anchor="w"
+        ).pack(fill="x", padx=12, pady=(10, 6))
+        
+        self.sin_trabajos_label = ctk.CTkLabel(
+            self.trabajos_frame,
+            text="Puedes encargar varias generaciones seguidas con ajustes distintos; aparecerán aquí.",
+            font=("Helvetica", 10),
+            text_color=self.COLORS["text_secondary"],
+            anchor="w"
+        )
+        self.sin_trabajos_label.pack(fill="x", padx=12, pady=(0, 10))
         
         # Results section
         results_label = ctk.CTkLabel(
@@ -268,6 +453,17 @@ class BrainCourseGUI:
         )
         results_label.pack(fill="x", pady=(0, 8))
         
+        # Selector para alternar entre variantes (solo visible con más de una)
+        self.variantes_selector = ctk.CTkSegmentedButton(
+            scrollable_frame,
+            values=["Variante 1"],
+            font=("Helvetica", 10),
+            selected_color=self.COLORS["accent_primary"],
+            selected_hover_color="#4a7449",
+            command=self.mostrar_variante
+        )
+        self.results_label = results_label
+        
         # Positive prompt
         positive_frame = ctk.CTkFrame(scrollable_frame, fg_color=self.COLORS["bg_secondary"], corner_radius=10)
         positive_frame.pack(fill="x", pady=(0, 10))
@@ -349,11 +545,11 @@ class BrainCourseGUI:
         if "Imagen" in valor:
             self.tipo_medio_actual = "imagen"
             self.category_var.set("🖼️ Generación desde Cero")
-            self.category_combo.configure(values=list(self.generator.categorias_imagen.keys()))
+            self.category_combo.configure(values=list(self.categorias_imagen.keys()))
         else:
             self.tipo_medio_actual = "video"
             self.category_var.set("🎬 Generación desde Cero")
-            self.category_combo.configure(values=list(self.generator.categorias_video.keys()))
+            self.category_combo.configure(values=list(self.categorias_video.keys()))
         
         self.actualizar_campos_dinamicos()
     
@@ -370,7 +566,7 @@ class BrainCourseGUI:
     
     def _crear_campos_imagen(self):
         """Crea campos específicos para generación de imágenes"""
-        categoria = self.generator.categorias_imagen.get(self.category_var.get(), "generate")
+        categoria = self.categorias_imagen.get(self.category_var.get(), "generate")
         
         if categoria == "face_transform":
             self.dynamic_frame.pack(fill="x", pady=(0, 10), before=self.input_text)
@@ -486,7 +682,7 @@ class BrainCourseGUI:
         """Crea campos específicos para generación de videos"""
         self.dynamic_frame.pack(fill="x", pady=(0, 10), before=self.input_text)
         
-        categoria = self.generator.categorias_video.get(self.category_var.get(), "video_generate")
+        categoria = self.categorias_video.get(self.category_var.get(), "video_generate")
         
         # Duración
         duracion_label = ctk.CTkLabel(
@@ -689,67 +885,302 @@ class BrainCourseGUI:
         btn.pack(pady=(0, 15))
     
     def generar_prompts(self):
-        """Genera los prompts usando Gemini 2.5 Flash de forma asíncrona"""
+        """Encarga una generación con los ajustes actuales a la cola de trabajos"""
         descripcion = self.input_text.get("1.0", "end-1c").strip()
         
+        if self.generator is None:
+            self.mostrar_notificacion("⏳ Iniciando", "Gemini todavía se está inicializando, espera un momento")
+            return
+        
         if not descripcion:
             self.mostrar_notificacion("⚠️ Advertencia", "Por favor, describe tu idea primero")
             return
         
-        # Deshabilitar el botón mientras se genera
-        self.generate_btn.configure(state="disabled", text="🤖 Generando...")
+        # Obtener categoría, estilo y detalles extra
+        if self.tipo_medio_actual == "imagen":
+            categoria = self.categorias_imagen[self.category_var.get()]
+        else:
+            categoria = self.categorias_video[self.category_var.get()]
+        estilo = self.estilos[self.style_var.get()]
+        detalles_extra = self._recopilar_detalles_extra(categoria)
         
-        # Limpiar los campos de resultados anteriores
+        # Una descripción casi igual a otra del historial puede reutilizar su resultado
+        if self._ofrecer_reutilizar(descripcion, detalles_extra):
+            return
+        
+        # Copia de los ajustes: el usuario puede cambiarlos y encargar otra generación enseguida
+        ajustes = {
+            "tipo_medio": self.tipo_medio_actual,
+            "categoria": categoria,
+            "etiqueta_categoria": self.category_var.get(),
+            "estilo": estilo,
+            "etiqueta_estilo": self.style_var.get(),
+            "descripcion": descripcion,
+            "detalles": detalles_extra,
+            "variantes": int(self.variantes_var.get()),
+        }
+        
+        # El trabajo nuevo ocupa los campos de resultados (ahí se verá su streaming)
         self.positive_text.delete("1.0", "end")
         self.negative_text.delete("1.0", "end")
+        self.variantes_selector.pack_forget()
+        self.trabajo_visible = self.cola_trabajos.encargar(ajustes)
+    
+    def _ejecutar_trabajo(self, trabajo):
+        """
+        Genera un trabajo de la cola (en un hilo del pool) y lo guarda en el historial
+        
+        Returns:
+            Optional[Dict]: 'variantes' y 'entrada' del historial, o None si se canceló
+        """
+        ajustes = trabajo.ajustes
+        cancelacion = trabajo.cancelacion
+        
+        # Tiempos de cada etapa (generación, historial, índice) para el panel de métricas
+        traza = Traza(
+            self.generator.metricas, "interfaz", tipo_medio=ajustes["tipo_medio"],
+            categoria=ajustes["categoria"], variantes=ajustes["variantes"], modo=self.modo
+        )
         
-        def generar():
-            try:
-                # Obtener categoría y estilo
-                if self.tipo_medio_actual == "imagen":
-                    categoria = self.generator.categorias_imagen[self.category_var.get()]
+        with traza:
+            with traza.etapa("generacion"):
+                if ajustes["variantes"] > 1:
+                    # Varias alternativas en una sola petición (sin streaming)
+                    variantes = self.generator.generar_variantes(
+                        ajustes["tipo_medio"],
+                        ajustes["categoria"],
+                        ajustes["descripcion"],
+                        ajustes["estilo"],
+                        ajustes["detalles"],
+                        n=ajustes["variantes"],
+                        cancelacion=cancelacion
+                    )
                 else:
-                    categoria = self.generator.categorias_video[self.category_var.get()]
-                
-                estilo = self.generator.estilos[self.style_var.get()]
-                
-                # Recopilar detalles extra
-                detalles_extra = self._recopilar_detalles_extra(categoria)
-                
-                # Generar los prompts
-                prompts = self.generator.generar_prompt_con_ia(
-                    self.tipo_medio_actual,
-                    categoria,
-                    descripcion,
-                    estilo,
-                    detalles_extra
+                    # Generar los prompts mostrando los fragmentos a medida que llegan
+                    variantes = [self.generator.generar_prompt_con_ia(
+                        ajustes["tipo_medio"],
+                        ajustes["categoria"],
+                        ajustes["descripcion"],
+                        ajustes["estilo"],
+                        ajustes["detalles"],
+                        stream=True,
+                        al_recibir=lambda seccion, texto: self.root.after(
+                            0, self._agregar_fragmento_si_vigente, trabajo, seccion, texto
+                        ),
+                        cancelacion=cancelacion
+                    )]
+            prompts = variantes[0]
+            
+            # Guardar en historial
+            entrada_historial = {
+                "tipo_medio": ajustes["tipo_medio"],
+                "categoria": ajustes["etiqueta_categoria"],
+                "descripcion": ajustes["descripcion"],
+                "estilo": ajustes["etiqueta_estilo"],
+                "prompt_positivo": prompts['positivo'],
+                "prompt_negativo": prompts['negativo'],
+                "detalles": ajustes["detalles"]
+            }
+            if len(variantes) > 1:
+                entrada_historial["variantes"] = [
+                    {"positivo": v["positivo"], "negativo": v["negativo"]} for v in variantes
+                ]
+            if prompts.get("origen"):
+                entrada_historial["origen"] = prompts["origen"]
+            # Tokens consumidos (no hay si el resultado vino del caché o del generador local)
+            if prompts.get("uso"):
+                entrada_historial["uso"] = prompts["uso"]
+            
+            def guardar():
+                with traza.etapa("guardar_historial"):
+                    guardar_historial(entrada_historial)
+            
+            # Si el usuario canceló mientras llegaba la respuesta, descartarla; la cola
+            # impide que una cancelación se cuele entre esta comprobación y el guardado
+            if not self.cola_trabajos.confirmar(trabajo, guardar):
+                traza.resultado = "cancelada"
+                return None
+            if self.indice_similitud is not None:
+                with traza.etapa("indexar_historial"):
+                    self.indice_similitud.agregar(entrada_historial)
+        
+        return {"variantes": variantes, "entrada": entrada_historial}
+    
+    def _trabajo_cambiado(self, trabajo):
+        """Refleja en la interfaz el nuevo estado de un trabajo"""
+        self._actualizar_fila_trabajo(trabajo)
+        
+        activos = self.cola_trabajos.activos()
+        self.cancel_btn.configure(state="normal" if activos else "disabled")
+        if activos and not self.reloj_trabajos_activo:
+            self.reloj_trabajos_activo = True
+            self.root.after(self.INTERVALO_TRABAJOS, self._actualizar_tiempos_trabajos)
+        
+        # Solo el trabajo visible muestra su resultado o avisa de sus problemas
+        if trabajo is not self.trabajo_visible:
+            return
+        if trabajo.estado == COMPLETADO:
+            self.ver_trabajo(trabajo)
+            origen = trabajo.resultado["variantes"][0].get("origen")
+            if self.modo == MODO_AUTO and origen == "local":
+                self.mostrar_notificacion(
+                    "⚡ Respaldo local",
+                    "Gemini no respondió a tiempo: se usó el generador local. Vuelve a generar para intentarlo con Gemini."
                 )
-                
-                # Guardar en historial
-                entrada_historial = {
-                    "tipo_medio": self.tipo_medio_actual,
-                    "categoria": self.category_var.get(),
-                    "descripcion": descripcion,
-                    "estilo": self.style_var.get(),
-                    "prompt_positivo": prompts['positivo'],
-                    "prompt_negativo": prompts['negativo'],
-                    "detalles": detalles_extra
-                }
-                guardar_historial(entrada_historial)
-                
-                # Guardar para exportar
-                self.ultimo_prompt_generado = entrada_historial
-                
-                # Actualizar la UI
-                self.root.after(0, lambda: self.mostrar_resultados(prompts))
-            except Exception as e:
-                error_msg = str(e)
-                self.root.after(0, lambda: self.mostrar_notificacion("❌ Error", f"Error al generar: {error_msg}"))
-            finally:
-                self.root.after(0, lambda: self.generate_btn.configure(state="normal", text="✨ Generar Prompts"))
+        elif trabajo.estado == PLAZO:
+            self.mostrar_notificacion(
+                "⏱️ Tiempo agotado", f"Gemini no respondió en {self.PLAZO_GENERACION} segundos. Inténtalo de nuevo."
+            )
+        elif trabajo.estado == ERROR:
+            self.mostrar_notificacion("❌ Error", f"Error al generar: {trabajo.error}")
+    
+    def _actualizar_fila_trabajo(self, trabajo):
+        """Crea o actualiza la fila de un trabajo en el panel"""
+        fila = self.filas_trabajos.get(trabajo.numero)
+        if fila is None:
+            fila = self._crear_fila_trabajo(trabajo)
+            # Retirar las filas de los trabajos terminados más antiguos
+            for antiguo in self.cola_trabajos.olvidar_terminados(self.MAX_TRABAJOS_VISIBLES):
+                retirada = self.filas_trabajos.pop(antiguo.numero, None)
+                if retirada is not None:
+                    retirada["frame"].destroy()
+        
+        texto, color = self.ESTADOS_TRABAJO[trabajo.estado]
+        if trabajo.inicio is not None:
+            texto = f"{texto} • {trabajo.transcurrido():.1f} s"
+        if trabajo.estado == COMPLETADO and trabajo.resultado["variantes"][0].get("origen") == "local":
+            texto += " • local"
+        fila["estado"].configure(text=texto, text_color=self.COLORS[color])
+        fila["ver"].configure(state="normal" if trabajo.estado in (COMPLETADO, ERROR, PLAZO) else "disabled")
+        fila["cancelar"].configure(state="normal" if trabajo.activo else "disabled")
+    
+    def _crear_fila_trabajo(self, trabajo):
+        """Crea los widgets de la fila de un trabajo"""
+        self.sin_trabajos_label.pack_forget()
+        ajustes = trabajo.ajustes
+        
+        frame = ctk.CTkFrame(self.trabajos_frame, fg_color=self.COLORS["bg_tertiary"], corner_radius=6)
+        frame.pack(fill="x", padx=12, pady=(0, 6))
+        
+        icono = "🖼️" if ajustes["tipo_medio"] == "imagen" else "🎬"
+        descripcion = ajustes["descripcion"]
+        if len(descripcion) > 40:
+            descripcion = descripcion[:40] + "..."
+        variantes = f" • {ajustes['variantes']} variantes" if ajustes["variantes"] > 1 else ""
+        ctk.CTkLabel(
+            frame,
+            text=f"#{trabajo.numero} {icono} {ajustes['etiqueta_categoria']}{variantes} — {descripcion}",
+            font=("Helvetica", 10),
+            text_color=self.COLORS["text_primary"],
+            anchor="w"
+        ).pack(side="left", fill="x", expand=True, padx=(10, 6), pady=6)
+        
+        cancelar_btn = ctk.CTkButton(
+            frame,
+            text="⏹️",
+            font=("Helvetica", 10),
+            fg_color=self.COLORS["accent_danger"],
+            hover_color="#a84340",
+            width=32,
+            height=24,
+            corner_radius=6,
+            command=lambda: self.cola_trabajos.cancelar(trabajo)
+        )
+        cancelar_btn.pack(side="right", padx=(4, 8))
+        
+        ver_btn = ctk.CTkButton(
+            frame,
+            text="👁️ Ver",
+            font=("Helvetica", 10),
+            fg_color=self.COLORS["accent_secondary"],
+            hover_color="#5a6b8a",
+            width=60,
+            height=24,
+            corner_radius=6,
+            state="disabled",
+            command=lambda: self.ver_trabajo(trabajo)
+        )
+        ver_btn.pack(side="right", padx=4)
+        
+        estado_label = ctk.CTkLabel(frame, text="", font=("Helvetica", 10), width=150, anchor="e")
+        estado_label.pack(side="right", padx=6)
+        
+        fila = {"frame": frame, "estado": estado_label, "ver": ver_btn, "cancelar": cancelar_btn}
+        self.filas_trabajos[trabajo.numero] = fila
+        return fila
+    
+    def _actualizar_tiempos_trabajos(self):
+        """Actualiza el tiempo de los trabajos en curso mientras quede alguno activo"""
+        activos = self.cola_trabajos.activos()
+        for trabajo in activos:
+            if trabajo.numero in self.filas_trabajos:
+                self._actualizar_fila_trabajo(trabajo)
+        
+        if activos:
+            self.root.after(self.INTERVALO_TRABAJOS, self._actualizar_tiempos_trabajos)
+        else:
+            self.reloj_trabajos_activo = False
+    
+    def ver_trabajo(self, trabajo):
+        """Muestra los resultados de un trabajo terminado (o su error) y lo deja listo para exportar"""
+        if trabajo.estado in (ERROR, PLAZO):
+            self.mostrar_notificacion("❌ Error", f"El trabajo #{trabajo.numero} falló: {trabajo.error}")
+            return
+        if trabajo.estado != COMPLETADO:
+            return
         
-        # Ejecutar en hilo separado
-        threading.Thread(target=generar, daemon=True).start()
+        self.trabajo_visible = trabajo
+        self.ultimo_prompt_generado = trabajo.resultado["entrada"]
+        self.mostrar_variantes(trabajo.resultado["variantes"])
+    
+    def _ofrecer_reutilizar(self, descripcion, detalles_extra):
+        """
+        Busca en el historial una petición casi idéntica y pregunta si reutilizar su resultado
+        
+        Returns:
+            bool: True si el usuario aceptó y el resultado ya se muestra
+        """
+        if self.indice_similitud is None:
+            return False
+        
+        encontrado = self.indice_similitud.buscar(
+            self.tipo_medio_actual,
+            self.category_var.get(),
+            self.style_var.get(),
+            descripcion,
+            detalles_extra
+        )
+        if encontrado is None:
+            return False
+        
+        entrada, similitud = encontrado
+        reutilizar = messagebox.askyesno(
+            "♻️ Resultado similar",
+            f"Ya generaste un prompt para una descripción muy parecida ({similitud:.0%}):\n\n"
+            f"\"{entrada['descripcion']}\"\n\n¿Quieres reutilizar ese resultado sin llamar a Gemini?"
+        )
+        if not reutilizar:
+            return False
+        
+        variantes = entrada.get("variantes") or [
+            {"positivo": entrada["prompt_positivo"], "negativo": entrada["prompt_negativo"]}
+        ]
+        # El resultado reutilizado ocupa los campos: ningún streaming en curso debe sobrescribirlo
+        self.trabajo_visible = None
+        self.ultimo_prompt_generado = entrada
+        self.mostrar_variantes(variantes)
+        return True
+    
+    def cancelar_generacion(self):
+        """Abandona todos los trabajos en cola o en curso"""
+        cancelados = self.cola_trabajos.cancelar_todos()
+        if cancelados:
+            self.mostrar_notificacion("⏹️ Cancelado", f"Se cancelaron {cancelados} trabajos en cola o en curso")
+    
+    def _agregar_fragmento_si_vigente(self, trabajo, seccion, texto):
+        """Muestra un fragmento en streaming si su trabajo es el visible y no se canceló"""
+        if trabajo is self.trabajo_visible and not trabajo.cancelacion.cancelado:
+            self.agregar_fragmento(seccion, texto)
     
     def _recopilar_detalles_extra(self, categoria):
         """Recopila detalles extra según la categoría"""
@@ -792,11 +1223,50 @@ class BrainCourseGUI:
         
         return detalles
     
+    def agregar_fragmento(self, seccion, texto):
+        """Agrega un fragmento recibido en streaming al campo de texto de su sección"""
+        widget = self.positive_text if seccion == "positivo" else self.negative_text
+        widget.insert("end", texto)
+        widget.see("end")
+    
     def mostrar_resultados(self, prompts):
         """Muestra los prompts generados en los campos de texto"""
+        # Reemplazar el texto parcial recibido en streaming por el resultado final
+        self.positive_text.delete("1.0", "end")
+        self.negative_text.delete("1.0", "end")
         self.positive_text.insert("1.0", prompts['positivo'])
         self.negative_text.insert("1.0", prompts['negativo'])
     
+    def mostrar_variantes(self, variantes):
+        """Muestra la primera variante y, si hay varias, el selector para alternar entre ellas"""
+        self.variantes_actuales = variantes
+        
+        if len(variantes) > 1:
+            nombres = [f"Variante {i + 1}" for i in range(len(variantes))]
+            self.variantes_selector.configure(values=nombres)
+            self.variantes_selector.set(nombres[0])
+            self.variantes_selector.pack(after=self.results_label, pady=(0, 8))
+        else:
+            self.variantes_selector.pack_forget()
+        
+        self.mostrar_resultados(variantes[0])
+    
+    def mostrar_variante(self, nombre):
+        """Muestra la variante seleccionada y la deja lista para exportar"""
+        indice = int(nombre.split()[-1]) - 1
+        if not 0 <= indice < len(self.variantes_actuales):
+            return
+        
+        prompts = self.variantes_actuales[indice]
+        self.mostrar_resultados(prompts)
+        
+        if self.ultimo_prompt_generado:
+            self.ultimo_prompt_generado = dict(
+                self.ultimo_prompt_generado,
+                prompt_positivo=prompts['positivo'],
+                prompt_negativo=prompts['negativo']
+            )
+    
     def exportar_prompt_actual(self):
         """Exporta el prompt actual a un archivo de texto"""
         if not self.ultimo_prompt_generado:
@@ -824,6 +1294,10 @@ class BrainCourseGUI:
     def abrir_historial(self):
         """Abre la ventana de historial"""
         HistorialWindow(self.root, self)
+    
+    def abrir_metricas(self):
+        """Abre la ventana de métricas de rendimiento"""
+        MetricasWindow(self.root, self)
 
 
 class HistorialWindow:
@@ -918,6 +1392,81 @@ class HistorialWindow:
         desc_label.pack(fill="x", padx=15, pady=(0, 10))
 
 
+class MetricasWindow:
+    """Ventana con los percentiles de duración por etapa y por categoría"""
+    
+    # Cada cuántos milisegundos se actualizan las cifras mientras la ventana está abierta
+    INTERVALO_ACTUALIZACION = 2000
+    
+    def __init__(self, parent, gui_principal):
+        self.parent = parent
+        self.gui_principal = gui_principal
+        
+        self.window = ctk.CTkToplevel(parent)
+        self.window.title("📊 Métricas de Rendimiento")
+        self.window.geometry("860x620")
+        
+        # El consumo de tokens sale del historial: se calcula una vez al abrir la ventana
+        try:
+            self.consumo = formatear_informe(informe_uso(cargar_historial(), "categoria"))
+        except Exception as e:
+            self.consumo = f"Error al leer el consumo del historial: {e}"
+        
+        self.crear_interfaz()
+        self.actualizar()
+    
+    def crear_interfaz(self):
+        """Crea la interfaz de la ventana de métricas"""
+        colores = self.gui_principal.COLORS
+        
+        header = ctk.CTkFrame(self.window, fg_color=colores["bg_secondary"], corner_radius=0)
+        header.pack(fill="x", padx=0, pady=0)
+        
+        title = ctk.CTkLabel(
+            header,
+            text="📊 Duración por Etapa y por Categoría (p50 / p95 / p99)",
+            font=("Helvetica", 16, "bold"),
+            text_color=colores["text_primary"]
+        )
+        title.pack(pady=(15, 3))
+        
+        ruta_label = ctk.CTkLabel(
+            header,
+            text=f"Registro completo: {obtener_metricas().directorio}",
+            font=("Helvetica", 10),
+            text_color=colores["text_secondary"]
+        )
+        ruta_label.pack(pady=(0, 12))
+        
+        self.texto = ctk.CTkTextbox(
+            self.window,
+            font=("Courier", 11),
+            fg_color=colores["bg_tertiary"],
+            text_color=colores["text_primary"],
+            wrap="none"
+        )
+        self.texto.pack(fill="both", expand=True, padx=20, pady=20)
+    
+    def actualizar(self):
+        """Vuelve a calcular los percentiles y programa la siguiente actualización"""
+        if not self.window.winfo_exists():
+            return
+        
+        metricas = obtener_metricas()
+        if metricas.trazas:
+            contenido = metricas.formatear()
+        else:
+            contenido = "Todavía no hay generaciones medidas en esta sesión."
+        contenido += "\n\nCONSUMO DE TOKENS DEL HISTORIAL\n" + self.consumo
+        
+        self.texto.configure(state="normal")
+        self.texto.delete("1.0", "end")
+        self.texto.insert("1.0", contenido)
+        self.texto.configure(state="disabled")
+        
+        self.window.after(self.INTERVALO_ACTUALIZACION, self.actualizar)
+
+
 # Variable global para acceder a los colores desde HistorialWindow
 gui_principal = None
 
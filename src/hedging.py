@@ -0,0 +1,354 @@
+"""
+Peticiones de cobertura (hedged requests) para PROMPTS IA
+Si una llamada tarda más que el p95 observado se lanza un duplicado y se usa la primera respuesta
+"""
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, TypeVar
+
+from .cancellation import TokenCancelacion
+
+T = TypeVar("T")
+
+
+def percentil(valores: List[float], p: float) -> Optional[float]:
+    """
+    Percentil 'p' (0-100) por el método del rango más cercano
+
+    Args:
+        valores (List[float]): Muestras (no hace falta que estén ordenadas)
+        p (float): Percentil a calcular
+
+    Returns:
+        Optional[float]: Valor del percentil, o None si no hay muestras
+    """
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+class VentanaLatencias:
+    """Últimas N latencias observadas, para calcular percentiles móviles"""
+
+    def __init__(self, capacidad: int = 500):
+        self._muestras: Deque[float] = deque(maxlen=capacidad)
+        self._lock = threading.Lock()
+
+    def registrar(self, segundos: float) -> None:
+        with self._lock:
+            self._muestras.append(segundos)
+
+    def percentil(self, p: float) -> Optional[float]:
+        with self._lock:
+            muestras = list(self._muestras)
+        return percentil(muestras, p)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._muestras)
+
+
+class _Temporizador:
+    """
+    Un único hilo que ejecuta acciones programadas a su hora
+
+    Lanza los duplicados sin ocupar un hilo por llamada mientras se espera el umbral.
+    Las acciones deben ser breves (solo encargan el duplicado al pool).
+    """
+
+    def __init__(self):
+        self._pendientes: List[list] = []  # montículo de [momento, orden, acción]
+        self._orden = itertools.count()
+        self._condicion = threading.Condition()
+        self._hilo: Optional[threading.Thread] = None
+        self._cerrado = False
+
+    def programar(self, segundos: float, accion: Callable[[], None]) -> list:
+        """Programa 'accion' dentro de 'segundos'; devuelve la entrada para anularla"""
+        entrada = [time.monotonic() + segundos, next(self._orden), accion]
+        with self._condicion:
+            heapq.heappush(self._pendientes, entrada)
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._bucle, name="cobertura-temporizador", daemon=True)
+                self._hilo.start()
+            self._condicion.notify()
+        return entrada
+
+    def anular(self, entrada: list) -> None:
+        """Evita que una acción programada se ejecute (se descarta al llegar su hora)"""
+        with self._condicion:
+            entrada[2] = None
+
+    def cerrar(self) -> None:
+        with self._condicion:
+            self._cerrado = True
+            self._pendientes.clear()
+            self._condicion.notify()
+
+    def _bucle(self) -> None:
+        while True:
+            with self._condicion:
+                accion = None
+                while accion is None:
+                    if self._cerrado:
+                        return
+                    while self._pendientes and self._pendientes[0][2] is None:
+                        heapq.heappop(self._pendientes)
+                    if not self._pendientes:
+                        self._condicion.wait()
+                        continue
+                    espera = self._pendientes[0][0] - time.monotonic()
+                    if espera > 0:
+                        self._condicion.wait(espera)
+                        continue
+                    accion = heapq.heappop(self._pendientes)[2]
+            try:
+                accion()
+            except Exception as e:
+                print(f"Error al lanzar la petición de cobertura: {e}")
+
+
+class _Carrera:
+    """
+    Estado compartido entre el intento principal y su duplicado
+
+    El llamador espera 'terminado', que se activa con la primera respuesta correcta
+    o cuando han fallado todos los intentos lanzados.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.terminado = threading.Event()
+        self.tokens: Dict[str, TokenCancelacion] = {}
+        self.principal_terminado = False
+        self.fallidos = 0
+        self.errores: Dict[str, BaseException] = {}
+        self.ganador: Optional[str] = None
+        self.resultado: Any = None
+        self.segundos = 0.0
+
+    def exito(self, nombre: str, resultado: Any, segundos: float) -> None:
+        with self.lock:
+            if nombre == "principal":
+                self.principal_terminado = True
+            if self.ganador is not None:
+                return
+            self.ganador = nombre
+            self.resultado = resultado
+            self.segundos = segundos
+            perdedores = [token for otro, token in self.tokens.items() if otro != nombre]
+        self.terminado.set()
+        # El perdedor se detiene en su siguiente punto de control
+        for token in perdedores:
+            token.cancelar()
+
+    def fallo(self, nombre: str, error: BaseException) -> None:
+        with self.lock:
+            if nombre == "principal":
+                self.principal_terminado = True
+            self.fallidos += 1
+            self.errores[nombre] = error
+            # Sin duplicado lanzado, el fallo del principal cierra la carrera
+            if self.fallidos == len(self.tokens):
+                self.terminado.set()
+
+
+class PoliticaCobertura:
+    """
+    Política de peticiones de cobertura (hedging) para recortar la cola de latencia
+
+    Si el intento principal no terminó cuando alcanza el percentil 'percentil' de
+    las latencias recientes, se lanza un duplicado en el pool y gana la primera
+    respuesta correcta, que se devuelve en cuanto llega. El perdedor recibe su token
+    derivado cancelado y se detiene en su siguiente punto de control (p. ej. el
+    siguiente fragmento en streaming). Un presupuesto limita los duplicados a una
+    fracción de las peticiones, para que una degradación general de la API no
+    duplique la carga.
+    """
+
+    def __init__(self, percentil: float = 95.0, min_muestras: int = 20,
+                 proporcion_maxima: float = 0.05, reserva_maxima: float = 5.0,
+                 max_workers: int = 32, capacidad_ventana: int = 500):
+        """
+        Inicializa la política
+
+        Args:
+            percentil (float): Percentil de latencia a partir del cual se lanza el duplicado
+            min_muestras (int): Latencias necesarias antes de empezar a duplicar
+            proporcion_maxima (float): Duplicados permitidos por cada petición (0.05 = 5 %)
+            reserva_maxima (float): Saldo máximo del presupuesto (tamaño de una ráfaga de duplicados)
+            max_workers (int): Hilos para los duplicados simultáneos (los intentos principales
+                no usan el pool)
+            capacidad_ventana (int): Latencias recientes usadas para el percentil
+        """
+        self.percentil = percentil
+        self.min_muestras = min_muestras
+        self.proporcion_maxima = proporcion_maxima
+        self.reserva_maxima = reserva_maxima
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cobertura")
+        self._temporizador = _Temporizador()
+        self._lock = threading.Lock()
+        self._saldo = 0.0
+
+        # Latencia de cada intento ganador (alimenta el umbral) y latencia de extremo a extremo
+        self.latencias_intento = VentanaLatencias(capacidad_ventana)
+        self.latencias_totales = VentanaLatencias(capacidad_ventana)
+
+        self.peticiones = 0
+        self.coberturas = 0
+        self.coberturas_ganadoras = 0
+        self.coberturas_denegadas = 0
+
+    def umbral(self) -> Optional[float]:
+        """Segundos de espera antes de duplicar (None mientras no haya muestras suficientes)"""
+        if len(self.latencias_intento) < self.min_muestras:
+            return None
+        return self.latencias_intento.percentil(self.percentil)
+
+    def _registrar_peticion(self) -> None:
+        """Cada petición aporta saldo al presupuesto de duplicados"""
+        with self._lock:
+            self.peticiones += 1
+            self._saldo = min(self.reserva_maxima, self._saldo + self.proporcion_maxima)
+
+    def _autorizar_cobertura(self) -> bool:
+        """Consume una unidad del presupuesto si hay saldo"""
+        with self._lock:
+            if self._saldo >= 1:
+                self._saldo -= 1
+                self.coberturas += 1
+                return True
+            self.coberturas_denegadas += 1
+            return False
+
+    @staticmethod
+    def _correr(funcion: Callable[[TokenCancelacion], T], nombre: str,
+                padre: TokenCancelacion, carrera: _Carrera) -> None:
+        """Ejecuta un intento e informa a la carrera de su resultado"""
+        token = carrera.tokens[nombre]
+        inicio = time.perf_counter()
+        try:
+            resultado = funcion(token)
+        except BaseException as e:
+            carrera.fallo(nombre, e)
+        else:
+            carrera.exito(nombre, resultado, time.perf_counter() - inicio)
+        finally:
+            padre.liberar(token)
+
+    def _lanzar_duplicado(self, funcion: Callable[[TokenCancelacion], T], padre: TokenCancelacion,
+                          carrera: _Carrera) -> None:
+        """Lo llama el temporizador al alcanzar el umbral: encarga el duplicado al pool si procede"""
+        with carrera.lock:
+            if (carrera.principal_terminado or carrera.ganador is not None or padre.cancelado
+                    or not self._autorizar_cobertura()):
+                return
+            carrera.tokens["duplicado"] = padre.derivado()
+
+        try:
+            self._executor.submit(self._correr, funcion, "duplicado", padre, carrera)
+        except RuntimeError as e:
+            # Pool cerrado: el principal sigue solo
+            padre.liberar(carrera.tokens["duplicado"])
+            carrera.fallo("duplicado", e)
+
+    def ejecutar(self, funcion: Callable[[TokenCancelacion], T],
+                 cancelacion: Optional[TokenCancelacion] = None) -> T:
+        """
+        Ejecuta la llamada con un posible duplicado de cobertura
+
+        Mientras no hay latencias suficientes para fijar el umbral, la llamada corre
+        directamente en el hilo del llamador. Después, el intento principal corre en
+        un hilo propio (no en el pool, para no limitar el número de llamadas
+        simultáneas) y el llamador espera a la primera respuesta correcta de
+        cualquiera de los dos intentos, aunque el otro siga bloqueado esperando su
+        primer fragmento. 'funcion' debe comprobar su token con frecuencia para que
+        el intento perdedor termine pronto.
+
+        Args:
+            funcion (Callable): Recibe el token de cancelación del intento y realiza la llamada
+            cancelacion (TokenCancelacion): Cancelación y plazo de la generación completa
+
+        Returns:
+            El resultado del primer intento que termine correctamente
+        """
+        self._registrar_peticion()
+        padre = cancelacion if cancelacion is not None else TokenCancelacion()
+        inicio = time.perf_counter()
+
+        umbral = self.umbral()
+        if umbral is None:
+            resultado = funcion(padre)
+            segundos = time.perf_counter() - inicio
+            self.latencias_intento.registrar(segundos)
+            self.latencias_totales.registrar(segundos)
+            return resultado
+
+        carrera = _Carrera()
+        carrera.tokens["principal"] = padre.derivado()
+        threading.Thread(target=self._correr, args=(funcion, "principal", padre, carrera),
+                         name="cobertura-principal", daemon=True).start()
+
+        restante = padre.restante()
+        espera = umbral if restante is None else min(umbral, restante)
+        programado = self._temporizador.programar(
+            espera, lambda: self._lanzar_duplicado(funcion, padre, carrera))
+
+        try:
+            # Espera en tramos cortos para atender la cancelación aunque los intentos sigan bloqueados
+            while not carrera.terminado.is_set():
+                padre.verificar()
+                carrera.terminado.wait(0.1)
+
+            if carrera.ganador is None:
+                padre.verificar()
+                raise carrera.errores.get("principal") or carrera.errores["duplicado"]
+
+            self.latencias_intento.registrar(carrera.segundos)
+            self.latencias_totales.registrar(time.perf_counter() - inicio)
+            if carrera.ganador == "duplicado":
+                with self._lock:
+                    self.coberturas_ganadoras += 1
+            return carrera.resultado
+        finally:
+            self._temporizador.anular(programado)
+            # Cancelar los intentos que sigan en curso (el perdedor, o ambos si se abandona la generación)
+            with carrera.lock:
+                tokens = list(carrera.tokens.values())
+            for token in tokens:
+                token.cancelar()
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """
+        Devuelve los contadores y percentiles de latencia
+
+        Returns:
+            Dict: peticiones, duplicados, proporción y p50/p95/p99 de extremo a extremo (segundos)
+        """
+        with self._lock:
+            peticiones = self.peticiones
+            coberturas = self.coberturas
+            datos = {
+                "peticiones": peticiones,
+                "coberturas": coberturas,
+                "coberturas_ganadoras": self.coberturas_ganadoras,
+                "coberturas_denegadas": self.coberturas_denegadas,
+                "proporcion_coberturas": round(coberturas / peticiones, 4) if peticiones else 0.0,
+            }
+        datos["umbral"] = self.umbral()
+        for p in (50, 95, 99):
+            datos[f"p{p}"] = self.latencias_totales.percentil(p)
+        return datos
+
+    def cerrar(self) -> None:
+        """Libera los hilos del pool y del temporizador"""
+        self._temporizador.cerrar()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
@@ -0,0 +1,271 @@
+"""
+Cola de trabajos de generación para PROMPTS IA
+Permite encargar varias generaciones seguidas (cada una con sus propios ajustes) que se
+ejecutan en paralelo hasta un límite, con su estado, tiempo transcurrido y resultado
+"""
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from .cancellation import GeneracionCancelada, PlazoExcedido, TokenCancelacion
+
+
+# Estados de un trabajo
+EN_COLA = "en_cola"
+GENERANDO = "generando"
+COMPLETADO = "completado"
+ERROR = "error"
+CANCELADO = "cancelado"
+PLAZO = "plazo"
+
+ESTADOS_ACTIVOS = (EN_COLA, GENERANDO)
+
+
+class Trabajo:
+    """
+    Una generación encargada a la cola
+
+    Lo escribe la cola (con su lock) y lo lee la interfaz: cada campo se
+    reemplaza de una vez, así que una lectura nunca ve un valor a medias.
+    """
+
+    def __init__(self, numero: int, ajustes: Dict[str, Any]):
+        """
+        Inicializa el trabajo
+
+        Args:
+            numero (int): Número correlativo del trabajo en la sesión
+            ajustes (Dict): Parámetros de la generación (tipo de medio, categoría, descripción...)
+        """
+        self.numero = numero
+        self.ajustes = ajustes
+        self.estado = EN_COLA
+        self.cancelacion = TokenCancelacion()
+        self.creado = time.monotonic()
+        self.inicio: Optional[float] = None
+        self.fin: Optional[float] = None
+        self.resultado: Any = None
+        self.error: Optional[str] = None
+        # Se confirma (con confirmar()) antes de guardar el resultado; a partir de ahí ya no se cancela
+        self.confirmado = False
+        self._lock_confirmacion = threading.Lock()
+
+    @property
+    def activo(self) -> bool:
+        """Si el trabajo todavía no terminó (en cola o generando)"""
+        return self.estado in ESTADOS_ACTIVOS
+
+    def transcurrido(self) -> float:
+        """Segundos generando (hasta ahora o hasta que terminó); 0 mientras espera en la cola"""
+        if self.inicio is None:
+            return 0.0
+        return (self.fin if self.fin is not None else time.monotonic()) - self.inicio
+
+
+class ColaTrabajos:
+    """
+    Ejecuta trabajos de generación en paralelo hasta un límite
+
+    Los trabajos que superan el límite esperan su turno en orden de llegada. El
+    plazo de cada trabajo empieza a contar cuando arranca, no mientras espera.
+
+    Cada trabajo en curso corre en su propio hilo daemon. Al cancelarlo se da por
+    terminado al momento, pero su plaza no pasa al siguiente de la cola hasta que
+    el hilo termina de verdad (su token está cancelado, así que se detiene en el
+    siguiente punto de control); así nunca hay más llamadas reales al modelo que
+    'max_simultaneos'. Lo que devuelva después se descarta.
+
+    Cada cambio de estado se notifica con 'al_cambiar' desde el hilo que lo produce
+    (la interfaz debe pasar la actualización a su propio hilo).
+    """
+
+    def __init__(self, ejecutar: Callable[[Trabajo], Any], max_simultaneos: int = 3,
+                 plazo: Optional[float] = None,
+                 al_cambiar: Optional[Callable[[Trabajo], None]] = None):
+        """
+        Inicializa la cola
+
+        Args:
+            ejecutar (Callable[[Trabajo], Any]): Realiza la generación y devuelve su resultado;
+                debe respetar trabajo.cancelacion
+            max_simultaneos (int): Trabajos que se ejecutan a la vez
+            plazo (float): Segundos máximos por trabajo desde que empieza (None = sin plazo)
+            al_cambiar (Callable[[Trabajo], None]): Se llama en cada cambio de estado
+        """
+        if max_simultaneos < 1:
+            raise ValueError("max_simultaneos debe ser al menos 1")
+
+        self.ejecutar = ejecutar
+        self.max_simultaneos = max_simultaneos
+        self.plazo = plazo
+        self.al_cambiar = al_cambiar
+
+        self._numeros = itertools.count(1)
+        self._lock = threading.Lock()
+        self._pendientes: Deque[Trabajo] = deque()
+        self._en_curso = 0
+        self.trabajos: List[Trabajo] = []
+
+    def encargar(self, ajustes: Dict[str, Any]) -> Trabajo:
+        """
+        Añade un trabajo a la cola
+
+        Args:
+            ajustes (Dict): Parámetros de la generación
+
+        Returns:
+            Trabajo: El trabajo creado (en cola o ya generando)
+        """
+        trabajo = Trabajo(next(self._numeros), ajustes)
+        with self._lock:
+            self.trabajos.append(trabajo)
+            self._pendientes.append(trabajo)
+        self._notificar(trabajo)
+        self._despachar()
+        return trabajo
+
+    def _notificar(self, trabajo: Trabajo) -> None:
+        if self.al_cambiar is not None:
+            try:
+                self.al_cambiar(trabajo)
+            except Exception as e:
+                print(f"Error al notificar el trabajo #{trabajo.numero}: {e}")
+
+    def _despachar(self) -> None:
+        """Arranca los trabajos de la cola mientras haya plazas libres"""
+        iniciados = []
+        with self._lock:
+            while self._en_curso < self.max_simultaneos and self._pendientes:
+                trabajo = self._pendientes.popleft()
+                # Cancelado mientras esperaba: ya se notificó y no llega a empezar
+                if trabajo.estado != EN_COLA:
+                    continue
+                if self.plazo is not None:
+                    trabajo.cancelacion.limite = time.monotonic() + self.plazo
+                trabajo.inicio = time.monotonic()
+                trabajo.estado = GENERANDO
+                self._en_curso += 1
+                iniciados.append(trabajo)
+
+        for trabajo in iniciados:
+            self._notificar(trabajo)
+            threading.Thread(target=self._correr, args=(trabajo,), daemon=True,
+                             name=f"trabajo-{trabajo.numero}").start()
+
+    def _terminar(self, trabajo: Trabajo, estado: str, resultado: Any = None, error: Optional[str] = None) -> bool:
+        """
+        Da por terminado un trabajo activo (su plaza se libera al terminar su hilo)
+
+        Returns:
+            bool: False si el trabajo ya había terminado (p. ej. un resultado que llega tras cancelarlo)
+        """
+        with self._lock:
+            if not trabajo.activo:
+                return False
+            trabajo.resultado = resultado
+            trabajo.error = error
+            trabajo.fin = time.monotonic() if trabajo.inicio is not None else None
+            trabajo.estado = estado
+
+        self._notificar(trabajo)
+        return True
+
+    def _correr(self, trabajo: Trabajo) -> None:
+        """Ejecuta un trabajo ya arrancado en su propio hilo y, al salir, cede su plaza"""
+        try:
+            resultado = self.ejecutar(trabajo)
+        except PlazoExcedido:
+            self._terminar(trabajo, PLAZO, error=f"Sin respuesta en {self.plazo:g} segundos")
+        except GeneracionCancelada:
+            self._terminar(trabajo, CANCELADO)
+        except Exception as e:
+            self._terminar(trabajo, ERROR, error=str(e) or type(e).__name__)
+        else:
+            # Si se canceló mientras llegaba la respuesta, se descarta
+            if trabajo.cancelacion.cancelacion_solicitada:
+                self._terminar(trabajo, CANCELADO)
+            else:
+                self._terminar(trabajo, COMPLETADO, resultado)
+        finally:
+            with self._lock:
+                self._en_curso -= 1
+            self._despachar()
+
+    def confirmar(self, trabajo: Trabajo, accion: Callable[[], None]) -> bool:
+        """
+        Ejecuta 'accion' (p. ej. guardar el resultado) solo si el trabajo no se canceló
+
+        Una cancelación no puede colarse entre la comprobación y la acción: espera a
+        que termine y, como el trabajo ya está confirmado, no tiene efecto.
+
+        Args:
+            trabajo (Trabajo): Trabajo en curso
+            accion (Callable[[], None]): Efecto que no debe producirse si se cancela
+
+        Returns:
+            bool: False si el trabajo ya estaba cancelado (la acción no se ejecutó)
+        """
+        with trabajo._lock_confirmacion:
+            if trabajo.cancelacion.cancelacion_solicitada:
+                return False
+            trabajo.confirmado = True
+            accion()
+            return True
+
+    def cancelar(self, trabajo: Trabajo) -> bool:
+        """
+        Cancela un trabajo en cola o en curso
+
+        Queda cancelado al momento; si estaba generando, su plaza pasa al siguiente
+        trabajo de la cola cuando su hilo termina. Un trabajo ya confirmado no se cancela.
+
+        Returns:
+            bool: Si el trabajo quedó cancelado
+        """
+        with trabajo._lock_confirmacion:
+            if trabajo.confirmado:
+                return False
+            trabajo.cancelacion.cancelar()
+        return self._terminar(trabajo, CANCELADO)
+
+    def cancelar_todos(self) -> int:
+        """
+        Cancela todos los trabajos activos
+
+        Returns:
+            int: Número de trabajos cancelados
+        """
+        return sum(self.cancelar(trabajo) for trabajo in self.activos())
+
+    def activos(self) -> List[Trabajo]:
+        """Trabajos en cola o generando"""
+        with self._lock:
+            return [t for t in self.trabajos if t.activo]
+
+    def olvidar_terminados(self, conservar: int) -> List[Trabajo]:
+        """
+        Descarta los trabajos terminados más antiguos
+
+        Args:
+            conservar (int): Trabajos que se conservan como máximo (los activos nunca se descartan)
+
+        Returns:
+            List[Trabajo]: Trabajos descartados
+        """
+        with self._lock:
+            sobrantes = len(self.trabajos) - conservar
+            descartados = []
+            for trabajo in self.trabajos:
+                if sobrantes <= 0:
+                    break
+                if not trabajo.activo:
+                    descartados.append(trabajo)
+                    sobrantes -= 1
+            self.trabajos = [t for t in self.trabajos if t not in descartados]
+            return descartados
+
+    def cerrar(self) -> None:
+        """Cancela los trabajos en cola y en curso (sus hilos daemon no retienen el cierre)"""
+        self.cancelar_todos()
@@ -0,0 +1,256 @@
+"""
+Métricas de rendimiento para PROMPTS IA
+Mide la duración de cada etapa de una generación (plantilla, red, parseo, historial...)
+y la guarda en un archivo JSON Lines rotativo, con percentiles en memoria para la interfaz
+"""
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, Optional
+
+from .cancellation import GeneracionCancelada, PlazoExcedido
+from .hedging import VentanaLatencias
+
+
+class Traza:
+    """
+    Tiempos de las etapas de una operación (una generación, un clic en Generar...)
+
+    Se usa como gestor de contexto: al salir se registra con el resultado
+    ("ok", o "cancelada"/"plazo"/"error" si hubo una excepción) y las duraciones
+    de cada etapa medida con etapa(). Sin registro no mide nada.
+    """
+
+    def __init__(self, registro: Optional["RegistroMetricas"], operacion: str, **campos: Any):
+        """
+        Inicializa la traza
+
+        Args:
+            registro (RegistroMetricas): Destino de la traza (None = traza nula)
+            operacion (str): Nombre de la operación (p. ej. "generar_prompt")
+            **campos: Datos de la operación (categoría, modelo, tamaños...)
+        """
+        self.registro = registro
+        self.operacion = operacion
+        self.campos: Dict[str, Any] = dict(campos)
+        self.etapas: Dict[str, float] = {}
+        self.resultado = "ok"
+        self.inicio = time.perf_counter()
+
+    def etapa(self, nombre: str) -> "_Etapa":
+        """
+        Mide la duración del bloque como una etapa de la operación
+
+        Args:
+            nombre (str): Nombre de la etapa; si se repite, las duraciones se suman
+        """
+        return _Etapa(self, nombre)
+
+    def anotar(self, **campos: Any) -> None:
+        """Añade o reemplaza datos de la operación"""
+        self.campos.update(campos)
+
+    def __enter__(self) -> "Traza":
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, excepcion, _traceback) -> None:
+        if excepcion is not None:
+            if isinstance(excepcion, PlazoExcedido):
+                self.resultado = "plazo"
+            elif isinstance(excepcion, GeneracionCancelada):
+                self.resultado = "cancelada"
+            else:
+                self.resultado = "error"
+                self.campos["error"] = str(excepcion)[:200]
+        if self.registro is not None:
+            self.registro.registrar(self, time.perf_counter() - self.inicio)
+
+
+class _Etapa:
+    """Bloque medido de una traza (sin generador para que el coste sea mínimo)"""
+
+    __slots__ = ("traza", "nombre", "comienzo")
+
+    def __init__(self, traza: Traza, nombre: str):
+        self.traza = traza
+        self.nombre = nombre
+
+    def __enter__(self) -> None:
+        self.comienzo = time.perf_counter()
+
+    def __exit__(self, *_excepcion) -> None:
+        etapas = self.traza.etapas
+        etapas[self.nombre] = etapas.get(self.nombre, 0.0) + time.perf_counter() - self.comienzo
+
+
+class RegistroMetricas:
+    """
+    Registro de las trazas del proceso
+
+    Cada traza se escribe como una línea JSON en metrics/metricas.jsonl (con
+    rotación por tamaño, vía RotatingFileHandler) y alimenta ventanas de
+    latencias por etapa y por categoría para calcular p50/p95/p99 al momento.
+    """
+
+    def __init__(self, directorio: Optional[str] = None, max_bytes: int = 5 * 1024 * 1024,
+                 copias: int = 5, capacidad_ventana: int = 1000, escribir_archivo: bool = True):
+        """
+        Inicializa el registro
+
+        Args:
+            directorio (str): Carpeta de los archivos (por defecto "metrics/" en la raíz del proyecto)
+            max_bytes (int): Tamaño a partir del cual se rota el archivo
+            copias (int): Archivos rotados que se conservan (metricas.jsonl.1, .2, ...)
+            capacidad_ventana (int): Muestras recientes por etapa/categoría para los percentiles
+            escribir_archivo (bool): Si es False, las métricas solo se agregan en memoria
+        """
+        if directorio is None:
+            script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            directorio = os.path.join(script_dir, "metrics")
+
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.copias = copias
+        self.capacidad_ventana = capacidad_ventana
+        self.escribir_archivo = escribir_archivo
+
+        # Logger propio (fuera de la jerarquía de logging) creado con la primera traza
+        self._logger: Optional[logging.Logger] = None
+        self._lock = threading.Lock()
+
+        self._por_etapa: Dict[str, VentanaLatencias] = {}
+        self._por_categoria: Dict[str, VentanaLatencias] = {}
+        self.trazas = 0
+        self.resultados: Dict[str, int] = {}
+
+    def traza(self, operacion: str, **campos: Any) -> Traza:
+        """
+        Crea una traza asociada a este registro
+
+        Args:
+            operacion (str): Nombre de la operación
+            **campos: Datos de la operación (categoría, modelo, tamaños...)
+
+        Returns:
+            Traza: Gestor de contexto que se registra al salir
+        """
+        return Traza(self, operacion, **campos)
+
+    def _obtener_logger(self) -> logging.Logger:
+        """Crea el logger con el RotatingFileHandler; debe llamarse con el lock tomado"""
+        if self._logger is None:
+            os.makedirs(self.directorio, exist_ok=True)
+            manejador = RotatingFileHandler(
+                os.path.join(self.directorio, "metricas.jsonl"),
+                maxBytes=self.max_bytes, backupCount=self.copias, encoding="utf-8"
+            )
+            manejador.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.Logger("prompts_ia.metricas")
+            logger.addHandler(manejador)
+            self._logger = logger
+        return self._logger
+
+    def _ventana(self, ventanas: Dict[str, VentanaLatencias], clave: str) -> VentanaLatencias:
+        ventana = ventanas.get(clave)
+        if ventana is None:
+            ventana = ventanas[clave] = VentanaLatencias(self.capacidad_ventana)
+        return ventana
+
+    def registrar(self, traza: Traza, total: float) -> None:
+        """
+        Agrega una traza terminada y la escribe en el archivo
+
+        Args:
+            traza (Traza): Traza terminada
+            total (float): Duración total de la operación en segundos
+        """
+        registro = {
+            "ts": datetime.now().isoformat(timespec="milliseconds"),
+            "operacion": traza.operacion,
+            "resultado": traza.resultado,
+            "total_ms": round(total * 1000, 3),
+            "etapas_ms": {nombre: round(s * 1000, 3) for nombre, s in traza.etapas.items()},
+        }
+        registro.update(traza.campos)
+
+        with self._lock:
+            self.trazas += 1
+            self.resultados[traza.resultado] = self.resultados.get(traza.resultado, 0) + 1
+            self._ventana(self._por_etapa, f"{traza.operacion}/total").registrar(total)
+            for nombre, segundos in traza.etapas.items():
+                self._ventana(self._por_etapa, f"{traza.operacion}/{nombre}").registrar(segundos)
+            if traza.campos.get("categoria"):
+                self._ventana(self._por_categoria, f"{traza.operacion}/{traza.campos['categoria']}").registrar(total)
+
+            if self.escribir_archivo:
+                try:
+                    self._obtener_logger().info(json.dumps(registro, ensure_ascii=False))
+                except Exception as e:
+                    print(f"Error al escribir métricas: {e}")
+
+    @staticmethod
+    def _percentiles(ventanas: Dict[str, VentanaLatencias]) -> Dict[str, Dict[str, Any]]:
+        resultado = {}
+        for clave, ventana in sorted(ventanas.items()):
+            datos: Dict[str, Any] = {"n": len(ventana)}
+            for p in (50, 95, 99):
+                valor = ventana.percentil(p)
+                datos[f"p{p}_ms"] = round(valor * 1000, 2) if valor is not None else None
+            resultado[clave] = datos
+        return resultado
+
+    def estadisticas(self) -> Dict[str, Any]:
+        """
+        Devuelve los percentiles recientes
+
+        Returns:
+            Dict: 'etapas' y 'categorias' ("operacion/nombre" -> n, p50_ms, p95_ms, p99_ms),
+                número de trazas y conteo por resultado
+        """
+        with self._lock:
+            por_etapa = dict(self._por_etapa)
+            por_categoria = dict(self._por_categoria)
+            trazas = self.trazas
+            resultados = dict(self.resultados)
+        return {
+            "trazas": trazas,
+            "resultados": resultados,
+            "etapas": self._percentiles(por_etapa),
+            "categorias": self._percentiles(por_categoria),
+        }
+
+    def formatear(self) -> str:
+        """Tabla de texto con los percentiles por etapa y por categoría"""
+        estadisticas = self.estadisticas()
+        lineas = [f"Trazas: {estadisticas['trazas']}  •  " +
+                  "  ".join(f"{k}: {v}" for k, v in sorted(estadisticas["resultados"].items()))]
+
+        def formato(valor: Optional[float]) -> str:
+            return f"{valor:>9.1f}" if valor is not None else f"{'-':>9}"
+
+        for titulo, grupo in (("POR ETAPA", "etapas"), ("POR CATEGORÍA", "categorias")):
+            lineas.append("")
+            lineas.append(f"{titulo:<40} {'n':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+            for clave, datos in estadisticas[grupo].items():
+                lineas.append(f"{clave[:40]:<40} {datos['n']:>6} {formato(datos['p50_ms'])} "
+                              f"{formato(datos['p95_ms'])} {formato(datos['p99_ms'])}")
+        return "\n".join(lineas)
+
+
+# Registro único del proceso
+_metricas_global: Optional[RegistroMetricas] = None
+_lock_metricas = threading.Lock()
+
+
+def obtener_metricas() -> RegistroMetricas:
+    """Devuelve el registro de métricas del proceso (lo crea la primera vez)"""
+    global _metricas_global
+    with _lock_metricas:
+        if _metricas_global is None:
+            _metricas_global = RegistroMetricas()
+        return _metricas_global
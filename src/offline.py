@@ -0,0 +1,214 @@
+"""
+Generador local de prompts para PROMPTS IA
+Compone los prompts con bancos de frases, sin llamar a ninguna API: sirve como modo
+sin conexión y como respaldo instantáneo cuando Gemini tarda demasiado o no responde
+"""
+from typing import Dict, Optional, Sequence, Union
+
+from .templates import RegistroPlantillas, obtener_registro
+
+
+# Cada entrada es una frase o una lista de alternativas; la variante elige cuál usar
+Frases = Union[str, Sequence[str]]
+
+ESTILOS: Dict[str, Frases] = {
+    "realista/fotográfico": [
+        "fotografía realista, iluminación natural, enfoque nítido, lente de 50 mm, texturas detalladas",
+        "fotografía profesional hiperrealista, luz suave, profundidad de campo reducida, alto rango dinámico",
+    ],
+    "artístico/digital art": [
+        "arte digital detallado, colores vibrantes, pinceladas digitales limpias, composición dinámica",
+        "ilustración digital de concept art, paleta armónica, iluminación dramática",
+    ],
+    "anime/manga": [
+        "estilo anime, líneas limpias, colores planos vibrantes, sombreado cel shading, ojos expresivos",
+        "ilustración estilo manga, trazos definidos, fondo detallado, estética de estudio de animación",
+    ],
+    "3D/render": [
+        "render 3D, iluminación global, materiales PBR realistas, sombras suaves, motor Unreal Engine",
+        "modelo 3D de alta calidad, trazado de rayos, texturas detalladas, iluminación de estudio",
+    ],
+    "pintura clásica": [
+        "pintura al óleo clásica, pinceladas visibles, claroscuro, paleta cálida, estilo de los grandes maestros",
+        "pintura renacentista, textura de lienzo, luz dorada, composición clásica",
+    ],
+    "cinematográfico": [
+        "fotograma cinematográfico, formato panorámico, iluminación dramática, gradación de color de cine",
+        "escena de película, luz de contraste, atmósfera envolvente, profundidad de campo cinematográfica",
+    ],
+}
+
+ESTILO_POR_DEFECTO: Frases = [
+    "estilo visual coherente con la escena, alta calidad, composición equilibrada, iluminación cuidada",
+    "acabado profesional, detalle alto, colores naturales, encuadre equilibrado",
+]
+
+TRANSFORMACIONES: Dict[str, Frases] = {
+    "Disfraz/Vestuario": "con vestuario y accesorios detallados, tejidos realistas y ajuste natural al cuerpo",
+    "Cambio de Edad": "con envejecimiento o rejuvenecimiento natural, arrugas y textura de piel coherentes con la edad",
+    "Cambio de Estilo": "con nuevo peinado y estilo personal, transición natural y cuidada",
+    "Maquillaje/Efectos": "con maquillaje de caracterización profesional, efectos especiales integrados en la piel",
+}
+
+IDENTIDAD: Dict[str, Frases] = {
+    "Sí": "manteniendo los rasgos faciales, la expresión y la identidad de la persona",
+    "No": "",
+}
+
+MODIFICACIONES: Dict[str, Frases] = {
+    "Cambio de Fondo": "con el fondo reemplazado, integración perfecta del sujeto, iluminación y perspectiva coherentes",
+    "Agregar Elementos": "agregando los nuevos elementos con escala, sombras y reflejos coherentes con la escena",
+    "Eliminar Elementos": "eliminando los elementos indicados, relleno limpio y sin rastros de edición",
+    "Reemplazar Objetos": "reemplazando los objetos indicados con la misma perspectiva, luz y escala",
+}
+
+EFECTOS_IMAGEN: Dict[str, Frases] = {
+    "Iluminación": "con iluminación dramática, rayos de luz volumétricos, contraste marcado",
+    "Clima/Atmósfera": "con atmósfera climática envolvente, niebla, lluvia o nieve realista",
+    "Hora del Día": "con luz de hora dorada, cielo de transición y sombras largas",
+    "Color Grading": "con gradación de color cinematográfica, tonos equilibrados y contraste cuidado",
+    "Partículas/Humo": "con partículas flotantes y humo volumétrico iluminado",
+}
+
+EFECTOS_VIDEO: Dict[str, Frases] = {
+    "Iluminación": "cambios de iluminación progresivos, rayos de luz en movimiento",
+    "Clima": "efectos climáticos animados, lluvia, niebla o nieve con movimiento natural",
+    "Transición": "transición fluida entre escenas, fundido suave y continuidad visual",
+    "Color Grading": "gradación de color cinematográfica que evoluciona a lo largo del plano",
+    "Partículas": "partículas animadas flotando en el aire, movimiento orgánico",
+}
+
+MOVIMIENTOS: Dict[str, Frases] = {
+    "Estático": "cámara fija sobre trípode, encuadre estable, el movimiento proviene de la escena",
+    "Paneo": "paneo horizontal suave de izquierda a derecha, giro estabilizado sobre el eje de la cámara",
+    "Zoom": "zoom progresivo hacia el sujeto, cambio de encuadre continuo y suave",
+    "Dolly": "dolly in cinematográfico, la cámara avanza suavemente hacia el sujeto a la altura de los ojos",
+    "Tracking": "plano de seguimiento lateral, la cámara acompaña al sujeto de forma estabilizada",
+}
+
+INTENSIDADES: Dict[str, Frases] = {
+    "Baja": "movimiento lento y sutil",
+    "Media": "velocidad media constante",
+    "Alta": "movimiento rápido y enérgico pero controlado",
+}
+
+NEGATIVO_IMAGEN = ("borroso, baja resolución, pixelado, artefactos de compresión, deformaciones, "
+                   "proporciones incorrectas, manos deformes, texto, marca de agua")
+
+NEGATIVO_VIDEO = ("parpadeo, saltos entre fotogramas, cámara inestable, movimiento brusco, "
+                  "artefactos de compresión, deformaciones, baja resolución, marca de agua")
+
+NEGATIVOS_CATEGORIA: Dict[str, str] = {
+    "face_transform": "rostro distorsionado, rasgos asimétricos, piel plástica, pérdida de identidad",
+    "modify": "bordes visibles de edición, iluminación incoherente, perspectiva incorrecta",
+    "effects": "efectos exagerados, sobreexposición, colores saturados en exceso",
+    "image_to_video": "cambios en el sujeto original, deformación de la imagen de partida",
+    "video_effects": "efectos que tapan al sujeto, transiciones abruptas",
+    "camera_movement": "trayectoria errática, aceleración abrupta, pérdida de estabilización",
+}
+
+
+def _elegir(frases: Frases, variante: int) -> str:
+    """Devuelve la frase de la variante indicada (las alternativas se recorren en orden)"""
+    if isinstance(frases, str):
+        return frases
+    return frases[variante % len(frases)]
+
+
+def _buscar(banco: Dict[str, Frases], clave: str, variante: int) -> str:
+    """
+    Busca la frase de un valor de la interfaz
+
+    Acepta el valor exacto o uno que empiece por la clave del banco (p. ej. "Zoom (Acercar/Alejar)");
+    los valores desconocidos ("Otro") no añaden nada.
+    """
+    frases = banco.get(clave)
+    if frases is None:
+        frases = next((f for k, f in banco.items() if clave.startswith(k)), "")
+    return _elegir(frases, variante)
+
+
+class GeneradorLocal:
+    """
+    Generador de prompts determinista, sin red
+
+    Usa los mismos parámetros que las plantillas (categoría, estilo, detalles como
+    duración, aspecto, movimiento de cámara o intensidad) y los compone con bancos
+    de frases. El resultado es peor que el del modelo pero llega en microsegundos.
+    """
+
+    def __init__(self, plantillas: Optional[RegistroPlantillas] = None):
+        """
+        Inicializa el generador
+
+        Args:
+            plantillas (RegistroPlantillas): Registro del que se toman los detalles por defecto
+                de cada categoría (por defecto el compartido del proceso)
+        """
+        self.plantillas = plantillas if plantillas is not None else obtener_registro()
+
+    def _detalles(self, tipo_medio: str, categoria: str, detalles: Optional[Dict[str, str]]) -> Dict[str, str]:
+        """Detalles de la petición completados con los valores por defecto de la categoría"""
+        try:
+            valores = dict(self.plantillas.obtener(tipo_medio, categoria).parametros)
+        except KeyError:
+            # Tipo de medio desconocido: sin valores por defecto
+            valores = {}
+        valores.update({k: v for k, v in (detalles or {}).items() if v})
+        return valores
+
+    def generar(self, tipo_medio: str, categoria: str, descripcion: str, estilo: str,
+                detalles: Optional[Dict[str, str]] = None, variante: int = 0) -> Dict[str, str]:
+        """
+        Compone los prompts positivo y negativo
+
+        Args:
+            tipo_medio (str): "imagen" o "video"
+            categoria (str): Categoría de generación
+            descripcion (str): Descripción del usuario
+            estilo (str): Estilo artístico (valor interno, p. ej. "realista/fotográfico")
+            detalles (Dict[str, str]): Detalles adicionales de la categoría
+            variante (int): Elige entre las frases alternativas (para generar varias variantes)
+
+        Returns:
+            Dict[str, str]: Diccionario con 'positivo' y 'negativo'
+        """
+        valores = self._detalles(tipo_medio, categoria, detalles)
+        partes = [descripcion.strip().rstrip(".")]
+
+        if categoria == "face_transform":
+            partes.append(_buscar(TRANSFORMACIONES, valores.get("transformacion", ""), variante))
+            partes.append(_buscar(IDENTIDAD, valores.get("mantener_identidad", ""), variante))
+        elif categoria == "modify":
+            partes.append(_buscar(MODIFICACIONES, valores.get("tipo_modificacion", ""), variante))
+        elif categoria == "effects":
+            partes.append(_buscar(EFECTOS_IMAGEN, valores.get("tipo_efecto", ""), variante))
+        elif categoria == "video_effects":
+            partes.append(_buscar(EFECTOS_VIDEO, valores.get("tipo_efecto", ""), variante))
+
+        if tipo_medio == "video" and "movimiento_camara" in valores:
+            partes.append(_buscar(MOVIMIENTOS, valores["movimiento_camara"], variante))
+            partes.append(_buscar(INTENSIDADES, valores.get("intensidad_movimiento", ""), variante))
+            if categoria == "image_to_video":
+                partes.append("animando la imagen de partida sin alterar al sujeto")
+
+        partes.append(_elegir(ESTILOS.get(estilo, ESTILO_POR_DEFECTO), variante))
+
+        if tipo_medio == "video":
+            if valores.get("duracion"):
+                partes.append(f"duración {valores['duracion']}")
+            if valores.get("aspecto"):
+                # "16:9 (Horizontal)" -> "16:9"
+                partes.append(f"aspecto {valores['aspecto'].split()[0]}")
+            partes.append("movimiento fluido, alta calidad")
+        else:
+            partes.append("alta resolución, máxima calidad")
+
+        negativo = NEGATIVO_VIDEO if tipo_medio == "video" else NEGATIVO_IMAGEN
+        if categoria in NEGATIVOS_CATEGORIA:
+            negativo = f"{negativo}, {NEGATIVOS_CATEGORIA[categoria]}"
+
+        return {
+            "positivo": ", ".join(p for p in partes if p),
+            "negativo": negativo,
+        }
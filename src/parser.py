@@ -0,0 +1,293 @@
+"""
+Parser de respuestas para PROMPTS IA
+Extrae los prompts positivo y negativo de la respuesta del modelo, también en streaming
+y en formato JSON (salida estructurada)
+"""
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Prompt negativo usado cuando el modelo no devuelve la sección NEGATIVE
+NEGATIVO_POR_DEFECTO = "baja calidad, borroso, distorsionado, anatomía incorrecta"
+
+# Marcador de sección al inicio de una línea. Admite decoración markdown (**POSITIVE:**,
+# ## Negative:), mayúsculas/minúsculas y etiquetas en español (PROMPT POSITIVO:, Negativo:)
+_PATRON_MARCADOR = re.compile(
+    r"[ \t#>*_]*(?:prompt[ \t]+)?(positiv|negativ)[eo](?:[ \t]+prompt)?[ \t*_]*:[*_]*",
+    re.IGNORECASE
+)
+
+# El mismo marcador precedido de un salto de línea; empezar por un literal permite al motor
+# de expresiones regulares saltar directamente entre líneas en lugar de probar cada posición
+_PATRON_LINEA_MARCADOR = re.compile(r"\n" + _PATRON_MARCADOR.pattern, re.IGNORECASE)
+
+# Raíz capturada por el patrón -> clave de resultado
+_SECCIONES = {"positiv": "positivo", "negativ": "negativo"}
+
+# Formas completas de las etiquetas, para saber si el inicio de una línea aún puede ser un marcador
+_ETIQUETAS = tuple(
+    f"{antes}{raiz}{vocal}{despues}"
+    for raiz in _SECCIONES
+    for vocal in "eo"
+    for antes in ("", "prompt ")
+    for despues in ("", " prompt")
+)
+
+# Caracteres de decoración markdown ignorados alrededor de un marcador
+_DECORACION = " \t#>*_"
+
+
+def _seccion_de(coincidencia: "re.Match") -> str:
+    """Clave de resultado ('positivo' o 'negativo') de un marcador encontrado"""
+    return _SECCIONES[coincidencia.group(1).lower()]
+
+
+def _podria_ser_marcador(texto: str) -> bool:
+    """
+    Indica si el inicio de una línea todavía incompleta podría terminar siendo un marcador
+
+    Args:
+        texto (str): Inicio de la línea recibido hasta ahora (sin ':' que lo confirme)
+
+    Returns:
+        bool: True si con más texto podría formar un marcador de sección
+    """
+    limpio = texto.lstrip(_DECORACION).lower()
+    cuerpo = limpio.rstrip(_DECORACION)
+    if not cuerpo:
+        return True
+
+    normal = " ".join(cuerpo.split())
+    cola = limpio[len(cuerpo):]
+    if cola.strip(" \t"):
+        # Tras cerrar la negrita solo puede venir ':'
+        return normal in _ETIQUETAS
+    if cola:
+        # Un espacio puede separar la siguiente palabra ("positive prompt") o preceder a ':'
+        return any(etiqueta == normal or etiqueta.startswith(normal + " ") for etiqueta in _ETIQUETAS)
+    return any(etiqueta.startswith(normal) for etiqueta in _ETIQUETAS)
+
+
+def _resultado(partes: Dict[str, List[str]]) -> Dict[str, str]:
+    """Une las líneas de cada sección en el diccionario de resultado"""
+    prompt_positivo = " ".join(partes["positivo"]).strip()
+    prompt_negativo = " ".join(partes["negativo"]).strip()
+
+    return {
+        "positivo": prompt_positivo,
+        "negativo": prompt_negativo if prompt_negativo else NEGATIVO_POR_DEFECTO
+    }
+
+
+def parsear_texto(texto: str) -> Dict[str, str]:
+    """
+    Extrae los prompts positivo y negativo de una respuesta completa en una sola pasada
+
+    Los marcadores se localizan con una única búsqueda sobre todo el texto y el
+    contenido de cada sección se toma por índices entre un marcador y el siguiente;
+    las líneas se acumulan en listas que se unen al final, de modo que el coste es
+    lineal en el tamaño de la respuesta. Si un marcador se repite, el contenido se
+    añade a la sección en lugar de reemplazarla.
+
+    Args:
+        texto (str): Texto de respuesta generado por el modelo
+
+    Returns:
+        Dict[str, str]: Diccionario con 'positivo' y 'negativo' prompts parseados
+    """
+    partes: Dict[str, List[str]] = {"positivo": [], "negativo": []}
+    seccion = None
+    inicio = 0
+
+    # La primera línea no va precedida de un salto de línea
+    coincidencia = _PATRON_MARCADOR.match(texto)
+    if coincidencia:
+        seccion = _seccion_de(coincidencia)
+        inicio = coincidencia.end()
+
+    for coincidencia in _PATRON_LINEA_MARCADOR.finditer(texto, inicio):
+        if seccion is not None:
+            _agregar_lineas(partes[seccion], texto, inicio, coincidencia.start())
+        seccion = _seccion_de(coincidencia)
+        inicio = coincidencia.end()
+
+    if seccion is not None:
+        _agregar_lineas(partes[seccion], texto, inicio, len(texto))
+
+    return _resultado(partes)
+
+
+def _agregar_lineas(destino: List[str], texto: str, inicio: int, fin: int) -> None:
+    """Añade a 'destino' las líneas no vacías de texto[inicio:fin], sin espacios en los extremos"""
+    destino.extend(filter(None, map(str.strip, texto[inicio:fin].split("\n"))))
+
+
+# Esquema de la salida estructurada (response_schema de Gemini, subconjunto de OpenAPI)
+ESQUEMA_RESPUESTA: Dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "positivo": {"type": "STRING", "description": "Prompt positivo completo, listo para copiar"},
+        "negativo": {"type": "STRING", "description": "Prompt negativo: elementos a evitar"},
+    },
+    "required": ["positivo", "negativo"],
+}
+
+
+def parsear_json(texto: str) -> Optional[Dict[str, str]]:
+    """
+    Interpreta una respuesta en formato JSON {"positivo": ..., "negativo": ...}
+
+    Args:
+        texto (str): Texto de respuesta generado en modo de salida estructurada
+
+    Returns:
+        Optional[Dict[str, str]]: Diccionario con 'positivo' y 'negativo', o None si
+            el texto no es un JSON válido con un prompt positivo
+    """
+    limpio = texto.strip()
+    # Algunos modelos envuelven el JSON en un bloque de código markdown
+    if limpio.startswith("```"):
+        limpio = limpio.strip("`").strip()
+        if limpio[:4].lower() == "json":
+            limpio = limpio[4:]
+
+    try:
+        datos = json.loads(limpio)
+    except ValueError:
+        return None
+
+    if not isinstance(datos, dict):
+        return None
+
+    positivo = datos.get("positivo")
+    if not isinstance(positivo, str) or not positivo.strip():
+        return None
+
+    negativo = datos.get("negativo")
+    if not isinstance(negativo, str) or not negativo.strip():
+        negativo = NEGATIVO_POR_DEFECTO
+
+    return {"positivo": positivo.strip(), "negativo": negativo.strip()}
+
+
+class ParserIncremental:
+    """
+    Parser incremental de la respuesta de Gemini
+
+    Recibe el texto en fragmentos arbitrarios (tal como llegan en streaming) y
+    emite eventos (seccion, texto) en cuanto se sabe a qué sección pertenecen,
+    sin esperar a que termine la línea ni la respuesta. Reconoce los mismos
+    marcadores que parsear_texto() y produce el mismo resultado al cerrar.
+    """
+
+    def __init__(self):
+        self.seccion = None
+        self._partes: Dict[str, List[str]] = {"positivo": [], "negativo": []}
+        # Inicio de la línea actual que todavía podría ser un marcador
+        self._pendiente = ""
+        # Fragmentos de la línea actual ya clasificados como contenido
+        self._linea: List[str] = []
+        self._linea_clasificada = False
+
+    def alimentar(self, fragmento: str) -> List[Tuple[str, str]]:
+        """
+        Procesa un nuevo fragmento de texto
+
+        Args:
+            fragmento (str): Texto recibido (puede cortar líneas o marcadores a la mitad)
+
+        Returns:
+            List[Tuple[str, str]]: Eventos (seccion, texto) listos para mostrarse,
+                donde seccion es 'positivo' o 'negativo'
+        """
+        eventos: List[Tuple[str, str]] = []
+        inicio = 0
+
+        while True:
+            salto = fragmento.find("\n", inicio)
+            if salto == -1:
+                break
+            self._consumir(fragmento[inicio:salto], eventos)
+            self._terminar_linea(eventos)
+            inicio = salto + 1
+
+        if inicio < len(fragmento):
+            self._consumir(fragmento[inicio:], eventos)
+
+        return eventos
+
+    def cerrar(self) -> Dict[str, str]:
+        """
+        Termina el parseo y devuelve el resultado completo
+
+        Returns:
+            Dict[str, str]: Diccionario con 'positivo' y 'negativo' prompts parseados
+        """
+        self._terminar_linea([])
+        return _resultado(self._partes)
+
+    # ==================== UTILIDADES INTERNAS ====================
+
+    def _consumir(self, texto: str, eventos: List[Tuple[str, str]]) -> None:
+        """Agrega texto a la línea actual, clasificándola en cuanto sea posible"""
+        if self._linea_clasificada:
+            self._emitir(texto, eventos)
+            return
+
+        self._pendiente += texto
+        self._clasificar(self._pendiente, eventos, linea_completa=False)
+
+    def _clasificar(self, texto: str, eventos: List[Tuple[str, str]], linea_completa: bool) -> None:
+        """Decide si el inicio de la línea es un marcador de sección o contenido"""
+        coincidencia = _PATRON_MARCADOR.match(texto)
+        if coincidencia:
+            # Con la línea abierta, el cierre de la negrita ('**') puede llegar en el siguiente fragmento
+            if not linea_completa and coincidencia.end() == len(texto):
+                return
+            self.seccion = _seccion_de(coincidencia)
+            self._pendiente = ""
+            self._linea_clasificada = True
+            self._emitir(texto[coincidencia.end():], eventos)
+            return
+
+        # Todavía podría completarse un marcador con el siguiente fragmento
+        if not linea_completa and _podria_ser_marcador(texto):
+            return
+
+        self._pendiente = ""
+        self._linea_clasificada = True
+        self._emitir(texto.lstrip(), eventos)
+
+    def _emitir(self, texto: str, eventos: List[Tuple[str, str]]) -> None:
+        """Acumula contenido de la línea actual y genera el evento correspondiente"""
+        if self.seccion is None or not texto:
+            return
+
+        if not self._linea:
+            texto = texto.lstrip()
+            if not texto:
+                return
+            # Separar de las líneas anteriores de la misma sección
+            if self._partes[self.seccion]:
+                eventos.append((self.seccion, " " + texto))
+            else:
+                eventos.append((self.seccion, texto))
+        else:
+            eventos.append((self.seccion, texto))
+
+        self._linea.append(texto)
+
+    def _terminar_linea(self, eventos: List[Tuple[str, str]]) -> None:
+        """Cierra la línea actual y la añade a su sección"""
+        if self._pendiente:
+            self._clasificar(self._pendiente, eventos, linea_completa=True)
+
+        if self._linea and self.seccion is not None:
+            linea = "".join(self._linea).strip()
+            if linea:
+                self._partes[self.seccion].append(linea)
+
+        self._pendiente = ""
+        self._linea = []
+        self._linea_clasificada = False
@@ -0,0 +1,250 @@
+"""
+Control de tasa y reintentos para PROMPTS IA
+Limitador token-bucket (peticiones y tokens por minuto) y reintentos con backoff exponencial
+"""
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from .cancellation import TokenCancelacion
+
+T = TypeVar("T")
+
+# Códigos HTTP que indican un error transitorio (cuota, sobrecarga, fallo temporal)
+CODIGOS_REINTENTABLES = {408, 429, 500, 502, 503, 504}
+
+
+def estimar_tokens(texto: str) -> int:
+    """
+    Estimación rápida del número de tokens de un texto (~4 caracteres por token)
+
+    Args:
+        texto (str): Texto a estimar
+
+    Returns:
+        int: Número aproximado de tokens
+    """
+    return max(1, len(texto) // 4)
+
+
+def es_reintentable(error: BaseException) -> bool:
+    """
+    Indica si un error de la API merece reintentarse
+
+    Reconoce las excepciones de google.api_core (atributo 'code' con el estado HTTP)
+    y los errores de red/timeout de la librería estándar.
+
+    Args:
+        error (BaseException): Excepción lanzada por la llamada
+
+    Returns:
+        bool: True si el error es transitorio
+    """
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+
+    codigo = getattr(error, "code", None)
+    if callable(codigo):
+        return False
+    try:
+        return int(codigo) in CODIGOS_REINTENTABLES
+    except (TypeError, ValueError):
+        return False
+
+
+class _Cubeta:
+    """Cubeta de tokens que se rellena de forma continua a una tasa por minuto"""
+
+    def __init__(self, por_minuto: float):
+        self.capacidad = float(por_minuto)
+        self.tasa = por_minuto / 60.0
+        self.saldo = float(por_minuto)
+        self.ultimo = time.monotonic()
+
+    def espera_para(self, cantidad: float) -> float:
+        """Segundos que faltan para disponer de 'cantidad' tokens"""
+        ahora = time.monotonic()
+        self.saldo = min(self.capacidad, self.saldo + (ahora - self.ultimo) * self.tasa)
+        self.ultimo = ahora
+        # Una petición mayor que la capacidad se permite con la cubeta llena
+        cantidad = min(cantidad, self.capacidad)
+        if self.saldo >= cantidad:
+            return 0.0
+        return (cantidad - self.saldo) / self.tasa
+
+
+class LimitadorTasa:
+    """
+    Limitador de tasa del lado del cliente
+
+    Combina una cubeta de peticiones por minuto (RPM) y otra de tokens por minuto
+    (TPM). Las llamadas se bloquean hasta que ambas tengan saldo, de modo que un
+    lote grande se ajusta a la tasa sostenible en vez de chocar con la cuota.
+    """
+
+    def __init__(self, peticiones_por_minuto: Optional[float] = None,
+                 tokens_por_minuto: Optional[float] = None):
+        """
+        Inicializa el limitador
+
+        Args:
+            peticiones_por_minuto (float): Límite de peticiones por minuto (None = sin límite)
+            tokens_por_minuto (float): Límite de tokens por minuto (None = sin límite)
+        """
+        self._peticiones = _Cubeta(peticiones_por_minuto) if peticiones_por_minuto else None
+        self._tokens = _Cubeta(tokens_por_minuto) if tokens_por_minuto else None
+        self._lock = threading.Lock()
+
+    def _reservar(self, tokens: int) -> float:
+        """Intenta reservar saldo; devuelve 0 si lo consiguió o los segundos a esperar"""
+        with self._lock:
+            espera = 0.0
+            if self._peticiones is not None:
+                espera = max(espera, self._peticiones.espera_para(1))
+            if self._tokens is not None:
+                espera = max(espera, self._tokens.espera_para(tokens))
+            if espera > 0:
+                return espera
+
+            if self._peticiones is not None:
+                self._peticiones.saldo -= 1
+            if self._tokens is not None:
+                self._tokens.saldo -= min(tokens, self._tokens.capacidad)
+            return 0.0
+
+    def adquirir(self, tokens: int = 1, cancelacion: Optional[TokenCancelacion] = None) -> None:
+        """
+        Bloquea hasta que haya saldo para una petición de 'tokens' tokens
+
+        Args:
+            tokens (int): Tokens estimados de la petición
+            cancelacion (TokenCancelacion): Interrumpe la espera si se cancela o vence el plazo
+        """
+        while True:
+            espera = self._reservar(tokens)
+            if espera <= 0:
+                return
+            if cancelacion is not None:
+                cancelacion.esperar(espera)
+            else:
+                time.sleep(espera)
+
+    async def adquirir_async(self, tokens: int = 1) -> None:
+        """Versión asíncrona de adquirir()"""
+        while True:
+            espera = self._reservar(tokens)
+            if espera <= 0:
+                return
+            await asyncio.sleep(espera)
+
+
+class PoliticaReintentos:
+    """
+    Reintentos con backoff exponencial, jitter y presupuesto de reintentos
+
+    El presupuesto limita los reintentos a una fracción de las peticiones
+    recientes, para que durante una caída los reintentos no multipliquen la carga.
+    """
+
+    def __init__(self, max_intentos: int = 4, espera_base: float = 1.0, espera_maxima: float = 30.0,
+                 proporcion_presupuesto: float = 0.2, reserva_minima: float = 10.0):
+        """
+        Inicializa la política
+
+        Args:
+            max_intentos (int): Intentos totales por petición (incluye el primero)
+            espera_base (float): Espera inicial en segundos; se duplica en cada reintento
+            espera_maxima (float): Tope de la espera entre intentos
+            proporcion_presupuesto (float): Reintentos permitidos por cada petición realizada
+            reserva_minima (float): Reintentos disponibles al inicio y saldo máximo del presupuesto
+        """
+        self.max_intentos = max_intentos
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.proporcion_presupuesto = proporcion_presupuesto
+        self.reserva_minima = reserva_minima
+
+        self._saldo = reserva_minima
+        self._lock = threading.Lock()
+        self.reintentos = 0
+        self.reintentos_denegados = 0
+
+    def calcular_espera(self, intento: int) -> float:
+        """
+        Espera antes del reintento número 'intento' (full jitter)
+
+        Args:
+            intento (int): Número de reintento, empezando en 0
+
+        Returns:
+            float: Segundos a esperar
+        """
+        tope = min(self.espera_maxima, self.espera_base * (2 ** intento))
+        return random.uniform(0, tope)
+
+    def _registrar_peticion(self) -> None:
+        """Cada petición original aporta saldo al presupuesto de reintentos"""
+        with self._lock:
+            self._saldo = min(self.reserva_minima, self._saldo + self.proporcion_presupuesto)
+
+    def _autorizar_reintento(self) -> bool:
+        """Consume una unidad del presupuesto si hay saldo"""
+        with self._lock:
+            if self._saldo >= 1:
+                self._saldo -= 1
+                self.reintentos += 1
+                return True
+            self.reintentos_denegados += 1
+            return False
+
+    def _debe_reintentar(self, error: BaseException, intento: int) -> bool:
+        """Decide si se reintenta tras el intento fallido número 'intento'"""
+        if intento + 1 >= self.max_intentos or not es_reintentable(error):
+            return False
+        return self._autorizar_reintento()
+
+    def ejecutar(self, funcion: Callable[[], T], cancelacion: Optional[TokenCancelacion] = None) -> T:
+        """
+        Ejecuta una función aplicando la política de reintentos
+
+        Args:
+            funcion (Callable): Función sin argumentos que realiza la llamada
+            cancelacion (TokenCancelacion): Se comprueba antes de cada intento y durante las esperas
+
+        Returns:
+            El valor devuelto por la función
+        """
+        self._registrar_peticion()
+        intento = 0
+        while True:
+            if cancelacion is not None:
+                cancelacion.verificar()
+            try:
+                return funcion()
+            except Exception as e:
+                # Si el fallo se debe a que venció el plazo, informar de eso y no gastar presupuesto
+                if cancelacion is not None and cancelacion.cancelado:
+                    cancelacion.verificar()
+                if not self._debe_reintentar(e, intento):
+                    raise
+                espera = self.calcular_espera(intento)
+                if cancelacion is not None:
+                    cancelacion.esperar(espera)
+                else:
+                    time.sleep(espera)
+                intento += 1
+
+    async def ejecutar_async(self, funcion: Callable[[], Awaitable[T]]) -> T:
+        """Versión asíncrona de ejecutar(); 'funcion' devuelve una corrutina nueva en cada intento"""
+        self._registrar_peticion()
+        intento = 0
+        while True:
+            try:
+                return await funcion()
+            except Exception as e:
+                if not self._debe_reintentar(e, intento):
+                    raise
+                await asyncio.sleep(self.calcular_espera(intento))
+                intento += 1
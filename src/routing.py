@@ -0,0 +1,290 @@
+"""
+Enrutado de modelos para PROMPTS IA
+Elige entre varios modelos configurados según el tamaño de la entrada, la categoría
+y la latencia y tasa de errores observadas recientemente
+"""
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence
+
+from .backends import BackendGemini, BackendLLM
+
+
+class OpcionModelo:
+    """
+    Un modelo disponible para el enrutador y las peticiones que puede atender
+
+    Las restricciones expresan calidad: un modelo ligero se limita a descripciones
+    cortas y categorías sencillas; una opción sin restricciones sirve para todo.
+    """
+
+    def __init__(self, backend: BackendLLM, max_caracteres: Optional[int] = None,
+                 tipos_medio: Optional[Sequence[str]] = None,
+                 categorias: Optional[Sequence[str]] = None):
+        """
+        Inicializa la opción
+
+        Args:
+            backend (BackendLLM): Backend del modelo
+            max_caracteres (int): Longitud máxima de la descripción que atiende (None = sin límite)
+            tipos_medio (Sequence[str]): "imagen" y/o "video" (None = ambos)
+            categorias (Sequence[str]): Categorías que atiende (None = todas)
+        """
+        self.backend = backend
+        self.nombre = backend.nombre_modelo
+        self.max_caracteres = max_caracteres
+        self.tipos_medio = tuple(tipos_medio) if tipos_medio is not None else None
+        self.categorias = tuple(categorias) if categorias is not None else None
+
+    def admite(self, tipo_medio: str, categoria: str, descripcion: str) -> bool:
+        """Indica si la opción puede atender la petición"""
+        if self.max_caracteres is not None and len(descripcion) > self.max_caracteres:
+            return False
+        if self.tipos_medio is not None and tipo_medio not in self.tipos_medio:
+            return False
+        if self.categorias is not None and categoria not in self.categorias:
+            return False
+        return True
+
+
+class _EstadoModelo:
+    """Latencia y tasa de errores de un modelo como medias móviles exponenciales"""
+
+    def __init__(self):
+        self.latencia: Optional[float] = None
+        self.tasa_error = 0.0
+        self.llamadas = 0
+        self.errores = 0
+        # Momento (monotónico) de la última elección o del último resultado registrado
+        self.ultimo_uso = 0.0
+
+    def registrar(self, segundos: Optional[float], error: bool, alfa: float) -> None:
+        self.llamadas += 1
+        self.tasa_error += alfa * ((1.0 if error else 0.0) - self.tasa_error)
+        if error:
+            self.errores += 1
+        elif segundos is not None:
+            self.latencia = segundos if self.latencia is None else self.latencia + alfa * (segundos - self.latencia)
+
+
+class EnrutadorModelos:
+    """
+    Enrutador de peticiones entre varios modelos
+
+    Entre las opciones que admiten la petición elige la de menor latencia
+    observada, penalizada por su tasa de errores reciente. Las opciones sin
+    datos se prueban primero y, con probabilidad 'exploracion', se elige una
+    al azar para que las estimaciones no queden obsoletas.
+
+    Un modelo con demasiados errores se evita, pero cada 'espera_recuperacion'
+    segundos recibe una petición de prueba; si responde bien, su tasa de errores
+    baja y vuelve a elegirse con normalidad.
+    """
+
+    def __init__(self, opciones: Sequence[OpcionModelo], alfa: float = 0.2,
+                 max_tasa_error: float = 0.5, penalizacion_error: float = 4.0,
+                 exploracion: float = 0.05, espera_recuperacion: float = 30.0,
+                 semilla: Optional[int] = None):
+        """
+        Inicializa el enrutador
+
+        Args:
+            opciones (Sequence[OpcionModelo]): Modelos disponibles; la última debería admitirlo todo
+            alfa (float): Peso de cada nueva observación en las medias móviles
+            max_tasa_error (float): Tasa de errores a partir de la cual se evita un modelo
+            penalizacion_error (float): Cuánto encarece la tasa de errores la puntuación
+            exploracion (float): Probabilidad de elegir una opción admitida al azar
+            espera_recuperacion (float): Segundos entre peticiones de prueba a un modelo evitado
+            semilla (int): Semilla del azar de exploración
+        """
+        if not opciones:
+            raise ValueError("Se requiere al menos una opción de modelo")
+
+        self.opciones = list(opciones)
+        self.alfa = alfa
+        self.max_tasa_error = max_tasa_error
+        self.penalizacion_error = penalizacion_error
+        self.exploracion = exploracion
+        self.espera_recuperacion = espera_recuperacion
+
+        self.nombre_modelo = "+".join(opcion.nombre for opcion in self.opciones)
+        self._estados: Dict[str, _EstadoModelo] = {opcion.nombre: _EstadoModelo() for opcion in self.opciones}
+        self._rng = random.Random(semilla)
+        self._lock = threading.Lock()
+        self.elecciones: Dict[str, int] = {opcion.nombre: 0 for opcion in self.opciones}
+
+    def _puntuacion(self, opcion: OpcionModelo) -> float:
+        """Latencia esperada penalizada por errores (menor es mejor); 0 si aún no hay datos"""
+        estado = self._estados[opcion.nombre]
+        if estado.latencia is None:
+            return 0.0
+        return estado.latencia * (1.0 + self.penalizacion_error * estado.tasa_error)
+
+    def elegir(self, tipo_medio: str, categoria: str, descripcion: str) -> BackendLLM:
+        """
+        Elige el modelo para una petición
+
+        Args:
+            tipo_medio (str): "imagen" o "video"
+            categoria (str): Categoría de generación
+            descripcion (str): Descripción del usuario
+
+        Returns:
+            BackendLLM: Backend del modelo elegido, que registra su latencia y errores en el enrutador
+        """
+        admitidas = [o for o in self.opciones if o.admite(tipo_medio, categoria, descripcion)]
+        if not admitidas:
+            admitidas = [self.opciones[-1]]
+
+        ahora = time.monotonic()
+        with self._lock:
+            sanas = [o for o in admitidas if self._estados[o.nombre].tasa_error < self.max_tasa_error]
+            # Los modelos evitados reciben una petición de prueba tras la espera de recuperación
+            a_probar = [o for o in admitidas if o not in sanas
+                        and ahora - self._estados[o.nombre].ultimo_uso >= self.espera_recuperacion]
+            candidatas = sanas or admitidas
+            if sanas and a_probar:
+                elegida = a_probar[0]
+            elif len(candidatas) > 1 and self._rng.random() < self.exploracion:
+                elegida = self._rng.choice(candidatas)
+            else:
+                # min() conserva el orden de configuración en caso de empate
+                elegida = min(candidatas, key=self._puntuacion)
+            self.elecciones[elegida.nombre] += 1
+            self._estados[elegida.nombre].ultimo_uso = ahora
+
+        return _BackendMedido(elegida.backend, elegida.nombre, self)
+
+    def registrar(self, nombre: str, segundos: Optional[float], error: bool) -> None:
+        """Registra el resultado de una llamada a un modelo"""
+        with self._lock:
+            estado = self._estados[nombre]
+            estado.registrar(segundos, error, self.alfa)
+            estado.ultimo_uso = time.monotonic()
+
+    def calentar(self) -> bool:
+        """Calienta la conexión de todos los modelos que lo admiten"""
+        resultado = True
+        for opcion in self.opciones:
+            calentar = getattr(opcion.backend, "calentar", None)
+            if calentar is not None:
+                resultado = calentar() and resultado
+        return resultado
+
+    def estadisticas(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Devuelve el estado de cada modelo
+
+        Returns:
+            Dict: Por modelo, elecciones, llamadas, errores, latencia media móvil (s) y tasa de errores
+        """
+        with self._lock:
+            return {
+                nombre: {
+                    "elecciones": self.elecciones[nombre],
+                    "llamadas": estado.llamadas,
+                    "errores": estado.errores,
+                    "latencia_ewma": round(estado.latencia, 4) if estado.latencia is not None else None,
+                    "tasa_error_ewma": round(estado.tasa_error, 4),
+                }
+                for nombre, estado in self._estados.items()
+            }
+
+
+class _BackendMedido:
+    """Backend de un modelo elegido que informa al enrutador de cada llamada"""
+
+    def __init__(self, backend: BackendLLM, nombre: str, enrutador: EnrutadorModelos):
+        self.backend = backend
+        self.nombre_modelo = backend.nombre_modelo
+        self._nombre = nombre
+        self._enrutador = enrutador
+
+    def generate_content(self, contenido: str, stream: bool = False, **opciones: Any) -> Any:
+        inicio = time.perf_counter()
+        try:
+            respuesta = self.backend.generate_content(contenido, stream=stream, **opciones)
+        except Exception:
+            self._enrutador.registrar(self._nombre, None, True)
+            raise
+        if stream:
+            # La llamada solo abre el stream: se mide hasta el último fragmento
+            return _StreamMedido(respuesta, inicio, self._nombre, self._enrutador)
+        self._enrutador.registrar(self._nombre, time.perf_counter() - inicio, False)
+        return respuesta
+
+    async def generate_content_async(self, contenido: str, **opciones: Any) -> Any:
+        inicio = time.perf_counter()
+        try:
+            respuesta = await self.backend.generate_content_async(contenido, **opciones)
+        except Exception:
+            self._enrutador.registrar(self._nombre, None, True)
+            raise
+        self._enrutador.registrar(self._nombre, time.perf_counter() - inicio, False)
+        return respuesta
+
+    def con_instruccion_sistema(self, instruccion: str) -> "_BackendMedido":
+        return _BackendMedido(self.backend.con_instruccion_sistema(instruccion), self._nombre, self._enrutador)
+
+
+class _StreamMedido:
+    """
+    Respuesta en streaming que informa al enrutador al terminar
+
+    Registra la latencia hasta el último fragmento, o un error si el stream falla a
+    mitad; un stream que el llamador abandona (p. ej. al cancelar) no se registra.
+    """
+
+    def __init__(self, respuesta: Any, inicio: float, nombre: str, enrutador: EnrutadorModelos):
+        self._fragmentos = iter(respuesta)
+        self._respuesta = respuesta
+        self._inicio = inicio
+        self._nombre = nombre
+        self._enrutador = enrutador
+        self._registrado = False
+
+    def __iter__(self) -> "_StreamMedido":
+        return self
+
+    def __next__(self) -> Any:
+        try:
+            return next(self._fragmentos)
+        except StopIteration:
+            self._registrar(time.perf_counter() - self._inicio, False)
+            raise
+        except Exception:
+            self._registrar(None, True)
+            raise
+
+    def _registrar(self, latencia: Optional[float], error: bool) -> None:
+        if not self._registrado:
+            self._registrado = True
+            self._enrutador.registrar(self._nombre, latencia, error)
+
+    def __getattr__(self, nombre: str) -> Any:
+        # Atributos de la respuesta original (p. ej. usage_metadata)
+        return getattr(self._respuesta, nombre)
+
+
+def enrutador_gemini(api_key: str, modelo_ligero: str = 'gemini-2.5-flash-lite',
+                     modelo_completo: str = 'gemini-2.5-flash',
+                     max_caracteres_ligero: int = 200) -> EnrutadorModelos:
+    """
+    Enrutador por defecto: modelo ligero para imágenes con descripciones cortas y
+    modelo completo para todo lo demás (incluidas todas las categorías de video)
+
+    Args:
+        api_key (str): API key de Google Gemini
+        modelo_ligero (str): Modelo rápido para los casos sencillos
+        modelo_completo (str): Modelo para los casos complejos
+        max_caracteres_ligero (int): Longitud máxima de la descripción para el modelo ligero
+
+    Returns:
+        EnrutadorModelos: Enrutador listo para pasar a GeminiPromptGenerator
+    """
+    return EnrutadorModelos([
+        OpcionModelo(BackendGemini(api_key, modelo_ligero), max_caracteres=max_caracteres_ligero,
+                     tipos_medio=("imagen",)),
+        OpcionModelo(BackendGemini(api_key, modelo_completo)),
+    ])
@@ -0,0 +1,455 @@
+"""
+Servicio HTTP de PROMPTS IA
+Expone el generador a otras herramientas internas con la biblioteca estándar (http.server),
+con una cola acotada de peticiones, un pool de trabajadores y respuestas 429 al saturarse
+
+Uso:
+    python -m src.server --puerto 8765 --trabajadores 4 --cola 16
+    python -m src.server --backend falso        # sin API key ni red, para pruebas locales
+
+Endpoints:
+    POST /generar   {tipo_medio, categoria, descripcion, estilo, detalles} -> {"resultado": {...}}
+    POST /lote      {"especificaciones": [...]} -> {"resultados": [{indice, resultado, error}, ...]}
+    POST /stream    igual que /generar; responde NDJSON con cada fragmento y el resultado final
+    GET  /salud     estado del servicio y ocupación de la cola
+    GET  /metricas  contadores del servicio, percentiles por etapa, caché y enrutado
+"""
+import argparse
+import json
+import queue
+import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as TiempoAgotadoFuturo
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+from .cancellation import GeneracionCancelada, PlazoExcedido, TokenCancelacion
+from .cli import crear_generador, normalizar_spec
+from .generator import MODO_REMOTO, MODOS, GeminiPromptGenerator
+
+
+# Tamaño máximo del cuerpo de una petición
+MAX_CUERPO = 1024 * 1024
+
+
+class ServicioSaturado(Exception):
+    """La cola de peticiones está llena; el cliente debe reintentar más tarde"""
+
+
+class ServicioPrompts:
+    """
+    Cola acotada de generaciones atendida por un pool de trabajadores
+
+    Admite como máximo 'trabajadores + max_cola' generaciones a la vez (en curso o
+    esperando trabajador); por encima de eso rechaza con ServicioSaturado en lugar
+    de acumular peticiones que vencerían su plazo antes de empezar. Cada generación
+    recibe un TokenCancelacion con el plazo del servicio desde que entra en la cola.
+    """
+
+    def __init__(self, generador: GeminiPromptGenerator, trabajadores: int = 4,
+                 max_cola: int = 16, plazo: float = 60.0):
+        """
+        Inicializa el servicio
+
+        Args:
+            generador (GeminiPromptGenerator): Generador compartido por todas las peticiones
+            trabajadores (int): Generaciones simultáneas
+            max_cola (int): Generaciones que pueden esperar trabajador
+            plazo (float): Segundos máximos por generación, contando la espera en la cola
+        """
+        if trabajadores < 1:
+            raise ValueError("trabajadores debe ser al menos 1")
+        if max_cola < 0:
+            raise ValueError("max_cola no puede ser negativo")
+
+        self.generador = generador
+        self.trabajadores = trabajadores
+        self.capacidad = trabajadores + max_cola
+        self.plazo = plazo
+
+        self._executor = ThreadPoolExecutor(max_workers=trabajadores, thread_name_prefix="servicio")
+        self._lock = threading.Lock()
+        self._admitidas = 0
+        self._en_curso = 0
+
+        # Contadores para /metricas
+        self.aceptadas = 0
+        self.rechazadas = 0
+        self.errores = 0
+        self.plazos = 0
+
+    # ==================== ADMISIÓN ====================
+
+    def _reservar(self, n: int) -> None:
+        """Reserva 'n' plazas de la cola o lanza ServicioSaturado"""
+        with self._lock:
+            if self._admitidas + n > self.capacidad:
+                self.rechazadas += 1
+                raise ServicioSaturado(f"Cola llena ({self._admitidas}/{self.capacidad} generaciones)")
+            self._admitidas += n
+            self.aceptadas += 1
+
+    def _liberar(self, _futuro: Future) -> None:
+        with self._lock:
+            self._admitidas -= 1
+
+    def _ejecutar(self, funcion: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            self._en_curso += 1
+        try:
+            return funcion(*args)
+        except PlazoExcedido:
+            with self._lock:
+                self.plazos += 1
+            raise
+        except GeneracionCancelada:
+            raise
+        except Exception:
+            with self._lock:
+                self.errores += 1
+            raise
+        finally:
+            with self._lock:
+                self._en_curso -= 1
+
+    def _enviar(self, funcion: Callable[..., Any], *args: Any) -> Future:
+        """Envía una generación ya admitida al pool; la plaza se libera al terminar"""
+        futuro = self._executor.submit(self._ejecutar, funcion, *args)
+        futuro.add_done_callback(self._liberar)
+        return futuro
+
+    def _esperar(self, futuro: Future, cancelacion: TokenCancelacion) -> Any:
+        """Espera el resultado; si el trabajo no termina en su plazo, lo cancela"""
+        try:
+            return futuro.result(timeout=self.plazo + 1.0)
+        except TiempoAgotadoFuturo:
+            cancelacion.cancelar()
+            futuro.cancel()
+            raise PlazoExcedido("La generación superó el plazo del servicio")
+
+    # ==================== GENERACIÓN ====================
+
+    @staticmethod
+    def preparar_spec(datos: Any) -> Dict[str, Any]:
+        """
+        Valida y normaliza una especificación recibida por HTTP
+
+        Args:
+            datos: Objeto JSON de la petición
+
+        Returns:
+            Dict: Especificación con categoría y estilo internos
+
+        Raises:
+            ValueError: Si no es un objeto, le faltan campos obligatorios o tienen otro tipo
+        """
+        if not isinstance(datos, dict):
+            raise ValueError("La especificación debe ser un objeto JSON")
+        for campo in ("tipo_medio", "categoria", "descripcion", "estilo"):
+            if datos.get(campo) is not None and not isinstance(datos[campo], str):
+                raise ValueError(f"'{campo}' debe ser un texto")
+        detalles = datos.get("detalles_extra", datos.get("detalles"))
+        if detalles is not None and not isinstance(detalles, dict):
+            raise ValueError("'detalles' debe ser un objeto JSON")
+        spec = normalizar_spec(dict(datos))
+        for campo in ("categoria", "descripcion"):
+            if not spec.get(campo):
+                raise ValueError(f"Falta el campo '{campo}' en la especificación")
+        return spec
+
+    def _generar(self, spec: Dict[str, Any], cancelacion: TokenCancelacion,
+                 al_recibir: Optional[Callable[[str, str], None]] = None) -> Dict[str, Any]:
+        return self.generador.generar_prompt_con_ia(
+            spec["tipo_medio"], spec["categoria"], spec["descripcion"], spec["estilo"],
+            spec.get("detalles_extra", spec.get("detalles")),
+            stream=al_recibir is not None, al_recibir=al_recibir, cancelacion=cancelacion
+        )
+
+    def generar(self, spec: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Genera un prompt pasando por la cola del servicio
+
+        Args:
+            spec (Dict): Especificación ya preparada con preparar_spec()
+
+        Returns:
+            Dict: Resultado de generar_prompt_con_ia
+
+        Raises:
+            ServicioSaturado: Si la cola está llena
+            PlazoExcedido: Si no termina dentro del plazo del servicio
+        """
+        self._reservar(1)
+        cancelacion = TokenCancelacion(self.plazo)
+        return self._esperar(self._enviar(self._generar, spec, cancelacion), cancelacion)
+
+    def lote(self, specs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Genera varias especificaciones en paralelo (todas o ninguna entran en la cola)
+
+        Args:
+            specs (List[Dict]): Especificaciones ya preparadas
+
+        Returns:
+            List[Dict]: 'indice', 'resultado' y 'error' de cada especificación, en orden
+
+        Raises:
+            ServicioSaturado: Si no hay plazas para el lote completo
+            ValueError: Si el lote no cabe en la cola ni siquiera vacía
+        """
+        if len(specs) > self.capacidad:
+            raise ValueError(f"El lote tiene {len(specs)} elementos y el máximo es {self.capacidad}")
+        self._reservar(len(specs))
+        cancelacion = TokenCancelacion(self.plazo)
+        futuros = [self._enviar(self._generar, spec, cancelacion) for spec in specs]
+
+        resultados = []
+        for indice, futuro in enumerate(futuros):
+            try:
+                resultados.append({"indice": indice, "resultado": self._esperar(futuro, cancelacion), "error": None})
+            except Exception as e:
+                resultados.append({"indice": indice, "resultado": None, "error": str(e) or type(e).__name__})
+        return resultados
+
+    def generar_stream(self, spec: Dict[str, Any], cancelacion: TokenCancelacion) -> "queue.Queue":
+        """
+        Inicia una generación en streaming
+
+        Args:
+            spec (Dict): Especificación ya preparada
+            cancelacion (TokenCancelacion): Token de la generación (el llamador lo cancela si el cliente se va)
+
+        Returns:
+            queue.Queue: Recibe ("fragmento", {seccion, texto}) por cada fragmento y al final
+                ("resultado", dict) o ("error", mensaje)
+
+        Raises:
+            ServicioSaturado: Si la cola está llena
+        """
+        self._reservar(1)
+        eventos: "queue.Queue" = queue.Queue()
+
+        def al_recibir(seccion: str, texto: str) -> None:
+            eventos.put(("fragmento", {"seccion": seccion, "texto": texto}))
+
+        def al_terminar(futuro: Future) -> None:
+            if futuro.cancelled():
+                eventos.put(("error", "Generación cancelada"))
+            elif futuro.exception() is not None:
+                eventos.put(("error", str(futuro.exception()) or type(futuro.exception()).__name__))
+            else:
+                eventos.put(("resultado", futuro.result()))
+
+        self._enviar(self._generar, spec, cancelacion, al_recibir).add_done_callback(al_terminar)
+        return eventos
+
+    # ==================== ESTADO ====================
+
+    def estado(self) -> Dict[str, Any]:
+        """
+        Ocupación y contadores del servicio
+
+        Returns:
+            Dict: en_curso, en_cola, capacidad, trabajadores y contadores de peticiones
+        """
+        with self._lock:
+            return {
+                "en_curso": self._en_curso,
+                "en_cola": self._admitidas - self._en_curso,
+                "capacidad": self.capacidad,
+                "trabajadores": self.trabajadores,
+                "aceptadas": self.aceptadas,
+                "rechazadas": self.rechazadas,
+                "errores": self.errores,
+                "plazos": self.plazos,
+            }
+
+    def metricas(self) -> Dict[str, Any]:
+        """Estado del servicio más las estadísticas del generador"""
+        registro = self.generador.metricas
+        return {
+            "servicio": self.estado(),
+            "etapas": registro.estadisticas() if registro is not None else {},
+            "cache": self.generador.estadisticas_cache(),
+            "enrutado": self.generador.estadisticas_enrutado(),
+            "cobertura": self.generador.estadisticas_cobertura(),
+            "respuestas_locales": self.generador.respuestas_locales,
+        }
+
+    def cerrar(self) -> None:
+        """Descarta las generaciones en cola y libera los trabajadores"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _ManejadorPrompts(BaseHTTPRequestHandler):
+    """Traduce las peticiones HTTP a llamadas de ServicioPrompts"""
+
+    server: "ServidorPrompts"
+    server_version = "PromptsIA"
+
+    def log_message(self, formato: str, *args: Any) -> None:
+        if not self.server.silencioso:
+            super().log_message(formato, *args)
+
+    def _responder(self, codigo: int, datos: Any, cabeceras: Optional[Dict[str, str]] = None) -> None:
+        cuerpo = json.dumps(datos, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(codigo)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(cuerpo)))
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _error(self, codigo: int, mensaje: str) -> None:
+        cabeceras = {"Retry-After": "1"} if codigo == 429 else None
+        self._responder(codigo, {"error": mensaje}, cabeceras)
+
+    def _leer_json(self) -> Any:
+        try:
+            longitud = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            raise ValueError("Falta la cabecera Content-Length")
+        if longitud > MAX_CUERPO:
+            raise ValueError(f"El cuerpo supera el máximo de {MAX_CUERPO} bytes")
+        try:
+            return json.loads(self.rfile.read(longitud) or b"null")
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON inválido: {e}")
+
+    def do_GET(self) -> None:
+        servicio = self.server.servicio
+        if self.path == "/salud":
+            generador = servicio.generador
+            self._responder(200, dict(servicio.estado(), estado="ok", modo=generador.modo,
+                                      modelo=generador.nombre_modelo))
+        elif self.path == "/metricas":
+            self._responder(200, servicio.metricas())
+        else:
+            self._error(404, f"Ruta desconocida: {self.path}")
+
+    def do_POST(self) -> None:
+        servicio = self.server.servicio
+        if self.path not in ("/generar", "/lote", "/stream"):
+            self._error(404, f"Ruta desconocida: {self.path}")
+            return
+
+        try:
+            datos = self._leer_json()
+            if self.path == "/stream":
+                self._stream(servicio.preparar_spec(datos))
+            elif self.path == "/generar":
+                self._responder(200, {"resultado": servicio.generar(servicio.preparar_spec(datos))})
+            else:
+                especificaciones = datos.get("especificaciones") if isinstance(datos, dict) else None
+                if not isinstance(especificaciones, list) or not especificaciones:
+                    raise ValueError("Se esperaba {\"especificaciones\": [...]} con al menos un elemento")
+                specs = [servicio.preparar_spec(spec) for spec in especificaciones]
+                self._responder(200, {"resultados": servicio.lote(specs)})
+        except ServicioSaturado as e:
+            self._error(429, str(e))
+        except ValueError as e:
+            self._error(400, str(e))
+        except PlazoExcedido as e:
+            self._error(504, str(e) or "La generación superó el plazo del servicio")
+        except GeneracionCancelada as e:
+            self._error(503, str(e) or "Generación cancelada")
+        except Exception as e:
+            print(f"Error al atender {self.path}: {e}")
+            self._error(500, str(e))
+
+    def _stream(self, spec: Dict[str, Any]) -> None:
+        """Envía cada fragmento como una línea JSON (NDJSON) en cuanto llega"""
+        servicio = self.server.servicio
+        cancelacion = TokenCancelacion(servicio.plazo)
+        eventos = servicio.generar_stream(spec, cancelacion)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+
+        try:
+            while True:
+                try:
+                    tipo, contenido = eventos.get(timeout=servicio.plazo + 1.0)
+                except queue.Empty:
+                    cancelacion.cancelar()
+                    tipo, contenido = "error", "La generación superó el plazo del servicio"
+                if tipo == "fragmento":
+                    linea = contenido
+                else:
+                    linea = {tipo: contenido}
+                self.wfile.write((json.dumps(linea, ensure_ascii=False) + "\n").encode("utf-8"))
+                self.wfile.flush()
+                if tipo != "fragmento":
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            # El cliente se fue: no tiene sentido seguir generando
+            cancelacion.cancelar()
+
+
+class ServidorPrompts(ThreadingHTTPServer):
+    """Servidor HTTP (un hilo por conexión) que atiende con un ServicioPrompts"""
+
+    daemon_threads = True
+
+    def __init__(self, direccion, servicio: ServicioPrompts, silencioso: bool = False):
+        """
+        Inicializa el servidor
+
+        Args:
+            direccion (Tuple[str, int]): (host, puerto); el puerto 0 elige uno libre
+            servicio (ServicioPrompts): Servicio que atiende las generaciones
+            silencioso (bool): Si no se registra cada petición en stderr
+        """
+        self.servicio = servicio
+        self.silencioso = silencioso
+        super().__init__(direccion, _ManejadorPrompts)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Punto de entrada de python -m src.server"""
+    parser = argparse.ArgumentParser(
+        prog="python -m src.server",
+        description="PROMPTS IA - Servicio HTTP de generación de prompts"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Dirección de escucha (por defecto solo local)")
+    parser.add_argument("--puerto", type=int, default=8765, help="Puerto de escucha (por defecto 8765)")
+    parser.add_argument("--trabajadores", type=int, default=4, help="Generaciones simultáneas (por defecto 4)")
+    parser.add_argument("--cola", type=int, default=16,
+                        help="Generaciones que pueden esperar; por encima se responde 429 (por defecto 16)")
+    parser.add_argument("--plazo", type=float, default=60.0, help="Segundos máximos por generación (por defecto 60)")
+    parser.add_argument("--backend", choices=("gemini", "falso"), default="gemini",
+                        help="'falso' genera respuestas locales de prueba sin red ni API key")
+    parser.add_argument("--modo", choices=MODOS, default=MODO_REMOTO,
+                        help="remoto: solo Gemini; local: generador local; auto: Gemini con respaldo local")
+    parser.add_argument("--sin-cache", action="store_true", help="No reutilizar resultados del caché")
+    parser.add_argument("-q", "--silencioso", action="store_true", help="No registrar cada petición")
+    args = parser.parse_args(argv)
+
+    try:
+        generador = crear_generador(args.backend, args.modo, not args.sin_cache)
+        servicio = ServicioPrompts(generador, args.trabajadores, args.cola, args.plazo)
+        servidor = ServidorPrompts((args.host, args.puerto), servicio, args.silencioso)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    generador.calentar_conexion()
+    host, puerto = servidor.server_address[:2]
+    print(f"Servicio PROMPTS IA en http://{host}:{puerto} ({args.trabajadores} trabajadores, "
+          f"cola de {args.cola})", file=sys.stderr)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        servicio.cerrar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
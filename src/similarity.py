@@ -0,0 +1,262 @@
+"""
+Índice de descripciones similares para PROMPTS IA
+Detecta peticiones casi idénticas a otras del historial (mayúsculas, tildes, puntuación,
+orden de las palabras) para ofrecer reutilizar su resultado en lugar de llamar a la API
+"""
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+
+# Palabras vacías: solo artículos y conjunciones, que no cambian lo que se pide
+PALABRAS_VACIAS = frozenset("el la lo los las un una unos unas al del y e o u que pero".split())
+
+# Palabras que invierten o matizan la petición ("con"/"sin" sombrero, "no" sonriendo...):
+# dos descripciones solo se consideran equivalentes si contienen exactamente las mismas
+PALABRAS_CONTRASTE = frozenset("""
+no ni sin con contra nunca jamas nada ningun ninguna ninguno mas menos muy sobre bajo antes despues
+""".split())
+
+_PATRON_PALABRA = re.compile(r"[a-z0-9ñ]+")
+
+# Bits del hash de un fragmento (los bajos eligen la posición de la firma, el resto es el valor)
+_BITS_HASH = 64
+
+
+def normalizar(texto: str) -> List[str]:
+    """
+    Reduce una descripción a sus palabras significativas, sin tildes ni puntuación y ordenadas
+
+    Args:
+        texto (str): Descripción del usuario
+
+    Returns:
+        List[str]: Palabras normalizadas ("Mujer en playa, atardecer" -> ["atardecer", "mujer", "playa"])
+    """
+    # Quitar tildes conservando la ñ
+    texto = texto.lower().replace("ñ", "\0")
+    texto = unicodedata.normalize("NFKD", texto)
+    texto = "".join(c for c in texto if not unicodedata.combining(c)).replace("\0", "ñ")
+    return sorted(p for p in _PATRON_PALABRA.findall(texto) if p not in PALABRAS_VACIAS)
+
+
+def fragmentos(palabras: Iterable[str], n: int = 3) -> FrozenSet[str]:
+    """
+    Conjunto de fragmentos (shingles) de una descripción normalizada
+
+    Incluye cada palabra y sus n-gramas de caracteres, de modo que los plurales y
+    las erratas pequeñas siguen compartiendo la mayor parte de los fragmentos.
+
+    Args:
+        palabras (Iterable[str]): Palabras normalizadas
+        n (int): Longitud de los n-gramas de caracteres
+
+    Returns:
+        FrozenSet[str]: Fragmentos
+    """
+    resultado: Set[str] = set()
+    for palabra in palabras:
+        resultado.add(palabra)
+        relleno = f"_{palabra}_"
+        for i in range(max(1, len(relleno) - n + 1)):
+            resultado.add(relleno[i:i + n])
+    return frozenset(resultado)
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    """Similitud de Jaccard entre dos conjuntos de fragmentos"""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class IndiceSimilitud:
+    """
+    Índice MinHash de las descripciones del historial
+
+    Cada entrada se agrupa por tipo de medio, categoría, estilo y detalles (solo se
+    reutiliza un resultado pedido con los mismos parámetros). Dentro de cada grupo,
+    las firmas MinHash se reparten en bandas (LSH) para encontrar candidatos sin
+    recorrer todo el historial; los candidatos se confirman con la similitud de
+    Jaccard exacta de sus fragmentos y deben tener las mismas palabras de contraste.
+
+    La firma usa una sola permutación (one permutation hashing): cada fragmento se
+    hashea una vez y cae en una posición de la firma, que guarda el mínimo; las
+    posiciones vacías se rellenan con la siguiente ocupada (densificación). Así
+    firmar cuesta O(fragmentos) en lugar de O(fragmentos × permutaciones).
+    """
+
+    def __init__(self, umbral: float = 0.8, num_permutaciones: int = 64, bandas: int = 16):
+        """
+        Inicializa el índice
+
+        Args:
+            umbral (float): Similitud mínima (0-1) para considerar dos descripciones equivalentes
+            num_permutaciones (int): Longitud de la firma MinHash (posiciones)
+            bandas (int): Bandas LSH (debe dividir a num_permutaciones); más bandas, más candidatos
+        """
+        if num_permutaciones % bandas:
+            raise ValueError("num_permutaciones debe ser múltiplo de bandas")
+
+        self.umbral = umbral
+        self.num_permutaciones = num_permutaciones
+        self.bandas = bandas
+        self._filas = num_permutaciones // bandas
+
+        # Firmas de las entradas indexadas (el historial repite mucho las mismas descripciones);
+        # las de las búsquedas no se guardan, para que no crezca con cada consulta distinta
+        self._firmas: Dict[FrozenSet[str], Tuple[int, ...]] = {}
+
+        self._entradas: List[Tuple[FrozenSet[str], FrozenSet[str], Dict[str, Any]]] = []
+        # (grupo, banda, valores de la banda) -> índices de entradas
+        self._cubetas: Dict[Tuple[str, int, Tuple[int, ...]], List[int]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+        self.busquedas = 0
+        self.coincidencias = 0
+
+    @staticmethod
+    def _grupo(tipo_medio: str, categoria: str, estilo: str, detalles: Optional[Dict[str, Any]]) -> str:
+        return json.dumps([tipo_medio, categoria, estilo, detalles or {}], sort_keys=True, ensure_ascii=False)
+
+    @staticmethod
+    def _hash_fragmento(fragmento: str) -> int:
+        return int.from_bytes(hashlib.blake2b(fragmento.encode(), digest_size=8).digest(), "big")
+
+    def firma(self, conjunto: FrozenSet[str]) -> Tuple[int, ...]:
+        """
+        Firma MinHash de un conjunto de fragmentos
+
+        Args:
+            conjunto (FrozenSet[str]): Fragmentos de la descripción
+
+        Returns:
+            Tuple[int, ...]: Mínimo de cada posición (las vacías, densificadas); se reutiliza
+                la de una entrada indexada con los mismos fragmentos
+        """
+        firma = self._firmas.get(conjunto)
+        if firma is not None:
+            return firma
+
+        n = self.num_permutaciones
+        minimos: List[Optional[int]] = [None] * n
+        for fragmento in conjunto:
+            h = self._hash_fragmento(fragmento)
+            posicion, valor = h % n, h // n
+            actual = minimos[posicion]
+            if actual is None or valor < actual:
+                minimos[posicion] = valor
+
+        # Densificación: cada posición vacía toma la siguiente ocupada (circularmente),
+        # desplazada según la distancia para no repetir el mismo valor
+        ocupadas = [i for i, valor in enumerate(minimos) if valor is not None]
+        if not ocupadas:
+            firma = (0,) * n
+        else:
+            valores = list(minimos)
+            siguiente = ocupadas[0] + n
+            for i in range(n - 1, -1, -1):
+                if minimos[i] is not None:
+                    siguiente = i
+                else:
+                    distancia = siguiente - i
+                    valores[i] = minimos[siguiente % n] + (distancia << _BITS_HASH)
+            firma = tuple(valores)
+        return firma
+
+    def _bandas(self, firma: Tuple[int, ...]) -> Iterable[Tuple[int, Tuple[int, ...]]]:
+        for banda in range(self.bandas):
+            yield banda, firma[banda * self._filas:(banda + 1) * self._filas]
+
+    def agregar(self, entrada: Dict[str, Any]) -> None:
+        """
+        Indexa una entrada del historial
+
+        Args:
+            entrada (Dict): Entrada con tipo_medio, categoria, estilo, descripcion y detalles
+        """
+        descripcion = entrada.get("descripcion")
+        if not descripcion or not entrada.get("prompt_positivo"):
+            return
+        # Los resultados del generador local no se ofrecen: la próxima vez conviene pedirlos a Gemini
+        if entrada.get("origen") == "local":
+            return
+
+        palabras = normalizar(descripcion)
+        conjunto = fragmentos(palabras)
+        grupo = self._grupo(entrada.get("tipo_medio", ""), entrada.get("categoria", ""),
+                            entrada.get("estilo", ""), entrada.get("detalles"))
+
+        with self._lock:
+            firma = self.firma(conjunto)
+            self._firmas[conjunto] = firma
+            indice = len(self._entradas)
+            self._entradas.append((conjunto, PALABRAS_CONTRASTE.intersection(palabras), entrada))
+            for banda, valores in self._bandas(firma):
+                self._cubetas[(grupo, banda, valores)].append(indice)
+
+    def cargar(self, historial: Iterable[Dict[str, Any]]) -> "IndiceSimilitud":
+        """Indexa todas las entradas de un historial; devuelve el propio índice"""
+        for entrada in historial:
+            self.agregar(entrada)
+        return self
+
+    def buscar(self, tipo_medio: str, categoria: str, estilo: str, descripcion: str,
+               detalles: Optional[Dict[str, Any]] = None) -> Optional[Tuple[Dict[str, Any], float]]:
+        """
+        Busca la entrada más parecida con los mismos parámetros
+
+        Args:
+            tipo_medio (str): "imagen" o "video"
+            categoria (str): Categoría tal como se guarda en el historial
+            estilo (str): Estilo tal como se guarda en el historial
+            descripcion (str): Descripción nueva
+            detalles (Dict): Detalles extra de la petición
+
+        Returns:
+            Optional[Tuple[Dict, float]]: (entrada, similitud) si supera el umbral; si hay
+                varias con la misma similitud, la más reciente
+        """
+        palabras = normalizar(descripcion)
+        conjunto = fragmentos(palabras)
+        contraste = PALABRAS_CONTRASTE.intersection(palabras)
+        grupo = self._grupo(tipo_medio, categoria, estilo, detalles)
+
+        with self._lock:
+            firma = self.firma(conjunto)
+            self.busquedas += 1
+            candidatos: Set[int] = set()
+            for banda, valores in self._bandas(firma):
+                candidatos.update(self._cubetas.get((grupo, banda, valores), ()))
+
+            mejor: Optional[Tuple[Dict[str, Any], float]] = None
+            for indice in sorted(candidatos, reverse=True):
+                otro, otro_contraste, entrada = self._entradas[indice]
+                # "con sombrero" no equivale a "sin sombrero" por mucho que se parezcan
+                if otro_contraste != contraste:
+                    continue
+                similitud = jaccard(conjunto, otro)
+                if similitud >= self.umbral and (mejor is None or similitud > mejor[1]):
+                    mejor = (entrada, similitud)
+
+            if mejor is not None:
+                self.coincidencias += 1
+            return mejor
+
+    def estadisticas(self) -> Dict[str, int]:
+        """
+        Devuelve los contadores del índice
+
+        Returns:
+            Dict[str, int]: entradas indexadas, búsquedas y coincidencias
+        """
+        with self._lock:
+            return {
+                "entradas": len(self._entradas),
+                "busquedas": self.busquedas,
+                "coincidencias": self.coincidencias,
+            }
@@ -0,0 +1,138 @@
+"""
+Medición del arranque de PROMPTS IA
+Registra la duración de cada etapa del arranque (imports, ventana, modelo) al estilo de -X importtime
+"""
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+
+# Etapa a la que se aplica el presupuesto de arranque: la ventana ya se puede usar
+ETAPA_PRESUPUESTO = "ventana visible"
+
+
+class InformeArranque:
+    """
+    Registro de las etapas del arranque
+
+    Las etapas se miden siempre (el coste es despreciable) y el informe solo se
+    muestra si se pide con --arranque o la variable PROMPTS_IA_ARRANQUE.
+    """
+
+    def __init__(self, inicio: Optional[float] = None):
+        """
+        Inicializa el informe
+
+        Args:
+            inicio (float): Instante de referencia (time.perf_counter); por defecto, ahora
+        """
+        self.inicio = inicio if inicio is not None else time.perf_counter()
+        self.etapas: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def etapa(self, nombre: str) -> Iterator[None]:
+        """
+        Mide la duración del bloque como una etapa del arranque
+
+        Args:
+            nombre (str): Nombre de la etapa (p. ej. "importar customtkinter")
+        """
+        comienzo = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._registrar(nombre, comienzo, time.perf_counter())
+
+    def marcar(self, nombre: str) -> None:
+        """Registra un hito instantáneo (p. ej. "ventana visible")"""
+        ahora = time.perf_counter()
+        self._registrar(nombre, ahora, ahora)
+
+    def _registrar(self, nombre: str, comienzo: float, fin: float) -> None:
+        with self._lock:
+            self.etapas.append({
+                "etapa": nombre,
+                "hilo": threading.current_thread().name,
+                "duracion_ms": round((fin - comienzo) * 1000, 2),
+                "desde_inicio_ms": round((fin - self.inicio) * 1000, 2),
+            })
+
+    def tiempo_hasta(self, nombre: str) -> Optional[float]:
+        """Milisegundos desde el inicio hasta el final de la etapa indicada (None si no ocurrió)"""
+        with self._lock:
+            for etapa in self.etapas:
+                if etapa["etapa"] == nombre:
+                    return etapa["desde_inicio_ms"]
+        return None
+
+    def resumen(self, presupuesto_ms: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Devuelve el informe completo
+
+        Args:
+            presupuesto_ms (float): Tiempo máximo admitido hasta que la ventana es visible
+
+        Returns:
+            Dict: Etapas, total y, si hay presupuesto, si se cumplió
+        """
+        with self._lock:
+            etapas = list(self.etapas)
+
+        resumen: Dict[str, Any] = {
+            "etapas": etapas,
+            "total_ms": max((e["desde_inicio_ms"] for e in etapas), default=0.0),
+        }
+        if presupuesto_ms is not None:
+            hasta_ventana = self.tiempo_hasta(ETAPA_PRESUPUESTO)
+            resumen["presupuesto_ms"] = presupuesto_ms
+            resumen["dentro_presupuesto"] = hasta_ventana is not None and hasta_ventana <= presupuesto_ms
+        return resumen
+
+    def formatear(self, presupuesto_ms: Optional[float] = None) -> str:
+        """Texto en columnas, similar a la salida de python -X importtime"""
+        resumen = self.resumen(presupuesto_ms)
+        lineas = [f"arranque: {'desde inicio [ms]':>17} | {'duración [ms]':>13} | {'hilo':<18} | etapa"]
+        for etapa in resumen["etapas"]:
+            lineas.append(
+                f"arranque: {etapa['desde_inicio_ms']:>17.1f} | {etapa['duracion_ms']:>13.1f} | "
+                f"{etapa['hilo'][:18]:<18} | {etapa['etapa']}"
+            )
+        if presupuesto_ms is not None:
+            estado = "OK" if resumen["dentro_presupuesto"] else "EXCEDIDO"
+            lineas.append(f"arranque: presupuesto hasta '{ETAPA_PRESUPUESTO}': {presupuesto_ms:.0f} ms -> {estado}")
+        return "\n".join(lineas)
+
+    def emitir(self, destino: str = "-", presupuesto_ms: Optional[float] = None) -> bool:
+        """
+        Muestra el informe en stderr o lo guarda en un archivo JSON
+
+        Args:
+            destino (str): "-" para stderr o ruta del archivo JSON
+            presupuesto_ms (float): Presupuesto de arranque a comprobar
+
+        Returns:
+            bool: False si se excedió el presupuesto
+        """
+        if destino == "-":
+            sys.stderr.write(self.formatear(presupuesto_ms) + "\n")
+        else:
+            try:
+                with open(destino, 'w', encoding='utf-8') as f:
+                    json.dump(self.resumen(presupuesto_ms), f, ensure_ascii=False, indent=2)
+            except Exception as e:
+                print(f"Error al guardar el informe de arranque: {e}")
+
+        return self.resumen(presupuesto_ms).get("dentro_presupuesto", True)
+
+
+# Informe del proceso; se crea al importar este módulo, lo primero que hace main.py
+_informe = InformeArranque()
+
+
+def obtener_informe() -> InformeArranque:
+    """Devuelve el informe de arranque del proceso"""
+    return _informe
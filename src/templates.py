@@ -0,0 +1,349 @@
+"""
+Registro de plantillas de prompts para PROMPTS IA
+Carga las plantillas desde archivos, las compila una vez y las despacha por categoría
+"""
+import os
+import json
+import threading
+import time
+from string import Template
+from typing import Dict, List, Optional, Tuple
+
+from .rate_limit import estimar_tokens
+
+
+# Variables disponibles en todas las plantillas
+VARIABLES_COMUNES = ("descripcion", "estilo")
+
+
+def directorios_por_defecto() -> List[str]:
+    """
+    Directorios de plantillas que se cargan por defecto
+
+    Primero las plantillas incluidas en src/plantillas/ y, si existe, la carpeta
+    plantillas/ en la raíz del proyecto, que permite añadir o reemplazar
+    categorías sin modificar el código.
+
+    Returns:
+        List[str]: Rutas de los directorios existentes
+    """
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    script_dir = os.path.dirname(src_dir)
+    directorios = [os.path.join(src_dir, "plantillas"), os.path.join(script_dir, "plantillas")]
+    return [d for d in directorios if os.path.isfile(os.path.join(d, "registro.json"))]
+
+
+def _compilar(texto: str) -> List[Tuple[str, Optional[str]]]:
+    """
+    Convierte el texto de una plantilla ($variable / ${variable}) en segmentos
+
+    Returns:
+        List[Tuple[str, Optional[str]]]: Pares (texto literal, variable siguiente o None)
+    """
+    segmentos = []
+    literal = []
+    posicion = 0
+
+    for coincidencia in Template.pattern.finditer(texto):
+        literal.append(texto[posicion:coincidencia.start()])
+        posicion = coincidencia.end()
+
+        if coincidencia.group("escaped") is not None:
+            literal.append("$")
+            continue
+
+        nombre = coincidencia.group("named") or coincidencia.group("braced")
+        if nombre is None:
+            raise ValueError(f"Marcador inválido en la plantilla: {coincidencia.group(0)!r}")
+        segmentos.append(("".join(literal), nombre))
+        literal = []
+
+    literal.append(texto[posicion:])
+    segmentos.append(("".join(literal), None))
+    return segmentos
+
+
+class Plantilla:
+    """Plantilla compilada de una categoría"""
+
+    def __init__(self, categoria: str, tipo_medio: str, etiqueta: str, texto: str,
+                 parametros: Dict[str, str], version: int = 1,
+                 sistema: Optional[str] = None, usuario: Optional[str] = None):
+        """
+        Compila la plantilla
+
+        Args:
+            categoria (str): Identificador interno de la categoría (p. ej. "video_generate")
+            tipo_medio (str): "imagen" o "video"
+            etiqueta (str): Nombre mostrado en la interfaz
+            texto (str): Texto de la plantilla con variables $nombre
+            parametros (Dict[str, str]): Detalles aceptados y su valor por defecto
+            version (int): Versión de la plantilla
+            sistema (str): Instrucciones fijas de la categoría, para usar como instrucción
+                del sistema del modelo (sin variables)
+            usuario (str): Parte variable que acompaña a 'sistema' en cada petición
+        """
+        self.categoria = categoria
+        self.tipo_medio = tipo_medio
+        self.etiqueta = etiqueta
+        self.parametros = dict(parametros)
+        self.version = version
+        self._segmentos = self._compilar_validando(texto)
+
+        # Modo dividido: instrucciones fijas + datos variables
+        self.sistema = sistema
+        self._segmentos_usuario = self._compilar_validando(usuario) if usuario is not None else None
+        if sistema is not None and len(_compilar(sistema)) > 1:
+            raise ValueError(f"Las instrucciones del sistema de '{categoria}' no pueden tener variables")
+
+    @property
+    def admite_instruccion_sistema(self) -> bool:
+        """Indica si la plantilla tiene separadas las instrucciones fijas de los datos variables"""
+        return self.sistema is not None and self._segmentos_usuario is not None
+
+    def renderizar(self, descripcion: str, estilo: str, detalles: Optional[Dict[str, str]] = None) -> str:
+        """
+        Sustituye las variables de la plantilla
+
+        Args:
+            descripcion (str): Descripción del usuario
+            estilo (str): Estilo artístico
+            detalles (Dict[str, str]): Detalles de la categoría; los ausentes usan su valor por defecto
+
+        Returns:
+            str: Prompt del sistema listo para enviar
+        """
+        return self._sustituir(self._segmentos, self._valores(descripcion, estilo, detalles))
+
+    def renderizar_usuario(self, descripcion: str, estilo: str,
+                           detalles: Optional[Dict[str, str]] = None) -> str:
+        """
+        Sustituye las variables de la parte variable (modo instrucción del sistema)
+
+        Args:
+            descripcion (str): Descripción del usuario
+            estilo (str): Estilo artístico
+            detalles (Dict[str, str]): Detalles de la categoría
+
+        Returns:
+            str: Mensaje con solo los datos de la solicitud
+        """
+        if self._segmentos_usuario is None:
+            raise ValueError(f"La plantilla '{self.categoria}' no define una parte de usuario")
+        return self._sustituir(self._segmentos_usuario, self._valores(descripcion, estilo, detalles))
+
+    def _compilar_validando(self, texto: str) -> List[Tuple[str, Optional[str]]]:
+        """Compila un texto y verifica que todas sus variables estén declaradas"""
+        segmentos = _compilar(texto)
+        declaradas = set(VARIABLES_COMUNES) | set(self.parametros)
+        usadas = {nombre for _, nombre in segmentos if nombre is not None}
+        faltantes = usadas - declaradas
+        if faltantes:
+            raise ValueError(
+                f"La plantilla '{self.categoria}' usa variables no declaradas: {', '.join(sorted(faltantes))}"
+            )
+        return segmentos
+
+    def _valores(self, descripcion: str, estilo: str, detalles: Optional[Dict[str, str]]) -> Dict[str, str]:
+        """Valores de las variables, con los valores por defecto de los detalles ausentes"""
+        if detalles:
+            valores = {nombre: detalles.get(nombre, defecto) for nombre, defecto in self.parametros.items()}
+        else:
+            valores = dict(self.parametros)
+        valores["descripcion"] = descripcion
+        valores["estilo"] = estilo
+        return valores
+
+    @staticmethod
+    def _sustituir(segmentos: List[Tuple[str, Optional[str]]], valores: Dict[str, str]) -> str:
+        """Une los segmentos compilados con los valores de las variables"""
+        partes = []
+        for literal, nombre in segmentos:
+            partes.append(literal)
+            if nombre is not None:
+                partes.append(str(valores[nombre]))
+        return "".join(partes)
+
+
+class RegistroPlantillas:
+    """
+    Registro de plantillas por categoría
+
+    Cada directorio contiene un registro.json que describe las categorías
+    (tipo de medio, etiqueta, archivo, versión y parámetros) y los archivos de
+    texto de las plantillas. Los directorios posteriores pueden añadir
+    categorías o reemplazar las existentes.
+    """
+
+    def __init__(self, directorios: Optional[List[str]] = None):
+        """
+        Carga y compila las plantillas
+
+        Args:
+            directorios (List[str]): Directorios a cargar (por defecto directorios_por_defecto())
+        """
+        self._plantillas: Dict[str, Plantilla] = {}
+        self._por_defecto: Dict[str, str] = {}
+        self._estadisticas: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+        for directorio in (directorios if directorios is not None else directorios_por_defecto()):
+            self.cargar_directorio(directorio)
+
+    def cargar_directorio(self, directorio: str) -> None:
+        """
+        Carga las categorías descritas en el registro.json de un directorio
+
+        Args:
+            directorio (str): Carpeta con registro.json y los archivos de plantilla
+        """
+        with open(os.path.join(directorio, "registro.json"), 'r', encoding='utf-8') as f:
+            registro = json.load(f)
+
+        def leer(nombre: Optional[str]) -> Optional[str]:
+            if not nombre:
+                return None
+            with open(os.path.join(directorio, nombre), 'r', encoding='utf-8') as f:
+                return f.read().rstrip("\n")
+
+        for categoria, info in registro.get("categorias", {}).items():
+            self._plantillas[categoria] = Plantilla(
+                categoria,
+                info["tipo_medio"],
+                info.get("etiqueta", categoria),
+                leer(info["archivo"]),
+                info.get("parametros", {}),
+                info.get("version", 1),
+                sistema=leer(info.get("sistema")),
+                usuario=leer(info.get("usuario"))
+            )
+
+        self._por_defecto.update(registro.get("por_defecto", {}))
+
+    def obtener(self, tipo_medio: str, categoria: str) -> Plantilla:
+        """
+        Devuelve la plantilla de una categoría
+
+        Si la categoría no existe para ese tipo de medio se usa la categoría por defecto.
+
+        Args:
+            tipo_medio (str): "imagen" o "video"
+            categoria (str): Identificador interno de la categoría
+
+        Returns:
+            Plantilla: Plantilla compilada
+        """
+        plantilla = self._plantillas.get(categoria)
+        if plantilla is None or plantilla.tipo_medio != tipo_medio:
+            plantilla = self._plantillas[self._por_defecto[tipo_medio]]
+        return plantilla
+
+    def renderizar(self, tipo_medio: str, categoria: str, descripcion: str, estilo: str,
+                   detalles: Optional[Dict[str, str]] = None) -> str:
+        """
+        Renderiza la plantilla de una categoría y registra su costo
+
+        Args:
+            tipo_medio (str): "imagen" o "video"
+            categoria (str): Identificador interno de la categoría
+            descripcion (str): Descripción del usuario
+            estilo (str): Estilo artístico
+            detalles (Dict[str, str]): Detalles adicionales de la categoría
+
+        Returns:
+            str: Prompt del sistema listo para enviar
+        """
+        inicio = time.perf_counter()
+        plantilla = self.obtener(tipo_medio, categoria)
+        texto = plantilla.renderizar(descripcion, estilo, detalles)
+        self._registrar(plantilla.categoria, time.perf_counter() - inicio, texto)
+        return texto
+
+    def renderizar_dividido(self, tipo_medio: str, categoria: str, descripcion: str, estilo: str,
+                            detalles: Optional[Dict[str, str]] = None) -> Optional[Tuple[str, str]]:
+        """
+        Renderiza por separado las instrucciones fijas y los datos variables
+
+        Args:
+            tipo_medio (str): "imagen" o "video"
+            categoria (str): Identificador interno de la categoría
+            descripcion (str): Descripción del usuario
+            estilo (str): Estilo artístico
+            detalles (Dict[str, str]): Detalles adicionales de la categoría
+
+        Returns:
+            Tuple[str, str] or None: (instrucción del sistema, mensaje del usuario), o None
+                si la plantilla de la categoría no está dividida
+        """
+        inicio = time.perf_counter()
+        plantilla = self.obtener(tipo_medio, categoria)
+        if not plantilla.admite_instruccion_sistema:
+            return None
+        texto = plantilla.renderizar_usuario(descripcion, estilo, detalles)
+        self._registrar(plantilla.categoria, time.perf_counter() - inicio, texto)
+        return plantilla.sistema, texto
+
+    def _registrar(self, categoria: str, duracion: float, texto: str) -> None:
+        """Acumula el costo de un renderizado"""
+        with self._lock:
+            stats = self._estadisticas.setdefault(
+                categoria, {"renders": 0, "segundos": 0.0, "caracteres": 0, "tokens_estimados": 0}
+            )
+            stats["renders"] += 1
+            stats["segundos"] += duracion
+            stats["caracteres"] += len(texto)
+            stats["tokens_estimados"] += estimar_tokens(texto)
+
+    def etiquetas(self, tipo_medio: str) -> Dict[str, str]:
+        """
+        Categorías de un tipo de medio para mostrar en la interfaz
+
+        Args:
+            tipo_medio (str): "imagen" o "video"
+
+        Returns:
+            Dict[str, str]: Etiqueta visible -> identificador interno
+        """
+        return {p.etiqueta: p.categoria for p in self._plantillas.values() if p.tipo_medio == tipo_medio}
+
+    def versiones(self) -> Dict[str, int]:
+        """Versión cargada de cada plantilla"""
+        return {categoria: p.version for categoria, p in self._plantillas.items()}
+
+    def estadisticas(self) -> Dict[str, Dict[str, float]]:
+        """
+        Costo de renderizado y tamaño de salida por plantilla
+
+        Returns:
+            Dict: Por categoría: renders, tiempo medio (µs), caracteres y tokens estimados medios
+        """
+        with self._lock:
+            resumen = {}
+            for categoria, stats in self._estadisticas.items():
+                renders = stats["renders"] or 1
+                resumen[categoria] = {
+                    "version": self._plantillas[categoria].version,
+                    "renders": stats["renders"],
+                    "microsegundos_medio": round(stats["segundos"] / renders * 1e6, 3),
+                    "caracteres_medio": round(stats["caracteres"] / renders, 1),
+                    "tokens_estimados_medio": round(stats["tokens_estimados"] / renders, 1),
+                }
+            return resumen
+
+
+_registro_global: Optional[RegistroPlantillas] = None
+_lock_registro = threading.Lock()
+
+
+def obtener_registro() -> RegistroPlantillas:
+    """
+    Registro compartido por todo el proceso, compilado una sola vez
+
+    Returns:
+        RegistroPlantillas: Registro con las plantillas de directorios_por_defecto()
+    """
+    global _registro_global
+    with _lock_registro:
+        if _registro_global is None:
+            _registro_global = RegistroPlantillas()
+        return _registro_global
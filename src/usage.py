@@ -0,0 +1,155 @@
+"""
+Consumo de tokens para PROMPTS IA
+Extrae usage_metadata de las respuestas de Gemini y agrega el consumo guardado en el
+historial por categoría, estilo, modelo o día, con una estimación del coste
+"""
+import argparse
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# Precio orientativo en USD por millón de tokens (entrada, salida) de cada modelo;
+# se puede ajustar si cambian las tarifas. Los modelos ausentes no muestran coste.
+PRECIOS_POR_MILLON: Dict[str, Tuple[float, float]] = {
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+}
+
+# Dimensiones por las que se puede agrupar el informe
+DIMENSIONES = ("categoria", "estilo", "modelo", "dia", "tipo_medio")
+
+
+def extraer_uso(respuesta: Any, modelo: str) -> Optional[Dict[str, Any]]:
+    """
+    Lee el consumo de tokens de una respuesta del SDK
+
+    Args:
+        respuesta: Respuesta de generate_content (o el último fragmento en streaming)
+        modelo (str): Modelo que atendió la petición
+
+    Returns:
+        Optional[Dict]: 'modelo', 'tokens_entrada', 'tokens_salida' (incluidos los de
+            razonamiento) y 'tokens_total', o None si la respuesta no trae usage_metadata
+    """
+    metadatos = getattr(respuesta, "usage_metadata", None)
+    if metadatos is None:
+        return None
+
+    entrada = getattr(metadatos, "prompt_token_count", 0) or 0
+    candidatos = getattr(metadatos, "candidates_token_count", 0) or 0
+    razonamiento = getattr(metadatos, "thoughts_token_count", 0) or 0
+    total = getattr(metadatos, "total_token_count", 0) or entrada + candidatos + razonamiento
+    # Los tokens de razonamiento (thinking) se facturan como salida aunque no estén en
+    # candidates_token_count; si el SDK no los expone aparte, se deducen del total
+    salida = max(candidatos + razonamiento, total - entrada)
+    if not total:
+        return None
+    return {
+        "modelo": modelo,
+        "tokens_entrada": entrada,
+        "tokens_salida": salida,
+        "tokens_total": total,
+    }
+
+
+def sumar_uso(a: Optional[Dict[str, Any]], b: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Suma dos consumos del mismo modelo (p. ej. las rondas de generar_variantes)"""
+    if a is None or b is None:
+        return a or b
+    return dict(a, **{campo: a[campo] + b[campo] for campo in ("tokens_entrada", "tokens_salida", "tokens_total")})
+
+
+def coste_estimado(uso: Dict[str, Any]) -> Optional[float]:
+    """Coste en USD de un consumo según PRECIOS_POR_MILLON (None si el modelo no tiene precio)"""
+    precios = PRECIOS_POR_MILLON.get(uso.get("modelo", ""))
+    if precios is None:
+        return None
+    return (uso["tokens_entrada"] * precios[0] + uso["tokens_salida"] * precios[1]) / 1_000_000
+
+
+def _valor_dimension(entrada: Dict[str, Any], dimension: str) -> str:
+    if dimension == "dia":
+        return entrada.get("timestamp", "")[:10] or "desconocido"
+    if dimension == "modelo":
+        return entrada["uso"].get("modelo") or "desconocido"
+    return entrada.get(dimension) or "desconocido"
+
+
+def informe_uso(historial: Iterable[Dict[str, Any]], por: str = "categoria") -> Dict[str, Any]:
+    """
+    Agrega el consumo de tokens del historial
+
+    Solo cuentan las entradas con 'uso': las reutilizadas del caché o del historial y
+    las del generador local no consumieron tokens y se cuentan aparte.
+
+    Args:
+        historial (Iterable[Dict]): Entradas de history.json
+        por (str): Dimensión de agrupación: categoria, estilo, modelo, dia o tipo_medio
+
+    Returns:
+        Dict: 'grupos' (valor -> peticiones, tokens de entrada/salida/total, media por
+            petición y coste_usd), 'total' con los mismos campos y 'sin_uso'
+    """
+    if por not in DIMENSIONES:
+        raise ValueError(f"Dimensión desconocida: {por!r} (usa {', '.join(DIMENSIONES)})")
+
+    def vacio() -> Dict[str, Any]:
+        return {"peticiones": 0, "tokens_entrada": 0, "tokens_salida": 0, "tokens_total": 0, "coste_usd": 0.0}
+
+    grupos: Dict[str, Dict[str, Any]] = {}
+    total = vacio()
+    sin_uso = 0
+
+    for entrada in historial:
+        uso = entrada.get("uso")
+        if not uso:
+            sin_uso += 1
+            continue
+        coste = coste_estimado(uso) or 0.0
+        for acumulado in (grupos.setdefault(_valor_dimension(entrada, por), vacio()), total):
+            acumulado["peticiones"] += 1
+            for campo in ("tokens_entrada", "tokens_salida", "tokens_total"):
+                acumulado[campo] += uso.get(campo, 0)
+            acumulado["coste_usd"] += coste
+
+    for acumulado in list(grupos.values()) + [total]:
+        acumulado["media_por_peticion"] = (
+            round(acumulado["tokens_total"] / acumulado["peticiones"], 1) if acumulado["peticiones"] else 0.0
+        )
+        acumulado["coste_usd"] = round(acumulado["coste_usd"], 6)
+
+    # Los grupos más costosos primero
+    ordenados = dict(sorted(grupos.items(), key=lambda par: par[1]["tokens_total"], reverse=True))
+    return {"por": por, "grupos": ordenados, "total": total, "sin_uso": sin_uso}
+
+
+def formatear_informe(informe: Dict[str, Any]) -> str:
+    """Tabla de texto de un informe de informe_uso()"""
+    lineas: List[str] = [
+        f"{informe['por'].upper():<32} {'peticiones':>10} {'entrada':>10} {'salida':>10} "
+        f"{'total':>10} {'media':>8} {'USD':>10}"
+    ]
+    filas = list(informe["grupos"].items()) + [("TOTAL", informe["total"])]
+    for nombre, datos in filas:
+        lineas.append(
+            f"{nombre[:32]:<32} {datos['peticiones']:>10} {datos['tokens_entrada']:>10} "
+            f"{datos['tokens_salida']:>10} {datos['tokens_total']:>10} "
+            f"{datos['media_por_peticion']:>8.1f} {datos['coste_usd']:>10.4f}"
+        )
+    lineas.append(f"Sin consumo registrado (caché, reutilizadas, locales o anteriores): {informe['sin_uso']}")
+    return "\n".join(lineas)
+
+
+def main() -> None:
+    """Muestra el informe de consumo del historial: python -m src.usage --por modelo"""
+    from .utils import cargar_historial
+
+    parser = argparse.ArgumentParser(description="Consumo de tokens registrado en el historial")
+    parser.add_argument("--por", choices=DIMENSIONES, default="categoria", help="Dimensión de agrupación")
+    parser.add_argument("--historial", default=None, help="Archivo de historial (por defecto history.json)")
+    args = parser.parse_args()
+
+    print(formatear_informe(informe_uso(cargar_historial(args.historial), args.por)))
+
+
+if __name__ == "__main__":
+    main()
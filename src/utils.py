@@ -4,6 +4,7 @@ Funciones auxiliares para manejo de archivos y configuración
 """
 import os
 import json
+import threading
 from datetime import datetime
 from typing import Optional, List, Dict
 
@@ -34,40 +35,53 @@ def cargar_api_key() -> Optional[str]:
     return None
 
 
-def guardar_historial(entrada: Dict) -> None:
+def _ruta_historial() -> str:
+    """Ruta por defecto del archivo de historial (history.json en la raíz del proyecto)"""
+    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(script_dir, "history.json")
+
+
+# Serializa las escrituras del historial: varias generaciones pueden terminar a la vez
+_lock_historial = threading.Lock()
+
+
+def guardar_historial(entrada: Dict, ruta: Optional[str] = None) -> None:
     """
     Guarda un prompt generado en el historial
     
     Args:
         entrada: Diccionario con los datos del prompt generado
+        ruta: Archivo de historial (por defecto history.json en la raíz del proyecto)
     """
-    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    historial_path = os.path.join(script_dir, "history.json")
-    
-    # Cargar historial existente
-    historial = cargar_historial()
-    
-    # Agregar nueva entrada con timestamp
-    entrada['timestamp'] = datetime.now().isoformat()
-    historial.append(entrada)
+    historial_path = ruta or _ruta_historial()
     
-    # Guardar historial actualizado
-    try:
-        with open(historial_path, 'w', encoding='utf-8') as f:
-            json.dump(historial, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        print(f"Error al guardar historial: {e}")
+    with _lock_historial:
+        # Cargar historial existente
+        historial = cargar_historial(historial_path)
+        
+        # Agregar nueva entrada con timestamp
+        entrada['timestamp'] = datetime.now().isoformat()
+        historial.append(entrada)
+        
+        # Guardar historial actualizado
+        try:
+            with open(historial_path, 'w', encoding='utf-8') as f:
+                json.dump(historial, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"Error al guardar historial: {e}")
 
 
-def cargar_historial() -> List[Dict]:
+def cargar_historial(ruta: Optional[str] = None) -> List[Dict]:
     """
     Carga el historial de prompts generados
     
+    Args:
+        ruta: Archivo de historial (por defecto history.json en la raíz del proyecto)
+    
     Returns:
         Lista de diccionarios con el historial
     """
-    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    historial_path = os.path.join(script_dir, "history.json")
+    historial_path = ruta or _ruta_historial()
     
     try:
         with open(historial_path, 'r', encoding='utf-8') as f:
@@ -78,7 +92,8 @@ def cargar_historial() -> List[Dict]:
         return []
 
 
-def exportar_prompts(prompt_positivo: str, prompt_negativo: str, metadata: Dict) -> str:
+def exportar_prompts(prompt_positivo: str, prompt_negativo: str, metadata: Dict,
+                     directorio: Optional[str] = None) -> str:
     """
     Exporta prompts a un archivo de texto
     
@@ -86,12 +101,16 @@ def exportar_prompts(prompt_positivo: str, prompt_negativo: str, metadata: Dict)
         prompt_positivo: Prompt positivo generado
         prompt_negativo: Prompt negativo generado
         metadata: Información adicional (categoría, tipo de medio, etc.)
+        directorio: Carpeta de destino (por defecto exports/ en la raíz del proyecto)
         
     Returns:
         Ruta del archivo generado
     """
-    script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    exports_dir = os.path.join(script_dir, "exports")
+    if directorio is None:
+        script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        exports_dir = os.path.join(script_dir, "exports")
+    else:
+        exports_dir = directorio
     
     # Crear directorio de exportaciones si no existe
     os.makedirs(exports_dir, exist_ok=True)
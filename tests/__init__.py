@@ -0,0 +1 @@
+# Pruebas de PROMPTS IA (python -m pytest desde la raíz del proyecto)
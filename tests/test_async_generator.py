@@ -0,0 +1,45 @@
+"""
+Pruebas del generador asíncrono
+"""
+import asyncio
+import threading
+
+from src.async_generator import AsyncGeminiPromptGenerator
+from src.backends import BackendFalso
+from src.cache import CachePrompts
+
+
+class CacheRegistrada(CachePrompts):
+    """Caché que anota en qué hilo se consulta y se guarda"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hilos = []
+
+    def obtener(self, clave):
+        self.hilos.append(threading.get_ident())
+        return super().obtener(clave)
+
+    def guardar(self, clave, resultado):
+        self.hilos.append(threading.get_ident())
+        super().guardar(clave, resultado)
+
+
+def test_el_cache_no_bloquea_el_event_loop(tmp_path):
+    cache = CacheRegistrada(directorio=str(tmp_path))
+    generador = AsyncGeminiPromptGenerator(backend=BackendFalso(), cache=cache, usar_metricas=False)
+
+    async def principal():
+        hilo_loop = threading.get_ident()
+        primero = await generador.generar_prompt_con_ia_async(
+            "imagen", "generate", "un faro en la tormenta", "realista/fotográfico")
+        segundo = await generador.generar_prompt_con_ia_async(
+            "imagen", "generate", "un faro en la tormenta", "realista/fotográfico")
+        return hilo_loop, primero, segundo
+
+    hilo_loop, primero, segundo = asyncio.run(principal())
+
+    assert len(cache.hilos) == 3  # obtener (miss), guardar, obtener (hit)
+    assert hilo_loop not in cache.hilos
+    assert segundo["positivo"] == primero["positivo"]
+    assert cache.estadisticas()["hits"] == 1
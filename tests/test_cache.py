@@ -0,0 +1,78 @@
+"""
+Pruebas del caché de respuestas
+"""
+from src.backends import BackendFalso
+from src.cache import CachePrompts
+from src.generator import GeminiPromptGenerator
+from src.templates import RegistroPlantillas
+
+ARGS = ("imagen", "generate", "un faro en la tormenta", "realista/fotográfico")
+
+
+def _generador(tmp_path, plantillas, **opciones):
+    return GeminiPromptGenerator(
+        backend=BackendFalso(), plantillas=plantillas, usar_metricas=False,
+        cache=CachePrompts(directorio=str(tmp_path / "cache")), **opciones
+    )
+
+
+def test_cambiar_la_version_de_la_plantilla_no_reutiliza_el_cache(tmp_path):
+    plantillas = RegistroPlantillas()
+    generador = _generador(tmp_path, plantillas)
+
+    generador.generar_prompt_con_ia(*ARGS)
+    generador.generar_prompt_con_ia(*ARGS)
+    assert generador.estadisticas_cache()["hits"] == 1
+
+    plantillas.obtener("imagen", "generate").version += 1
+    # Un proceso nuevo (sin memoria) con la plantilla nueva tampoco debe leer el disco viejo
+    nuevo = _generador(tmp_path, plantillas)
+    resultado = nuevo.generar_prompt_con_ia(*ARGS)
+    assert nuevo.estadisticas_cache()["hits"] == 0
+    assert resultado.get("uso") is not None
+
+
+def test_el_modo_de_salida_forma_parte_de_la_clave(tmp_path):
+    plantillas = RegistroPlantillas()
+    _generador(tmp_path, plantillas).generar_prompt_con_ia(*ARGS)
+
+    json = _generador(tmp_path, plantillas, salida_json=True)
+    json.generar_prompt_con_ia(*ARGS)
+    assert json.estadisticas_cache()["hits"] == 0
+
+
+def test_guardar_bajo_el_limite_no_recorre_el_disco(tmp_path, monkeypatch):
+    import src.cache as modulo
+
+    cache = CachePrompts(directorio=str(tmp_path / "cache"))
+    recorridos = []
+    listdir = modulo.os.listdir
+    monkeypatch.setattr(modulo.os, "listdir", lambda ruta: recorridos.append(ruta) or listdir(ruta))
+
+    for i in range(50):
+        cache.guardar(f"clave{i}", {"positivo": "p" * 100, "negativo": "n"})
+    # Solo el recorrido inicial que calcula el total acumulado
+    assert len(recorridos) == 1
+
+
+def test_la_poda_mantiene_el_disco_bajo_el_limite(tmp_path):
+    directorio = tmp_path / "cache"
+    cache = CachePrompts(directorio=str(directorio), max_bytes_disco=2000)
+
+    for i in range(100):
+        cache.guardar(f"clave{i}", {"positivo": "p" * 100, "negativo": "n"})
+        usados = sum(f.stat().st_size for f in directorio.glob("*.json"))
+        assert usados <= 2000
+        assert cache._bytes_disco == usados
+    assert cache.estadisticas()["evictions"] > 0
+
+
+def test_una_entrada_danada_se_borra_del_disco(tmp_path):
+    cache = CachePrompts(directorio=str(tmp_path / "cache"))
+    cache.guardar("clave", {"positivo": "p", "negativo": "n"})
+    ruta = tmp_path / "cache" / "clave.json"
+    ruta.write_text("{incompleto", encoding="utf-8")
+
+    otra = CachePrompts(directorio=str(tmp_path / "cache"))
+    assert otra.obtener("clave") is None
+    assert not ruta.exists()
@@ -0,0 +1,42 @@
+"""
+Pruebas de la línea de comandos por lotes
+"""
+import json
+import os
+import subprocess
+import sys
+
+from src.cli import main
+
+CSV = (
+    "id,tipo_medio,categoria,descripcion,estilo\n"
+    "a,imagen,generate,un faro en la tormenta,\n"
+    "b,imagen,generate,un gato en la luna,\n"
+)
+
+
+def _lineas(ruta):
+    return [json.loads(linea) for linea in ruta.read_text(encoding="utf-8").splitlines()]
+
+
+def test_genera_un_csv_y_reanuda_sin_repetir(tmp_path):
+    entrada = tmp_path / "peticiones.csv"
+    entrada.write_text(CSV, encoding="utf-8")
+    salida = tmp_path / "resultados.jsonl"
+
+    argumentos = [str(entrada), "-o", str(salida), "--backend", "falso", "--sin-cache", "-q"]
+    assert main(argumentos) == 0
+    registros = _lineas(salida)
+    assert sorted(r["id"] for r in registros) == ["a", "b"]
+    assert all(r["error"] is None and r["resultado"]["positivo"] for r in registros)
+
+    # Una fila nueva: solo se genera esa
+    entrada.write_text(CSV + "c,video,video_generate,olas rompiendo,\n", encoding="utf-8")
+    assert main(argumentos) == 0
+    assert [r["id"] for r in _lineas(salida)][2:] == ["c"]
+
+
+def test_no_importa_customtkinter():
+    codigo = "import sys, src.cli; sys.exit('customtkinter' in sys.modules)"
+    raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert subprocess.run([sys.executable, "-c", codigo], cwd=raiz).returncode == 0
@@ -0,0 +1,140 @@
+"""
+Pruebas del generador: lotes y generaciones compartidas (single-flight)
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.backends import BackendFalso
+from src.cancellation import GeneracionCancelada, TokenCancelacion
+from src.generator import GeminiPromptGenerator
+
+ARGS = ("imagen", "generate", "un faro en la tormenta", "realista/fotográfico")
+
+
+def _generador(latencia):
+    backend = BackendFalso(latencia=latencia)
+    return GeminiPromptGenerator(backend=backend, usar_cache=False, usar_metricas=False), backend
+
+
+def _esperar_lider(generador):
+    limite = time.monotonic() + 1.0
+    while not generador._en_vuelo and time.monotonic() < limite:
+        time.sleep(0.01)
+
+
+def test_peticiones_identicas_simultaneas_hacen_una_sola_llamada():
+    generador, backend = _generador(0.2)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        resultados = list(executor.map(lambda _: generador.generar_prompt_con_ia(*ARGS), range(8)))
+
+    assert backend.llamadas == 1
+    assert generador.solicitudes_coalescidas == 7
+    assert all(r["positivo"] == resultados[0]["positivo"] for r in resultados)
+
+
+@pytest.mark.parametrize("motivo", ["cancelar", "plazo"])
+def test_la_cancelacion_del_lider_no_alcanza_a_quien_espera(motivo):
+    generador, backend = _generador(0.3)
+    token_lider = TokenCancelacion(plazo=0.1 if motivo == "plazo" else None)
+    errores = []
+
+    def lider():
+        try:
+            # En streaming el líder comprueba su token entre fragmentos
+            generador.generar_prompt_con_ia(*ARGS, stream=True, cancelacion=token_lider)
+        except GeneracionCancelada as e:
+            errores.append(e)
+
+    hilo = threading.Thread(target=lider)
+    hilo.start()
+    _esperar_lider(generador)
+    if motivo == "cancelar":
+        threading.Timer(0.1, token_lider.cancelar).start()
+
+    resultado = generador.generar_prompt_con_ia(*ARGS, cancelacion=TokenCancelacion(plazo=30))
+    hilo.join()
+
+    assert resultado["positivo"]
+    assert len(errores) == 1
+    assert generador.solicitudes_coalescidas >= 1
+
+
+class BackendContado:
+    """Backend falso que cuenta las llamadas simultáneas y falla con las descripciones 'fallo'"""
+
+    nombre_modelo = "contado"
+
+    def __init__(self, latencia=0.05):
+        self.base = BackendFalso(latencia=latencia)
+        self.lock = threading.Lock()
+        self.en_curso = 0
+        self.maximo = 0
+
+    def generate_content(self, contenido, **opciones):
+        if '"fallo' in contenido:
+            raise ValueError("respuesta inválida")
+        with self.lock:
+            self.en_curso += 1
+            self.maximo = max(self.maximo, self.en_curso)
+        try:
+            return self.base.generate_content(contenido, **opciones)
+        finally:
+            with self.lock:
+                self.en_curso -= 1
+
+    def con_instruccion_sistema(self, instruccion):
+        return self
+
+
+def _spec(descripcion):
+    return {"tipo_medio": "imagen", "categoria": "generate", "descripcion": descripcion,
+            "estilo": "realista/fotográfico"}
+
+
+def test_lote_en_orden_con_errores_por_elemento_y_concurrencia_acotada():
+    backend = BackendContado()
+    generador = GeminiPromptGenerator(backend=backend, usar_cache=False, usar_metricas=False)
+    descripciones = [f"escena {i}" for i in range(10)]
+    descripciones[3] = "fallo"
+
+    resultados = generador.generar_lote([_spec(d) for d in descripciones], max_workers=3)
+
+    assert [r["indice"] for r in resultados] == list(range(10))
+    assert resultados[3]["resultado"] is None and "respuesta inválida" in resultados[3]["error"]
+    for i, r in enumerate(resultados):
+        if i != 3:
+            assert r["error"] is None and f"escena {i}" in r["resultado"]["positivo"]
+    assert backend.maximo == 3
+
+
+def test_peticiones_distintas_no_se_comparten():
+    generador, backend = _generador(0.1)
+    descripciones = ["un faro", "un gato", "un bosque"]
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        list(executor.map(lambda d: generador.generar_prompt_con_ia("imagen", "generate", d, "realista/fotográfico"),
+                          descripciones))
+
+    assert backend.llamadas == 3
+    assert generador.solicitudes_coalescidas == 0
+
+
+def test_un_error_del_lider_llega_a_quienes_esperan():
+    backend = BackendFalso(latencia=0.2, tasa_error=1.0, codigo_error=400)
+    generador = GeminiPromptGenerator(backend=backend, usar_cache=False, usar_metricas=False)
+
+    def generar(_):
+        try:
+            generador.generar_prompt_con_ia(*ARGS)
+        except Exception as e:
+            return str(e)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        errores = list(executor.map(generar, range(4)))
+
+    assert backend.llamadas == 1
+    assert all(e and "Error simulado" in e for e in errores)
@@ -0,0 +1,108 @@
+"""
+Pruebas de las peticiones de cobertura
+"""
+import threading
+import time
+
+from src.backends import BackendFalso
+from src.cancellation import GeneracionCancelada
+from src.generator import GeminiPromptGenerator
+from src.hedging import PoliticaCobertura
+
+
+def _politica():
+    politica = PoliticaCobertura(min_muestras=1, proporcion_maxima=1.0)
+    politica.latencias_intento.registrar(0.05)
+    return politica
+
+
+def _backend(latencias, fraccion_primer_fragmento=None):
+    secuencia = iter(latencias)
+    return BackendFalso(latencia=lambda rng: next(secuencia), tamano_fragmento=8,
+                        fraccion_primer_fragmento=fraccion_primer_fragmento)
+
+
+def _esperar(condicion, segundos=2.0):
+    limite = time.monotonic() + segundos
+    while not condicion() and time.monotonic() < limite:
+        time.sleep(0.02)
+    return condicion()
+
+
+def _intento(backend, hilos, detenidos):
+    def funcion(token):
+        hilos.append(threading.current_thread())
+        respuesta = backend.generate_content("prompt", stream=True)
+        try:
+            for _ in respuesta:
+                token.verificar()
+        except GeneracionCancelada:
+            detenidos.append(threading.current_thread())
+            raise
+        return respuesta.text
+    return funcion
+
+
+def test_sin_umbral_el_intento_corre_en_el_hilo_del_llamador():
+    politica = PoliticaCobertura()
+    hilos = []
+    politica.ejecutar(_intento(_backend([0.0]), hilos, []))
+    assert hilos == [threading.current_thread()]
+    politica.cerrar()
+
+
+def test_el_principal_perdedor_se_detiene_al_ganar_el_duplicado():
+    politica = _politica()
+    backend = _backend([1.0, 0.05])
+    hilos, detenidos = [], []
+
+    inicio = time.perf_counter()
+    resultado = politica.ejecutar(_intento(backend, hilos, detenidos))
+
+    assert time.perf_counter() - inicio < 0.6
+    assert resultado
+    assert hilos[0] is not threading.current_thread()
+    assert hilos[1].name.startswith("cobertura")
+    assert _esperar(lambda: detenidos == [hilos[0]])
+    assert politica.estadisticas()["coberturas_ganadoras"] == 1
+    politica.cerrar()
+
+
+def test_el_duplicado_gana_aunque_el_principal_espere_su_primer_fragmento():
+    politica = _politica()
+    # Toda la latencia del principal llega antes de su primer fragmento
+    backend = _backend([1.0, 0.05], fraccion_primer_fragmento=1.0)
+    hilos, detenidos = [], []
+
+    inicio = time.perf_counter()
+    resultado = politica.ejecutar(_intento(backend, hilos, detenidos))
+
+    assert time.perf_counter() - inicio < 0.4
+    assert resultado
+    assert politica.estadisticas()["coberturas_ganadoras"] == 1
+    # El principal se detiene en cuanto recibe su primer fragmento
+    assert _esperar(lambda: detenidos == [hilos[0]])
+    politica.cerrar()
+
+
+def test_el_duplicado_perdedor_se_detiene_al_ganar_el_principal():
+    politica = _politica()
+    backend = _backend([0.3, 3.0])
+    hilos, detenidos = [], []
+
+    politica.ejecutar(_intento(backend, hilos, detenidos))
+
+    assert _esperar(lambda: detenidos == [hilos[1]])
+    assert politica.estadisticas()["coberturas_ganadoras"] == 0
+    politica.cerrar()
+
+
+def test_el_generador_usa_la_respuesta_completa_del_intento_cubierto(tmp_path):
+    politica = _politica()
+    generador = GeminiPromptGenerator(backend=BackendFalso(), usar_cache=False,
+                                      usar_metricas=False, cobertura=politica)
+    resultado = generador.generar_prompt_con_ia("imagen", "generate", "un faro en la tormenta",
+                                                "realista/fotográfico")
+    assert "un faro en la tormenta" in resultado["positivo"]
+    assert resultado["negativo"]
+    politica.cerrar()
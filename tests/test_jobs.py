@@ -0,0 +1,120 @@
+"""
+Pruebas de la cola de trabajos de generación
+"""
+import threading
+import time
+
+from src.jobs import CANCELADO, COMPLETADO, EN_COLA, GENERANDO, ColaTrabajos
+
+
+def _esperar_estado(trabajo, estado, plazo=2.0):
+    limite = time.monotonic() + plazo
+    while trabajo.estado != estado and time.monotonic() < limite:
+        time.sleep(0.01)
+    return trabajo.estado == estado
+
+
+def test_cancelar_trabajo_en_curso_cede_su_plaza_al_terminar_su_hilo():
+    liberar = threading.Event()
+
+    def ejecutar(trabajo):
+        # Simula una llamada bloqueante que no comprueba el token
+        liberar.wait(4.0)
+        return trabajo.ajustes["n"]
+
+    cola = ColaTrabajos(ejecutar, max_simultaneos=1)
+    try:
+        primero = cola.encargar({"n": 1})
+        segundo = cola.encargar({"n": 2})
+        assert primero.estado == GENERANDO
+        assert segundo.estado == EN_COLA
+
+        cola.cancelar(primero)
+        assert primero.estado == CANCELADO
+        # La llamada abandonada sigue en curso: el siguiente no arranca todavía
+        time.sleep(0.2)
+        assert segundo.estado == EN_COLA
+    finally:
+        liberar.set()
+
+    # El resultado del trabajo abandonado se descarta; el siguiente termina normalmente
+    assert _esperar_estado(segundo, COMPLETADO)
+    assert segundo.resultado == 2
+    assert primero.estado == CANCELADO and primero.resultado is None
+
+
+def test_cancelar_y_reencargar_no_supera_el_limite_de_llamadas_reales():
+    en_curso = []
+    maximo = [0]
+    lock = threading.Lock()
+
+    def ejecutar(trabajo):
+        with lock:
+            en_curso.append(trabajo)
+            maximo[0] = max(maximo[0], len(en_curso))
+        time.sleep(0.1)
+        with lock:
+            en_curso.remove(trabajo)
+
+    cola = ColaTrabajos(ejecutar, max_simultaneos=2)
+    for _ in range(5):
+        for trabajo in [cola.encargar({}), cola.encargar({})]:
+            cola.cancelar(trabajo)
+    ultimo = cola.encargar({})
+    assert _esperar_estado(ultimo, COMPLETADO)
+    assert maximo[0] <= 2
+
+
+def test_un_trabajo_confirmado_ya_no_se_cancela():
+    confirmado = threading.Event()
+    seguir = threading.Event()
+    guardados = []
+
+    def ejecutar(trabajo):
+        cola.confirmar(trabajo, lambda: guardados.append(trabajo.numero))
+        confirmado.set()
+        seguir.wait(2.0)
+        return "ok"
+
+    cola = ColaTrabajos(ejecutar, max_simultaneos=1)
+    trabajo = cola.encargar({})
+    assert confirmado.wait(2.0)
+    assert cola.cancelar(trabajo) is False
+    seguir.set()
+    assert _esperar_estado(trabajo, COMPLETADO)
+    assert guardados == [trabajo.numero]
+
+
+
+def test_un_trabajo_cancelado_no_confirma():
+    seguir = threading.Event()
+    cola = ColaTrabajos(lambda trabajo: seguir.wait(2.0), max_simultaneos=1)
+    trabajo = cola.encargar({})
+    cola.cancelar(trabajo)
+    guardados = []
+    assert cola.confirmar(trabajo, lambda: guardados.append(trabajo.numero)) is False
+    assert guardados == []
+    seguir.set()
+
+
+def test_respeta_el_limite_y_el_orden_de_llegada():
+    activos = []
+    maximo = [0]
+    lock = threading.Lock()
+
+    def ejecutar(trabajo):
+        with lock:
+            activos.append(trabajo)
+            maximo[0] = max(maximo[0], len(activos))
+        time.sleep(0.05)
+        with lock:
+            activos.remove(trabajo)
+        return None
+
+    cola = ColaTrabajos(ejecutar, max_simultaneos=2)
+    trabajos = [cola.encargar({}) for _ in range(6)]
+    assert all(_esperar_estado(t, COMPLETADO) for t in trabajos)
+    assert maximo[0] == 2
+    # Arrancan en orden de llegada
+    inicios = [t.inicio for t in trabajos]
+    assert inicios == sorted(inicios)
@@ -0,0 +1,48 @@
+"""
+Pruebas del parser de respuestas en streaming
+"""
+from src.backends import BackendFalso
+from src.generator import GeminiPromptGenerator
+from src.parser import ParserIncremental, parsear_texto
+
+RESPUESTA = (
+    "**POSITIVE:**\nun faro en la tormenta, olas altas,\nluz dramática\n\n"
+    "## Negative prompt:\nbaja calidad, desenfoque\n"
+)
+
+
+def _trocear(texto, tamano):
+    return [texto[i:i + tamano] for i in range(0, len(texto), tamano)]
+
+
+def test_cualquier_troceado_da_el_mismo_resultado_que_la_respuesta_completa():
+    esperado = parsear_texto(RESPUESTA)
+    for tamano in range(1, len(RESPUESTA) + 1):
+        parser = ParserIncremental()
+        eventos = []
+        for fragmento in _trocear(RESPUESTA, tamano):
+            eventos.extend(parser.alimentar(fragmento))
+        assert parser.cerrar() == esperado
+        # Los eventos reconstruyen el contenido de cada sección, sin restos de marcadores
+        assert "POSITIVE" not in "".join(texto for _, texto in eventos)
+        assert {seccion for seccion, _ in eventos} == {"positivo", "negativo"}
+
+
+def test_el_positivo_se_emite_antes_de_que_termine_la_linea():
+    parser = ParserIncremental()
+    assert parser.alimentar("POSITIVE:\n") == []
+    eventos = parser.alimentar("un faro en la")
+    assert eventos and eventos[0][0] == "positivo" and "un faro" in eventos[0][1]
+
+
+def test_el_generador_entrega_los_fragmentos_a_medida_que_llegan():
+    generador = GeminiPromptGenerator(backend=BackendFalso(tamano_fragmento=8), usar_cache=False,
+                                      usar_metricas=False)
+    recibidos = []
+    resultado = generador.generar_prompt_con_ia(
+        "imagen", "generate", "un faro en la tormenta", "realista/fotográfico",
+        stream=True, al_recibir=lambda seccion, texto: recibidos.append((seccion, texto))
+    )
+    assert len(recibidos) > 2
+    positivo = "".join(texto for seccion, texto in recibidos if seccion == "positivo")
+    assert " ".join(positivo.split()) == resultado["positivo"]
@@ -0,0 +1,66 @@
+"""
+Pruebas del limitador de tasa y la política de reintentos
+"""
+import time
+
+import pytest
+
+from src.backends import ErrorBackendFalso
+from src.cancellation import GeneracionCancelada, TokenCancelacion
+from src.rate_limit import LimitadorTasa, PoliticaReintentos, es_reintentable
+
+
+def test_el_limitador_espera_al_agotar_la_cubeta():
+    limitador = LimitadorTasa(peticiones_por_minuto=600)  # 10 por segundo
+    inicio = time.monotonic()
+    for _ in range(605):
+        limitador.adquirir()
+    # Las 600 primeras salen de la cubeta llena; las 5 siguientes esperan ~0.1 s cada una
+    assert 0.4 <= time.monotonic() - inicio < 1.5
+
+
+def test_la_espera_del_limitador_atiende_la_cancelacion():
+    limitador = LimitadorTasa(tokens_por_minuto=60)
+    limitador.adquirir(60)
+    token = TokenCancelacion()
+    token.cancelar()
+    with pytest.raises(GeneracionCancelada):
+        limitador.adquirir(60, token)
+
+
+def test_reintenta_los_errores_transitorios_y_no_los_demas():
+    assert es_reintentable(ErrorBackendFalso("saturado", 503))
+    assert es_reintentable(ErrorBackendFalso("cuota", 429))
+    assert not es_reintentable(ErrorBackendFalso("petición inválida", 400))
+
+    politica = PoliticaReintentos(max_intentos=4, espera_base=0.01)
+    intentos = []
+
+    def llamada():
+        intentos.append(1)
+        if len(intentos) < 3:
+            raise ErrorBackendFalso("saturado", 503)
+        return "ok"
+
+    assert politica.ejecutar(llamada) == "ok"
+    assert len(intentos) == 3
+
+    def invalida():
+        raise ErrorBackendFalso("petición inválida", 400)
+
+    with pytest.raises(ErrorBackendFalso):
+        politica.ejecutar(invalida)
+    assert politica.reintentos == 2
+
+
+def test_el_presupuesto_limita_los_reintentos():
+    politica = PoliticaReintentos(max_intentos=10, espera_base=0.0, reserva_minima=3,
+                                  proporcion_presupuesto=0.0)
+
+    def siempre_falla():
+        raise ErrorBackendFalso("saturado", 503)
+
+    with pytest.raises(ErrorBackendFalso):
+        politica.ejecutar(siempre_falla)
+    assert politica.reintentos == 3
+    assert politica.reintentos_denegados == 1
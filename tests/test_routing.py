@@ -0,0 +1,76 @@
+"""
+Pruebas del enrutador de modelos
+"""
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.backends import BackendFalso
+from src.generator import GeminiPromptGenerator
+from src.routing import EnrutadorModelos, OpcionModelo
+
+
+class BackendStreamRoto:
+    """Backend cuyo stream falla después del primer fragmento"""
+
+    nombre_modelo = "roto"
+
+    def generate_content(self, contenido, stream=False, **opciones):
+        def iterar():
+            yield SimpleNamespace(text="POSITIVO: ")
+            raise RuntimeError("conexión cortada")
+        return iterar()
+
+    def con_instruccion_sistema(self, instruccion):
+        return self
+
+
+def test_stream_a_traves_del_enrutador_mide_hasta_el_ultimo_fragmento():
+    enrutador = EnrutadorModelos([OpcionModelo(BackendFalso(latencia=0.2, nombre_modelo="lento"))])
+    generador = GeminiPromptGenerator(enrutador=enrutador, usar_cache=False, usar_metricas=False)
+
+    fragmentos = []
+    resultado = generador.generar_prompt_con_ia(
+        "imagen", "generate", "un faro en la tormenta", "realista/fotográfico",
+        stream=True, al_recibir=lambda seccion, texto: fragmentos.append(texto)
+    )
+
+    assert resultado["positivo"] and len(fragmentos) > 1
+    estadisticas = enrutador.estadisticas()["lento"]
+    assert estadisticas["llamadas"] == 1 and estadisticas["errores"] == 0
+    assert estadisticas["latencia_ewma"] >= 0.15
+
+
+def test_error_a_mitad_del_stream_se_registra():
+    enrutador = EnrutadorModelos([OpcionModelo(BackendStreamRoto())])
+    backend = enrutador.elegir("imagen", "generate", "un faro")
+
+    with pytest.raises(RuntimeError):
+        for _ in backend.generate_content("prompt", stream=True):
+            pass
+
+    estadisticas = enrutador.estadisticas()["roto"]
+    assert estadisticas["llamadas"] == 1 and estadisticas["errores"] == 1
+
+
+def test_un_modelo_evitado_se_recupera_tras_la_espera():
+    ligero = OpcionModelo(BackendFalso(nombre_modelo="ligero"))
+    completo = OpcionModelo(BackendFalso(nombre_modelo="completo"))
+    enrutador = EnrutadorModelos([ligero, completo], exploracion=0.0, espera_recuperacion=0.1)
+    enrutador.registrar("ligero", 0.1, False)
+    enrutador.registrar("completo", 1.0, False)
+    for _ in range(4):
+        enrutador.registrar("ligero", None, True)
+
+    elegir = lambda: enrutador.elegir("imagen", "generate", "un faro").nombre_modelo
+    assert [elegir() for _ in range(100)] == ["completo"] * 100
+
+    time.sleep(0.15)
+    # Pasada la espera, el modelo evitado recibe una petición de prueba y solo una
+    assert elegir() == "ligero"
+    assert elegir() == "completo"
+
+    enrutador.registrar("ligero", 0.1, False)
+    assert enrutador.estadisticas()["ligero"]["tasa_error_ewma"] < enrutador.max_tasa_error
+    assert elegir() == "ligero"
@@ -0,0 +1,57 @@
+"""
+Pruebas del servicio HTTP
+"""
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from src.backends import BackendFalso
+from src.generator import GeminiPromptGenerator
+from src.server import ServicioPrompts, ServidorPrompts
+
+
+@pytest.fixture(scope="module")
+def url():
+    generador = GeminiPromptGenerator(backend=BackendFalso(), usar_cache=False, usar_metricas=False)
+    servicio = ServicioPrompts(generador, trabajadores=2, max_cola=2, plazo=5.0)
+    servidor = ServidorPrompts(("127.0.0.1", 0), servicio, silencioso=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    yield "http://%s:%d" % servidor.server_address[:2]
+    servidor.shutdown()
+    servidor.server_close()
+    servicio.cerrar()
+
+
+def _post(url, ruta, datos):
+    peticion = urllib.request.Request(url + ruta, data=json.dumps(datos).encode("utf-8"),
+                                      headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(peticion, timeout=5) as respuesta:
+            return respuesta.status, json.loads(respuesta.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def test_generar_devuelve_el_resultado(url):
+    codigo, cuerpo = _post(url, "/generar", {"tipo_medio": "imagen", "categoria": "generate",
+                                             "descripcion": "un faro en la tormenta"})
+    assert codigo == 200
+    assert "un faro en la tormenta" in cuerpo["resultado"]["positivo"]
+
+
+@pytest.mark.parametrize("datos", [
+    {"categoria": "generate", "descripcion": 123},
+    {"categoria": ["generate"], "descripcion": "un faro"},
+    {"categoria": "generate", "descripcion": "un faro", "estilo": {"a": 1}},
+    {"tipo_medio": 1, "categoria": "generate", "descripcion": "un faro"},
+    {"categoria": "generate", "descripcion": "un faro", "detalles": ["no", "objeto"]},
+    {"descripcion": "un faro"},
+    [1, 2],
+])
+def test_especificaciones_invalidas_responden_400(url, datos):
+    codigo, cuerpo = _post(url, "/generar", datos)
+    assert codigo == 400
+    assert cuerpo["error"]
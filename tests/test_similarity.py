@@ -0,0 +1,49 @@
+"""
+Pruebas del índice de descripciones similares
+"""
+from src.similarity import IndiceSimilitud, normalizar
+
+
+def _entrada(descripcion):
+    return {
+        "tipo_medio": "imagen",
+        "categoria": "🖼️ Generación desde Cero",
+        "estilo": "Realista",
+        "descripcion": descripcion,
+        "prompt_positivo": "positivo",
+        "prompt_negativo": "negativo",
+        "detalles": {},
+    }
+
+
+def _buscar(indice, descripcion):
+    return indice.buscar("imagen", "🖼️ Generación desde Cero", "Realista", descripcion, {})
+
+
+def test_reordenar_y_puntuacion_se_reutilizan():
+    indice = IndiceSimilitud().cargar([_entrada("Mujer en la playa, al atardecer")])
+    encontrado = _buscar(indice, "al atardecer: una mujer en la playa")
+    assert encontrado is not None and encontrado[1] == 1.0
+
+
+def test_con_y_sin_no_son_equivalentes():
+    indice = IndiceSimilitud().cargar([_entrada("mujer con sombrero rojo")])
+    assert _buscar(indice, "mujer sin sombrero rojo") is None
+    assert _buscar(indice, "mujer con sombrero rojo") is not None
+
+
+def test_negacion_no_es_equivalente():
+    indice = IndiceSimilitud().cargar([_entrada("perro corriendo por el parque al amanecer")])
+    assert _buscar(indice, "perro no corriendo por el parque al amanecer") is None
+
+
+def test_conserva_las_palabras_con_significado():
+    assert normalizar("Más luz sobre la mesa, sin sombras") == ["luz", "mas", "mesa", "sin", "sobre", "sombras"]
+
+
+def test_las_busquedas_no_agrandan_la_cache_de_firmas():
+    indice = IndiceSimilitud()
+    indice.agregar(_entrada("un gato negro durmiendo en el sofá"))
+    for i in range(50):
+        _buscar(indice, f"un perro número {i} corriendo")
+    assert len(indice._firmas) == 1
@@ -0,0 +1,30 @@
+"""
+Pruebas del consumo de tokens
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from src.usage import coste_estimado, extraer_uso
+
+
+def _respuesta(**campos):
+    return SimpleNamespace(usage_metadata=SimpleNamespace(**campos))
+
+
+def test_los_tokens_de_razonamiento_cuentan_como_salida():
+    uso = extraer_uso(_respuesta(prompt_token_count=100, candidates_token_count=50,
+                                 thoughts_token_count=400, total_token_count=550), "gemini-2.5-flash")
+    assert uso["tokens_salida"] == 450
+    assert coste_estimado(uso) == pytest.approx((100 * 0.30 + 450 * 2.50) / 1_000_000)
+
+
+def test_sin_campo_de_razonamiento_la_salida_se_deduce_del_total():
+    uso = extraer_uso(_respuesta(prompt_token_count=100, candidates_token_count=50,
+                                 total_token_count=550), "gemini-2.5-flash")
+    assert uso["tokens_salida"] == 450
+
+
+def test_sin_razonamiento_la_salida_son_los_candidatos():
+    uso = extraer_uso(_respuesta(prompt_token_count=100, candidates_token_count=50), "falso")
+    assert (uso["tokens_salida"], uso["tokens_total"]) == (50, 150)